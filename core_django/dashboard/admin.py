@@ -1,8 +1,220 @@
 from django.contrib import admin
-from .models import Course, Student
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Avg, Count, Max, Q
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
 
-admin.site.register(Course)
-admin.site.register(Student) 
+from .models import (Attendance, ClassSession, CohortCell, Course, Enrollment, GradeRecord, Job, Payment,
+                     PredictorStats, Student, StudentFeatures, StudentScore)
+from .queries import per_student, with_balances
+from .search import FTS_TABLE, build_match_query
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATE_ABOVE = 10000
+
+
+def estimated_rows(model):
+    """Rough row count without scanning the table: planner stats on PostgreSQL, MAX(id) elsewhere."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+            row = cursor.fetchone()
+        return row[0] if row else 0
+    return model._base_manager.aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Unfiltered changelists of big tables page on an estimated count; filtered ones count exactly."""
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        # The default manager's own filter (soft-deleted rows) doesn't count as filtering
+        unfiltered = self.object_list.model._default_manager.all().query.where
+        if query.where == unfiltered and not query.distinct:
+            estimate = estimated_rows(self.object_list.model)
+            if estimate > ESTIMATE_ABOVE:
+                return estimate
+        return super().count
+
+
+class FastAdmin(admin.ModelAdmin):
+    """
+    Base for the dashboard admins: every FK column comes from the changelist
+    query (list_select_related), FK inputs are autocompletes rather than
+    dropdowns of every row, and big tables skip COUNT(*).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+
+
+def student_name(obj):
+    # Not str(student): Student.__str__ reads student.user, one more join
+    return f"{obj.student.first_name} {obj.student.last_name}"
+
+
+student_name.short_description = 'Student'
+student_name.admin_order_field = 'student__last_name'
+
+
+@admin.register(Student)
+class StudentAdmin(FastAdmin):
+    list_display = ['full_name', 'student_id', 'user', 'status', 'course_count', 'balance', 'average']
+    list_filter = ['status']
+    search_fields = ['first_name', 'last_name', 'student_id', 'email']
+    autocomplete_fields = ['user']
+    readonly_fields = ['date_added', 'updated_at']
+    ordering = ['-id']
+
+    def get_queryset(self, request):
+        # Balance, course count and average are correlated subqueries in the changelist query.
+        # user is joined here rather than in list_select_related so autocomplete results,
+        # labelled with str(student), get it too.
+        return with_balances(super().get_queryset(request).select_related('user')).annotate(
+            average=per_student(Enrollment.objects, Avg('current_average')),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Prefix search through the FTS index instead of four LIKE '%...%' scans
+        match = build_match_query(search_term)
+        if connection.vendor != 'sqlite' or not match:
+            return super().get_search_results(request, queryset, search_term)
+        rowids = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        return queryset.filter(pk__in=rowids), False
+
+    @admin.display(description='Name', ordering='last_name')
+    def full_name(self, obj):
+        return f"{obj.first_name} {obj.last_name}"
+
+    @admin.display(description='Courses', ordering='course_count')
+    def course_count(self, obj):
+        return obj.course_count
+
+    @admin.display(ordering='balance')
+    def balance(self, obj):
+        return obj.balance
+
+    @admin.display(description='Average', ordering='average')
+    def average(self, obj):
+        return None if obj.average is None else round(obj.average, 1)
+
+
+@admin.register(Course)
+class CourseAdmin(FastAdmin):
+    list_display = ['name', 'course_code', 'user', 'cost', 'start_date', 'end_date', 'student_count', 'average']
+    list_select_related = ['user']
+    search_fields = ['name', 'course_code']
+    autocomplete_fields = ['user']
+    readonly_fields = ['created_at', 'updated_at']
+    # The course autocomplete pages through this queryset too
+    ordering = ['name']
+
+    def get_queryset(self, request):
+        # Enrollments of soft-deleted students are hidden until the purge
+        live = Q(enrollment__student__deleted_at__isnull=True)
+        return super().get_queryset(request).annotate(
+            student_count=Count('enrollment', filter=live),
+            average=Avg('enrollment__current_average', filter=live),
+        )
+
+    @admin.display(description='Students', ordering='student_count')
+    def student_count(self, obj):
+        return obj.student_count
+
+    @admin.display(description='Average', ordering='average')
+    def average(self, obj):
+        return None if obj.average is None else round(obj.average, 1)
+
+
+@admin.register(Enrollment)
+class EnrollmentAdmin(FastAdmin):
+    list_display = ['id', student_name, 'course', 'start_date', 'current_average']
+    list_select_related = ['student', 'course']
+    autocomplete_fields = ['student', 'course']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(Payment)
+class PaymentAdmin(FastAdmin):
+    list_display = ['id', student_name, 'amount', 'date_of_payment', 'reference_id', 'user']
+    list_select_related = ['student', 'user']
+    search_fields = ['reference_id']
+    autocomplete_fields = ['student', 'user']
+    readonly_fields = ['date_recorded', 'updated_at']
+
+
+@admin.register(Attendance)
+class AttendanceAdmin(FastAdmin):
+    list_display = ['id', student_name, 'course', 'date', 'status']
+    # str(attendance), in the action checkbox label, goes through student.user
+    list_select_related = ['student__user', 'course']
+    list_filter = ['status']
+    autocomplete_fields = ['student', 'course']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(ClassSession)
+class ClassSessionAdmin(FastAdmin):
+    list_display = ['id', 'course', 'date', 'start_minute', 'end_minute', 'recorded']
+    list_select_related = ['course']
+    autocomplete_fields = ['course']
+    readonly_fields = ['user', 'recorded']
+
+
+@admin.register(GradeRecord)
+class GradeRecordAdmin(FastAdmin):
+    list_display = ['id', student_name, 'course', 'description', 'date', 'score_obtained', 'max_score', 'percentage']
+    list_select_related = ['student__user', 'course']
+    search_fields = ['description']
+    autocomplete_fields = ['student', 'course']
+    readonly_fields = ['created_at', 'updated_at']
+
+    @admin.display(description='%')
+    def percentage(self, obj):
+        return round(obj.get_percentage(), 1)
+
+
+@admin.register(StudentScore)
+class StudentScoreAdmin(FastAdmin):
+    list_display = [student_name, 'risk_label', 'risk_score', 'predicted_grade', 'attendance_rate', 'model_version', 'scored_at']
+    list_select_related = ['student']
+    list_filter = ['risk_label']
+    raw_id_fields = ['student']
+    readonly_fields = ['user']
+
+
+@admin.register(StudentFeatures)
+class StudentFeaturesAdmin(FastAdmin):
+    list_display = [student_name, 'attendance_rate', 'attendance_present', 'attendance_total', 'study_hours',
+                    'previous_grade', 'payment_delays', 'updated_at']
+    list_select_related = ['student']
+    raw_id_fields = ['student']
+    readonly_fields = ['user']
+
+
+@admin.register(Job)
+class JobAdmin(FastAdmin):
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'max_attempts', 'run_after', 'finished_at', 'user']
+    list_select_related = ['user']
+    list_filter = ['status', 'name']
+    raw_id_fields = ['user']
+
+
+@admin.register(PredictorStats)
+class PredictorStatsAdmin(admin.ModelAdmin):
+    # One row keyed by name: nothing to estimate, and MAX(pk) is a string
+    list_display = ['name', 'samples', 'version', 'published_at', 'updated_at']
+    readonly_fields = ['samples', 'xtx', 'xty', 'version', 'published_at', 'updated_at']
+
+
+@admin.register(CohortCell)
+class CohortCellAdmin(FastAdmin):
+    list_display = ['user', 'country', 'city', 'age_band', 'course', 'month', 'students', 'enrollments', 'revenue']
+    list_select_related = ['user', 'course']
+    list_filter = ['age_band']
+    readonly_fields = [field.name for field in CohortCell._meta.fields]
 
 #For now go here to make admin changes to models directly
-# http://127.0.0.1:8000/admin/
\ No newline at end of file
+# http://127.0.0.1:8000/admin/
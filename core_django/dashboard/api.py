@@ -0,0 +1,245 @@
+"""
+Read-only JSON API (v1) over the user's students, courses, enrollments,
+attendance, grades and payments.
+
+    GET /api/v1/students/?fields=id,first_name,balance&limit=500
+    GET /api/v1/students/?cursor=<next from the previous page>
+    GET /api/v1/grades/?course=12
+    GET /api/v1/students/42/
+
+Each resource maps public field names to ORM lookups, so a page is a single
+values_list() query whose joins the database does (the select_related of a
+flat row). Only the requested fields are selected, and the expensive ones
+(annotations like a student's balance, to-many lists like a student's course
+ids) are only computed when asked for; to-many fields cost one extra query
+per page, like prefetch_related. Rows become dicts with zip(), no model
+instances are built.
+
+Pages are keyed on the primary key (?cursor= is the last id seen), so
+paging stays O(limit) however deep the client goes and rows inserted while
+paging are never skipped or repeated.
+"""
+import base64
+import binascii
+
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+
+from .models import Attendance, Course, Enrollment, GradeRecord, Payment, Student
+from .queries import with_balances
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class APIError(Exception):
+    """A bad request from the client; the message is returned as JSON with `status`."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def grade_percentage(grades):
+    return grades.annotate(percentage=Case(
+        When(max_score__gt=0, then=F('score_obtained') * 100.0 / F('max_score')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+
+# fields:      public name -> ORM lookup for values_list()
+# annotations: field -> function adding it to the queryset, only run when the field is selected
+# many:        field -> (model, fk to this resource, value lookup), fetched per page
+# owner:       lookup that scopes rows to the requesting user
+# filters:     ?param -> lookup, integer values only
+RESOURCES = {
+    'students': {
+        'model': Student,
+        'owner': 'user',
+        'fields': {
+            'id': 'id', 'student_id': 'student_id', 'first_name': 'first_name', 'last_name': 'last_name',
+            'email': 'email', 'age': 'age', 'gender': 'gender', 'city': 'city', 'country': 'country',
+            'status': 'status', 'previous_grade': 'previous_grade', 'study_hours': 'study_hours',
+            'payment_delays': 'payment_delays', 'date_added': 'date_added', 'updated_at': 'updated_at',
+            'balance': 'balance', 'course_count': 'course_count',
+        },
+        'default': ['id', 'student_id', 'first_name', 'last_name', 'email', 'status'],
+        'annotations': {'balance': with_balances, 'course_count': with_balances},
+        'many': {'courses': (Enrollment, 'student_id', 'course_id')},
+        'filters': {'course': 'enrollment__course'},
+    },
+    'courses': {
+        'model': Course,
+        'owner': 'user',
+        'fields': {
+            'id': 'id', 'name': 'name', 'course_code': 'course_code', 'cost': 'cost',
+            'schedule_days': 'schedule_days', 'start_time': 'start_time', 'end_time': 'end_time',
+            'start_date': 'start_date', 'end_date': 'end_date', 'created_at': 'created_at',
+            'updated_at': 'updated_at',
+            'student_count': 'student_count',
+        },
+        'default': ['id', 'name', 'course_code', 'cost', 'start_date', 'end_date'],
+        'annotations': {'student_count': lambda qs: qs.annotate(
+            student_count=Count('enrollment', filter=Q(enrollment__student__deleted_at__isnull=True)))},
+        'many': {'students': (Enrollment, 'course_id', 'student_id')},
+        'filters': {},
+    },
+    'enrollments': {
+        'model': Enrollment,
+        'owner': 'student__user',
+        'fields': {
+            'id': 'id', 'student': 'student_id', 'course': 'course_id', 'start_date': 'start_date',
+            'current_average': 'current_average', 'student_first_name': 'student__first_name',
+            'student_last_name': 'student__last_name', 'course_name': 'course__name', 'updated_at': 'updated_at',
+        },
+        'default': ['id', 'student', 'course', 'start_date', 'current_average'],
+        'filters': {'student': 'student_id', 'course': 'course_id'},
+    },
+    'attendance': {
+        'model': Attendance,
+        'owner': 'user',
+        'fields': {
+            'id': 'id', 'student': 'student_id', 'course': 'course_id', 'date': 'date', 'status': 'status',
+            'updated_at': 'updated_at',
+        },
+        'default': ['id', 'student', 'course', 'date', 'status'],
+        'filters': {'student': 'student_id', 'course': 'course_id'},
+    },
+    'grades': {
+        'model': GradeRecord,
+        'owner': 'user',
+        'fields': {
+            'id': 'id', 'student': 'student_id', 'course': 'course_id', 'description': 'description',
+            'date': 'date', 'score_obtained': 'score_obtained', 'max_score': 'max_score',
+            'percentage': 'percentage', 'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        'default': ['id', 'student', 'course', 'description', 'date', 'score_obtained', 'max_score'],
+        'annotations': {'percentage': grade_percentage},
+        'filters': {'student': 'student_id', 'course': 'course_id'},
+    },
+    'payments': {
+        'model': Payment,
+        'owner': 'user',
+        'fields': {
+            'id': 'id', 'student': 'student_id', 'amount': 'amount', 'date_of_payment': 'date_of_payment',
+            'reference_id': 'reference_id', 'notes': 'notes', 'date_recorded': 'date_recorded',
+            'updated_at': 'updated_at',
+        },
+        'default': ['id', 'student', 'amount', 'date_of_payment', 'reference_id'],
+        'filters': {'student': 'student_id'},
+    },
+}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise APIError(f"Unknown resource '{name}'. Available: {', '.join(RESOURCES)}", status=404)
+
+
+def selected_fields(resource, fields_param):
+    """Validated field names for ?fields= (comma separated), or the resource's defaults."""
+    if not fields_param:
+        return list(resource['default'])
+    available = list(resource['fields']) + list(resource.get('many', {}))
+    fields = list(dict.fromkeys(name.strip() for name in fields_param.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise APIError(f"Unknown field(s) {', '.join(unknown)}. Available: {', '.join(available)}")
+    return fields
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise APIError("Invalid cursor.")
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise APIError("limit must be an integer.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def base_queryset(resource, user, fields, params=None):
+    queryset = resource['model'].objects.filter(**{resource['owner']: user}).order_by('id')
+    for param, lookup in resource['filters'].items():
+        value = (params or {}).get(param)
+        if value:
+            if not value.isdigit():
+                raise APIError(f"{param} must be an id.")
+            queryset = queryset.filter(**{lookup: int(value)})
+
+    applied = set()
+    for field in fields:
+        annotate = resource.get('annotations', {}).get(field)
+        if annotate and annotate not in applied:
+            queryset = annotate(queryset)
+            applied.add(annotate)
+    return queryset
+
+
+def serialize(resource, queryset, fields):
+    """Runs the page query (plus one query per to-many field). Returns (rows as dicts, their ids)."""
+    many = resource.get('many', {})
+    names = [field for field in fields if field not in many]
+
+    # The primary key is always fetched, for the cursor and the to-many lookups
+    rows = list(queryset.values_list('id', *(resource['fields'][field] for field in names)))
+    ids = [row[0] for row in rows]
+    results = [dict(zip(names, row[1:])) for row in rows]
+
+    for field in fields:
+        if field not in many:
+            continue
+        model, fk, value = many[field]
+        related = {pk: [] for pk in ids}
+        if ids:
+            for pk, related_value in model.objects.filter(**{f"{fk}__in": ids}).order_by(fk, value).values_list(fk, value):
+                related[pk].append(related_value)
+        for pk, item in zip(ids, results):
+            item[field] = related[pk]
+    return results, ids
+
+
+def list_page(name, user, params):
+    """
+    One page of a resource for `user`. Returns {'data': [...], 'next_cursor': str|None, 'limit': int}.
+    Raises APIError for unknown resources, fields or bad parameters.
+    """
+    resource = get_resource(name)
+    fields = selected_fields(resource, params.get('fields'))
+    limit = parse_limit(params.get('limit'))
+    queryset = base_queryset(resource, user, fields, params)
+    if params.get('cursor'):
+        queryset = queryset.filter(id__gt=decode_cursor(params['cursor']))
+
+    # One extra row tells us whether there is a next page
+    data, ids = serialize(resource, queryset[:limit + 1], fields)
+    has_more = len(data) > limit
+    return {
+        'data': data[:limit],
+        'next_cursor': encode_cursor(ids[limit - 1]) if has_more else None,
+        'limit': limit,
+    }
+
+
+def detail(name, user, pk, params):
+    """{'data': {...}} for one row of a resource, or APIError 404."""
+    resource = get_resource(name)
+    fields = selected_fields(resource, params.get('fields'))
+    data, _ = serialize(resource, base_queryset(resource, user, fields).filter(id=pk), fields)
+    if not data:
+        raise APIError(f"{name} {pk} not found.", status=404)
+    return {'data': data[0]}
@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class DashboardConfig(AppConfig):  # MUST match the name Django is looking for
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'dashboard'
\ No newline at end of file
+    name = 'dashboard'
+
+    def ready(self):
+        # Connects the model signal receivers and registers background tasks
+        from . import signals  # noqa: F401
+        from . import tasks  # noqa: F401
@@ -0,0 +1,145 @@
+"""
+Attendance rates, streaks and absence alerts from AttendanceBitmap rows.
+
+A course's bitmaps come back in one query and are unpacked into a
+(n_students, n_days) matrix of status codes, then squeezed down to the days
+the course actually met (any student marked). Every statistic is a
+vectorized reduction over that matrix, so a whole course is a handful of
+NumPy calls regardless of how many Attendance rows sit behind it.
+
+Rates over recorded sessions can't see a roll-call that never happened, so
+each student also gets 'scheduled_rate': present at how many of the
+course's ClassSessions since they enrolled, up to today.
+"""
+import datetime
+
+import numpy as np
+
+from .models import ATTENDANCE_BIT_FIELDS, AttendanceBitmap, ClassSession, Enrollment
+
+# Status codes in the matrix; 0 means no record for that session
+CODES = {status: i + 1 for i, status in enumerate(ATTENDANCE_BIT_FIELDS)}
+PRESENT = CODES['P']
+ABSENT = CODES['A']
+LATE = CODES['L']
+
+RECENT_WINDOW = 5
+ABSENCE_ALERT = 3
+
+
+def unpack(bits, length):
+    return np.unpackbits(np.frombuffer(bytes(bits), dtype=np.uint8), count=length, bitorder='little')
+
+
+def session_matrix(bitmaps):
+    """
+    (student_ids, session_dates, codes) from (student_id, first_day, present,
+    absent, late, excused) rows; codes is (n_students, n_sessions) uint8.
+    """
+    if not bitmaps:
+        return [], [], np.zeros((0, 0), dtype=np.uint8)
+
+    start = min(row[1] for row in bitmaps)
+    offsets = [(row[1] - start).days for row in bitmaps]
+    n_days = max(offset + 8 * max(len(bits) for bits in row[2:]) for offset, row in zip(offsets, bitmaps))
+
+    codes = np.zeros((len(bitmaps), n_days), dtype=np.uint8)
+    for i, (row, offset) in enumerate(zip(bitmaps, offsets)):
+        for code, bits in zip(CODES.values(), row[2:]):
+            if bits:
+                mask = unpack(bits, 8 * len(bits)).astype(bool)
+                codes[i, offset:offset + mask.size][mask] = code
+
+    held = np.flatnonzero(codes.any(axis=0))
+    dates = [start + datetime.timedelta(days=int(day)) for day in held]
+    return [row[0] for row in bitmaps], dates, codes[:, held]
+
+
+def trailing_run(mask):
+    """Length of the run of True at the end of each row."""
+    return np.cumprod(mask[:, ::-1], axis=1).sum(axis=1)
+
+
+def longest_run(mask):
+    """Longest run of True anywhere in each row."""
+    if not mask.shape[1]:
+        return np.zeros(mask.shape[0], dtype=int)
+    # Running count that resets to 0 on every False
+    idx = np.arange(mask.shape[1])
+    last_false = np.maximum.accumulate(np.where(mask, -1, idx), axis=1)
+    return (idx - last_false).max(axis=1)
+
+
+def summarize(codes, window=RECENT_WINDOW, threshold=ABSENCE_ALERT):
+    """Per-student arrays for a (n_students, n_sessions) code matrix."""
+    recorded = (codes > 0).sum(axis=1)
+    present = codes == PRESENT
+    absent = codes == ABSENT
+    recent_absences = absent[:, -window:].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(recorded > 0, present.sum(axis=1) / recorded * 100, np.nan)
+        attended = np.where(recorded > 0, (present | (codes == LATE)).sum(axis=1) / recorded * 100, np.nan)
+    return {
+        'sessions': recorded,
+        'present': present.sum(axis=1),
+        'rate': rate,
+        'attended_rate': attended,
+        'present_streak': trailing_run(present),
+        'absent_streak': trailing_run(absent),
+        'longest_absence': longest_run(absent),
+        'recent_absences': recent_absences,
+        'alert': recent_absences >= threshold,
+    }
+
+
+def against_schedule(dates, codes, scheduled, starts):
+    """
+    Per-student 'scheduled' (sessions held since the student's start date)
+    and 'scheduled_rate' (% of those they were present at). `dates` are the
+    columns of `codes`, `scheduled` the sorted session dates held so far and
+    `starts` each student's enrollment date (None counts every session).
+    """
+    scheduled = np.array(scheduled, dtype='datetime64[D]')
+    starts = np.array([start or datetime.date.min for start in starts], dtype='datetime64[D]')
+    held = np.array(dates, dtype='datetime64[D]')
+    counts = len(scheduled) - np.searchsorted(scheduled, starts)
+    on_schedule = np.isin(held, scheduled) & (held[None, :] >= starts[:, None])
+    present = ((codes == PRESENT) & on_schedule).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(counts > 0, present / counts * 100, np.nan)
+    return {'scheduled': counts, 'scheduled_rate': rate}
+
+
+def course_attendance(course, window=RECENT_WINDOW, threshold=ABSENCE_ALERT, today=None):
+    """
+    {student_id: {'sessions', 'present', 'rate', 'attended_rate',
+    'present_streak', 'absent_streak', 'longest_absence', 'recent_absences',
+    'alert', 'scheduled', 'scheduled_rate'}} for one course's enrolled
+    students (and anyone else with a record). 'alert' means absent for at
+    least `threshold` of the last `window` sessions the course held.
+    """
+    bitmaps = list(
+        AttendanceBitmap.objects.filter(course=course, student__deleted_at__isnull=True)
+        .values_list('student_id', 'first_day', *ATTENDANCE_BIT_FIELDS.values())
+    )
+    student_ids, dates, codes = session_matrix(bitmaps)
+
+    # Students never marked still have the scheduled sessions they missed
+    enrolled = dict(Enrollment.objects.filter(course=course).values_list('student_id', 'start_date'))
+    marked = set(student_ids)
+    unmarked = [pk for pk in enrolled if pk not in marked]
+    student_ids = list(student_ids) + unmarked
+    codes = np.vstack([codes, np.zeros((len(unmarked), codes.shape[1]), dtype=np.uint8)])
+
+    scheduled = ClassSession.objects.filter(course=course, date__lte=today or datetime.date.today())\
+        .order_by('date').values_list('date', flat=True)
+    stats = summarize(codes, window, threshold)
+    stats.update(against_schedule(dates, codes, list(scheduled), [enrolled.get(pk) for pk in student_ids]))
+
+    results = {}
+    for i, student_id in enumerate(student_ids):
+        row = {name: values[i].item() for name, values in stats.items()}
+        for name in ('rate', 'attended_rate', 'scheduled_rate'):
+            row[name] = None if np.isnan(row[name]) else round(row[name], 1)
+        results[student_id] = row
+    return results
@@ -0,0 +1,64 @@
+"""
+Request authentication without database queries.
+
+Sessions use Django's cached_db engine (SESSION_ENGINE in settings): reads
+come from the cache and writes go to both the cache and the session table,
+so a cache miss (eviction, restart) falls back to the database and nothing
+is lost.
+
+CachedModelBackend does the same for the user behind the session. The User
+row, and later its permission sets, are cached under the user's 'auth'
+version (see caching.py). signals.py bumps the version when the user is
+saved or deleted (password, is_active, is_staff, ...) or when their groups
+or permissions change, after the transaction commits. A stale copy is never
+read again, and a password change still ends the other sessions: the
+session hash is checked against the fresh row.
+
+In steady state AuthenticationMiddleware resolves request.user with two
+cache reads and no queries.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .caching import bump_version, get_versions
+
+AUTH_TIMEOUT = 60 * 60
+
+
+def user_key(user_id, version, part='user'):
+    return f"auth:{part}:{user_id}:{version}"
+
+
+def forget_user(user_id):
+    """Invalidates the cached user and permissions (call after the change commits)."""
+    bump_version('auth', user_id)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that serves get_user() and permission lookups from the cache."""
+
+    def get_user(self, user_id):
+        version = get_versions(user_id, kinds=('auth',))['auth_version']
+        key = user_key(user_id, version)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, AUTH_TIMEOUT)
+        user._auth_version = version
+        return user if self.user_can_authenticate(user) else None
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        perm_cache_name = f"_{from_name}_perm_cache"
+        version = getattr(user_obj, '_auth_version', None)
+        if version is None or obj is not None or not user_obj.is_active or hasattr(user_obj, perm_cache_name):
+            return super()._get_permissions(user_obj, obj, from_name)
+
+        key = user_key(user_obj.pk, version, f'{from_name}_perms')
+        perms = cache.get(key)
+        if perms is None:
+            perms = super()._get_permissions(user_obj, obj, from_name)
+            cache.set(key, perms, AUTH_TIMEOUT)
+        setattr(user_obj, perm_cache_name, perms)
+        return perms
@@ -0,0 +1,44 @@
+"""
+Per-user version keys for template fragment caching.
+
+Fragments are cached with the owner's version in the key, e.g.
+    {% cache FRAGMENT_TIMEOUT dashboard_courses user.pk course_version %}
+and signals.py bumps the version whenever a Course/Student row changes, so the
+next render misses and rebuilds. Old fragments are never deleted, they just
+age out of the cache.
+
+The same scheme covers per-course data such as the gradebook matrix, keyed
+by course id instead of user id (kind 'grades').
+
+Versions are nanosecond timestamps rather than counters: if a version key is
+evicted, the replacement is still newer than anything cached before it.
+"""
+import time
+
+from django.core.cache import cache
+
+FRAGMENT_TIMEOUT = 60 * 60
+VERSIONED_MODELS = ('course', 'student')
+
+
+def version_key(kind, owner_id):
+    return f"fragment_version:{kind}:{owner_id}"
+
+
+def get_versions(owner_id, kinds=VERSIONED_MODELS):
+    """Returns {'<kind>_version': value} for the template context, in one cache round trip."""
+    keys = {kind: version_key(kind, owner_id) for kind in kinds}
+    found = cache.get_many(keys.values())
+
+    versions = {}
+    for kind, key in keys.items():
+        if key not in found:
+            # add() so a concurrent bump from another process isn't overwritten
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[f"{kind}_version"] = found[key]
+    return versions
+
+
+def bump_version(kind, owner_id):
+    cache.set(version_key(kind, owner_id), time.time_ns(), None)
@@ -0,0 +1,148 @@
+"""
+Modification tracking for conditional GET (ETag / Last-Modified).
+
+Every model has an updated_at, but pages depend on more than one row, and a
+delete leaves no row behind to look at. So writes also "touch" the objects
+and the user the page is keyed on:
+
+    Student.updated_at  - the student or their enrollments, grades, attendance, payments
+    Course.updated_at   - the course or its enrollments, grades, attendance
+    LastChange          - anything of the user's (plus batch scoring)
+
+signals.py calls touch() on every save/delete; bulk writes that skip signals
+(Enrollment.recompute_averages, scoring) call it themselves. Touches are
+collected until the transaction commits and written with one UPDATE per
+table, so a view saving 500 grades costs three extra statements, not 1500.
+
+Views opt in with @conditional(stamp), where stamp(request, *args, **kwargs)
+returns the datetime the page was last affected by (or None to skip):
+
+    @login_required
+    @conditional(user_stamp)
+    def dashboard_home(request): ...
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import CohortState, Course, LastChange, Student
+
+
+class PendingTouches:
+    """Ids touched in the current transaction; called by on_commit to write them."""
+
+    def __init__(self):
+        self.users, self.students, self.courses = set(), set(), set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        now = timezone.now()
+        if self.students:
+            Student.objects.filter(pk__in=self.students).update(updated_at=now)
+        if self.courses:
+            Course.objects.filter(pk__in=self.courses).update(updated_at=now)
+        # Cascading user deletes touch users that are already gone
+        users = User.objects.filter(pk__in=self.users).values_list('pk', flat=True) if self.users else []
+        LastChange.objects.bulk_create(
+            [LastChange(user_id=pk, changed_at=now) for pk in users],
+            update_conflicts=True, unique_fields=['user'], update_fields=['changed_at'],
+        )
+
+
+def pending(using=None):
+    connection = transaction.get_connection(using)
+    batch = getattr(connection, 'pending_touches', None)
+    # A rolled-back transaction drops its on_commit callbacks, and the batch with them
+    if batch is None or batch.done or not any(callback is batch for _, callback, _ in connection.run_on_commit):
+        batch = connection.pending_touches = PendingTouches()
+        transaction.on_commit(batch, using=using)
+    return batch
+
+
+def touch(users=(), students=(), courses=()):
+    """Marks ids as changed as of the end of the current transaction (now, outside one)."""
+    in_transaction = transaction.get_connection().in_atomic_block
+    batch = pending() if in_transaction else PendingTouches()
+    batch.users.update(pk for pk in users if pk is not None)
+    batch.students.update(pk for pk in students if pk is not None)
+    batch.courses.update(pk for pk in courses if pk is not None)
+    if not in_transaction:
+        batch()
+
+
+def user_stamp(request, *args, **kwargs):
+    """When anything of the requesting user's last changed."""
+    return LastChange.objects.filter(user=request.user).values_list('changed_at', flat=True).first()
+
+
+def cohort_stamp(request, *args, **kwargs):
+    """Cohort cube pages: the user's last change (the page says when the cube is behind) or refresh."""
+    stamps = [user_stamp(request),
+              CohortState.objects.filter(user=request.user).values_list('refreshed_at', flat=True).first()]
+    return max(filter(None, stamps), default=None)
+
+
+def student_stamp(request, pk, **kwargs):
+    """Student profile: the student, the courses they take and their latest score."""
+    row = Student.objects.filter(pk=pk, user=request.user)\
+        .annotate(courses_changed=Max('enrollment__course__updated_at'))\
+        .values_list('updated_at', 'courses_changed', 'score__scored_at').first()
+    return max(filter(None, row)) if row else None
+
+
+def course_stamp(request, pk, **kwargs):
+    """Course pages: the course and the students enrolled in it (names appear on the page)."""
+    row = Course.objects.filter(pk=pk, user=request.user)\
+        .annotate(students_changed=Max('enrollment__student__updated_at'))\
+        .values_list('updated_at', 'students_changed').first()
+    return max(filter(None, row)) if row else None
+
+
+def page_etag(request, stamp):
+    # The CSRF secret is in the forms on the page, and "today" in date defaults
+    # and forecasts, so both are part of what makes a cached copy valid
+    parts = [
+        request.get_full_path(), str(request.user.pk), stamp.isoformat(),
+        request.META.get('CSRF_COOKIE', ''), timezone.localdate().isoformat(),
+    ]
+    return quote_etag(hashlib.sha1('|'.join(parts).encode()).hexdigest())
+
+
+def conditional(stamp_func):
+    """
+    Answers GET/HEAD with 304 when the client's ETag (or If-Modified-Since)
+    still matches `stamp_func`, without running the view. Responses are
+    marked private and must be revalidated, so browsers always ask.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Flash messages are rendered once; a 304 would swallow them
+            if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated \
+                    or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            stamp = stamp_func(request, *args, **kwargs)
+            if stamp is None:
+                return view(request, *args, **kwargs)
+
+            etag = page_etag(request, stamp)
+            last_modified = timegm(stamp.utctimetuple())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response.headers.setdefault('ETag', etag)
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
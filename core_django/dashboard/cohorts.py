@@ -0,0 +1,290 @@
+"""
+The cohort cube: enrollment analytics sliced by country, city, age band,
+course and month without scanning the raw tables.
+
+CohortCell holds one row per (cohort, course, month), where a cohort is the
+students of one country, city and age band, with additive measures:
+
+    students            students added that month (course is NULL)
+    enrollments         enrollments starting that month
+    grades/grade_total  grade records dated that month and their percentages
+    attendance_*        roll-calls that month, and how many were present
+    payments/revenue    payments that month (course is NULL)
+
+Any slice is a SUM over the matching cells grouped by one dimension (see
+cube_slice()); averages and rates are derived from the sums.
+
+refresh() updates a user's cube from the students whose updated_at moved
+since the last refresh. changes.py moves it on every write to their
+enrollments, grades, attendance and payments. Only their cohorts, old
+(from CohortMember) and new, are recomputed; every other cell is left
+alone. The first refresh, or one touching more than MAX_DIRTY_COHORTS
+cohorts or MAX_CHANGED_STUDENTS students, rebuilds the user's whole cube.
+
+Run with: python manage.py refresh_cohorts (nightly); the cohort page queues
+a refresh when the cube is older than the user's last change.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, FloatField, IntegerField, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Trim, TruncMonth
+from django.utils import timezone
+
+from .jobs import PRIORITY_LOW, enqueue
+from .models import (Attendance, CohortCell, CohortMember, CohortState, Course, Enrollment, GradeRecord, Job,
+                     LastChange, Payment, Student)
+
+DIMENSIONS = ['country', 'city', 'age_band', 'course', 'month']
+# Upper age bound (exclusive) of each band
+AGE_BANDS = [(18, 'Under 18'), (25, '18-24'), (35, '25-34'), (50, '35-49'), (None, '50+')]
+UNKNOWN_AGE = 'Unknown'
+# Past this many cohorts (or changed students) to recompute, one full rebuild is cheaper
+MAX_DIRTY_COHORTS = 200
+MAX_CHANGED_STUDENTS = 5000
+# Touches are timestamped before they commit; re-reading a short overlap catches late ones
+OVERLAP = datetime.timedelta(minutes=1)
+
+MEASURES = ['students', 'enrollments', 'grades', 'grade_total', 'attendance_total', 'attendance_present',
+            'payments', 'revenue']
+
+
+def age_band_expression(field):
+    """The AGE_BANDS label of an age column, in SQL."""
+    return Case(
+        When(**{f'{field}__isnull': True}, then=Value(UNKNOWN_AGE)),
+        *[When(**{f'{field}__lt': limit}, then=Value(label)) for limit, label in AGE_BANDS if limit is not None],
+        default=Value(AGE_BANDS[-1][1]),
+    )
+
+
+def cohort_columns(prefix=''):
+    """Annotations giving a row's cohort (of the student at `prefix`): cohort_country, cohort_city, cohort_age_band."""
+    return {
+        'cohort_country': Coalesce(Trim(f'{prefix}country'), Value('')),
+        'cohort_city': Coalesce(Trim(f'{prefix}city'), Value('')),
+        'cohort_age_band': age_band_expression(f'{prefix}age'),
+    }
+
+
+def cohort_filter(cohorts, prefix='cohort_'):
+    """
+    Q matching rows whose (country, city, age_band) is in `cohorts`: Student
+    rows annotated with cohort_columns(), or with prefix='' CohortCells.
+    """
+    condition = Q(pk__in=[])
+    for country, city, band in cohorts:
+        condition |= Q(**{f'{prefix}country': country, f'{prefix}city': city, f'{prefix}age_band': band})
+    return condition
+
+
+def fact_queries(students):
+    """
+    (queryset, student prefix, measure annotations) per fact table over the
+    facts of `students` (a Student queryset), each with `course_id` and a
+    `day` to group by. Days are the raw date columns: SQLite's TruncMonth is
+    a Python callback per row, which doubles the time over the attendance
+    table; build_cells() folds days into months instead.
+    """
+    percentage = Case(When(max_score__gt=0, then=F('score_obtained') * 100.0 / F('max_score')),
+                      default=Value(0.0), output_field=FloatField())
+    ids = students.values('pk')
+    no_course = Value(None, output_field=IntegerField())
+    return [
+        # One row per student anyway; a month per row costs little here
+        (Student.all_objects.filter(pk__in=ids).annotate(course_id=no_course, day=TruncMonth('date_added')),
+         '', {'students': Count('id')}),
+        (Enrollment.objects.filter(student__in=ids).annotate(day=F('start_date')),
+         'student__', {'enrollments': Count('id')}),
+        (GradeRecord.objects.filter(student__in=ids).annotate(day=F('date')),
+         'student__', {'grades': Count('id'), 'grade_total': Sum(percentage)}),
+        (Attendance.objects.filter(student__in=ids).annotate(day=F('date')),
+         'student__', {'attendance_total': Count('id'),
+                       'attendance_present': Count('id', filter=Q(status=Attendance.AttendanceStatus.PRESENT))}),
+        (Payment.objects.filter(student__in=ids).annotate(course_id=no_course, day=F('date_of_payment')),
+         'student__', {'payments': Count('id'), 'revenue': Sum('amount')}),
+    ]
+
+
+def month_start(value):
+    # TruncMonth of a DateTimeField is an aware datetime
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def build_cells(user, students):
+    """The cube cells of `students` (a Student queryset), unsaved."""
+    cells = {}
+    for queryset, prefix, measures in fact_queries(students):
+        rows = queryset.annotate(**cohort_columns(prefix))\
+            .values('cohort_country', 'cohort_city', 'cohort_age_band', 'course_id', 'day')\
+            .annotate(**measures).order_by()
+        for row in rows:
+            key = (row['cohort_country'], row['cohort_city'], row['cohort_age_band'], row['course_id'],
+                   month_start(row['day']))
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = {name: 0 for name in MEASURES}
+            for name in measures:
+                cell[name] += row[name] or 0
+    return [
+        CohortCell(user_id=user.pk, country=country, city=city, age_band=band, course_id=course_id, month=month,
+                   **values)
+        for (country, city, band, course_id, month), values in cells.items()
+    ]
+
+
+def member_rows(students):
+    return students.annotate(**cohort_columns())\
+        .values_list('pk', 'cohort_country', 'cohort_city', 'cohort_age_band', 'deleted_at')
+
+
+def rebuild(user):
+    """Recomputes a user's whole cube. Returns the number of cells written."""
+    students = Student.objects.filter(user=user)
+    with transaction.atomic():
+        CohortCell.objects.filter(user=user).delete()
+        CohortMember.objects.filter(user=user).delete()
+        CohortMember.objects.bulk_create([
+            CohortMember(student_id=pk, user_id=user.pk, country=country, city=city, age_band=band)
+            for pk, country, city, band, _ in member_rows(students).iterator(chunk_size=5000)
+        ], batch_size=1000)
+        cells = CohortCell.objects.bulk_create(build_cells(user, students), batch_size=1000)
+    return len(cells)
+
+
+def refresh(user, full=False):
+    """
+    Brings a user's cube up to date with the students changed since the last
+    refresh. Returns {'cohorts': recomputed cohorts (None for a rebuild), 'cells': cells written}.
+    """
+    started = timezone.now()
+    state, _ = CohortState.objects.get_or_create(user=user)
+    if full or state.refreshed_at is None:
+        result = {'cohorts': None, 'cells': rebuild(user)}
+    else:
+        result = refresh_changed(user, state.refreshed_at - OVERLAP)
+        if result is None:
+            result = {'cohorts': None, 'cells': rebuild(user)}
+    state.refreshed_at = started
+    state.save(update_fields=['refreshed_at'])
+    return result
+
+
+def refresh_changed(user, since):
+    """Recomputes the cohorts of students changed since `since`; None if a rebuild would be cheaper."""
+    members = CohortMember.objects.filter(user=user)
+    changed = list(member_rows(Student.all_objects.filter(user=user, updated_at__gte=since)))
+    # Hard-deleted students leave only their member row behind
+    gone = list(members.exclude(Exists(Student.all_objects.filter(pk=OuterRef('student_id'))))
+                .values_list('student_id', flat=True))
+    affected = [row[0] for row in changed] + gone
+    if len(affected) > MAX_CHANGED_STUDENTS:
+        return None
+
+    cohorts = set(members.filter(student_id__in=affected).values_list('country', 'city', 'age_band'))
+    live = [row for row in changed if row[4] is None]
+    cohorts.update((country, city, band) for _, country, city, band, _ in live)
+    if len(cohorts) > MAX_DIRTY_COHORTS:
+        return None
+
+    with transaction.atomic():
+        members.filter(student_id__in=affected).delete()
+        CohortMember.objects.bulk_create([
+            CohortMember(student_id=pk, user_id=user.pk, country=country, city=city, age_band=band)
+            for pk, country, city, band, _ in live
+        ], batch_size=1000)
+        CohortCell.objects.filter(user=user).filter(cohort_filter(cohorts, prefix='')).delete()
+        students = Student.objects.filter(user=user).annotate(**cohort_columns()).filter(cohort_filter(cohorts))
+        cells = CohortCell.objects.bulk_create(build_cells(user, students), batch_size=1000) if cohorts else []
+    return {'cohorts': len(cohorts), 'cells': len(cells)}
+
+
+def cube_status(user):
+    """{'refreshed_at', 'stale'}: stale when anything of the user's changed after the last refresh."""
+    refreshed_at = CohortState.objects.filter(user=user).values_list('refreshed_at', flat=True).first()
+    stale = refreshed_at is None or LastChange.objects.filter(user=user, changed_at__gt=refreshed_at).exists()
+    return {'refreshed_at': refreshed_at, 'stale': stale}
+
+
+def schedule_refresh(user):
+    """Queues a refresh_cohorts job for the user unless one is already waiting."""
+    if not Job.objects.filter(name='refresh_cohorts', user=user, status=Job.Status.QUEUED).exists():
+        enqueue('refresh_cohorts', user=user, priority=PRIORITY_LOW)
+
+
+def parse_filters(params):
+    """{dimension: value} from request parameters; unknown dimensions and bad values are dropped."""
+    filters = {}
+    for name in DIMENSIONS:
+        value = params.get(name)
+        if value is None:
+            continue
+        if name == 'course':
+            if value == '' or value.isdigit():
+                filters[name] = int(value) if value else None
+        elif name == 'month':
+            try:
+                filters[name] = datetime.datetime.strptime(value, '%Y-%m').date()
+            except ValueError:
+                pass
+        else:
+            filters[name] = value
+    return filters
+
+
+def cube_slice(user, filters=None, by='country'):
+    """
+    The cube summed over `filters` ({dimension: value}; course None means
+    "no course") and grouped by the `by` dimension:
+    {'by', 'filters', 'rows': [{'value', 'label', measures...}], 'totals'}.
+    """
+    filters = filters or {}
+    cells = CohortCell.objects.filter(user=user).filter(Q(course__isnull=True) | Q(course__deleted_at__isnull=True))
+    for name, value in filters.items():
+        cells = cells.filter(**({'course__isnull': True} if name == 'course' and value is None else {name: value}))
+
+    sums = {name: Sum(name) for name in MEASURES}
+    rows = []
+    for row in cells.values(by).annotate(**sums).order_by(by):
+        value = row.pop(by)
+        rows.append({'value': value, **measures(row)})
+    totals = measures(cells.aggregate(**sums))
+
+    labels = {}
+    if by == 'course':
+        labels = dict(Course.objects.filter(pk__in=[row['value'] for row in rows if row['value']])
+                      .values_list('pk', 'name'))
+    for row in rows:
+        row['label'] = label(by, row['value'], labels)
+    return {'by': by, 'filters': filters, 'rows': rows, 'totals': totals}
+
+
+def measures(sums):
+    """Summed measures plus the derived average grade and attendance rate, JSON-ready."""
+    sums = {name: sums.get(name) or 0 for name in MEASURES}
+    sums['revenue'] = float(sums['revenue'] or Decimal('0'))
+    sums['average_grade'] = round(sums['grade_total'] / sums['grades'], 1) if sums['grades'] else None
+    sums['attendance_rate'] = (round(sums['attendance_present'] / sums['attendance_total'] * 100, 1)
+                               if sums['attendance_total'] else None)
+    sums['grade_total'] = round(sums['grade_total'], 2)
+    return sums
+
+
+def label(dimension, value, course_names=None):
+    if dimension == 'course':
+        return (course_names or {}).get(value, 'Not course-specific') if value else 'Not course-specific'
+    if dimension == 'month':
+        return value.strftime('%b %Y')
+    return value or 'Unknown'
+
+
+def param(dimension, value):
+    """`value` as it goes back into a query string (see parse_filters())."""
+    if dimension == 'month':
+        return value.strftime('%Y-%m')
+    if value is None:
+        return ''
+    return str(value)
@@ -0,0 +1,158 @@
+"""
+Course statistics over enrollment averages and grade records.
+
+Enrollment.current_average and GradeRecord percentages for one course (or all
+of a user's courses) are loaded as flat arrays, one query per table, then
+summarized with NumPy: mean/median/stddev, percentiles, histograms with a
+configurable bin count, letter-grade bands and per-assessment difficulty.
+Everything returned is plain floats/ints/lists, so it can go straight into a
+template context or a JsonResponse.
+"""
+import numpy as np
+
+from .models import Course, Enrollment, GradeRecord
+
+PERCENTILES = (10, 25, 50, 75, 90)
+DEFAULT_BINS = 10
+MAX_BINS = 50
+PASS_MARK = 60
+
+# Lower edge of each letter band (same cut-offs the analytics page always used)
+GRADE_BANDS = [
+    ('A (90-100)', 90),
+    ('B (80-89)', 80),
+    ('C (70-79)', 70),
+    ('D (60-69)', 60),
+    ('F (<60)', None),
+]
+
+
+def as_float(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 2)
+
+
+def summarize(values, bins=DEFAULT_BINS):
+    """Descriptive statistics and a 0-100 histogram for an array of percentages."""
+    values = np.asarray(values, dtype=float)
+    edges = np.linspace(0, 100, bins + 1)
+    if not values.size:
+        return {
+            'count': 0, 'mean': None, 'median': None, 'std': None, 'min': None, 'max': None,
+            'percentiles': {f"p{p}": None for p in PERCENTILES},
+            'histogram': {'edges': edges.tolist(), 'counts': [0] * bins},
+        }
+
+    # Scores above 100 (extra credit) land in the top bin rather than falling off
+    counts, _ = np.histogram(np.clip(values, 0, 100), bins=edges)
+    return {
+        'count': int(values.size),
+        'mean': as_float(values.mean()),
+        'median': as_float(np.median(values)),
+        'std': as_float(values.std()),
+        'min': as_float(values.min()),
+        'max': as_float(values.max()),
+        'percentiles': {f"p{p}": as_float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+    }
+
+
+def grade_bands(values):
+    """Counts per letter band, in GRADE_BANDS order, as {label: count}."""
+    values = np.asarray(values, dtype=float)
+    cutoffs = [edge for _, edge in reversed(GRADE_BANDS) if edge is not None]  # [60, 70, 80, 90]
+    # digitize: 0 = below 60 (F) ... 4 = 90 and up (A)
+    counts = np.bincount(np.digitize(values, cutoffs), minlength=len(GRADE_BANDS))
+    return {label: int(count) for (label, _), count in zip(GRADE_BANDS, counts[::-1])}
+
+
+def assessment_difficulty(codes, percent, assessments):
+    """
+    Per-assessment stats from parallel arrays of assessment codes (indexes into
+    `assessments`, a list of (date, description)) and percentages, hardest
+    first. Difficulty is 1 - mean score as a fraction, so 0 means everybody
+    got full marks.
+    """
+    if not codes.size:
+        return []
+    present, inverse = np.unique(codes, return_inverse=True)
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=percent) / counts
+    passed = np.bincount(inverse, weights=(percent >= PASS_MARK).astype(float))
+    spread = np.sqrt(np.bincount(inverse, weights=(percent - means[inverse]) ** 2) / counts)
+
+    results = []
+    for j in np.argsort(means, kind='stable'):
+        day, description = assessments[present[j]]
+        results.append({
+            'description': description,
+            'date': day.isoformat(),
+            'count': int(counts[j]),
+            'mean': as_float(means[j]),
+            'std': as_float(spread[j]),
+            'pass_rate': as_float(passed[j] / counts[j] * 100),
+            'difficulty': as_float(1 - means[j] / 100),
+        })
+    return results
+
+
+def load_arrays(user, course=None):
+    """
+    Returns (enrollments, grades): enrollments is (course_ids, averages), grades is
+    (course_ids, assessment_codes, percentages, assessments) where each code
+    indexes the assessments list of (date, description) pairs.
+    """
+    enrollments = Enrollment.objects.filter(student__user=user)
+    grades = GradeRecord.objects.filter(user=user)
+    if course is not None:
+        enrollments = enrollments.filter(course=course)
+        grades = grades.filter(course=course)
+
+    enrollment_rows = list(enrollments.order_by().values_list('course_id', 'current_average'))
+    grade_rows = list(grades.order_by().values_list('course_id', 'date', 'description', 'score_obtained', 'max_score'))
+
+    e_course = np.array([row[0] for row in enrollment_rows], dtype=int)
+    e_average = np.array([row[1] for row in enrollment_rows], dtype=float)
+
+    g_course = np.array([row[0] for row in grade_rows], dtype=int)
+    code_of = {}
+    g_codes = np.array([code_of.setdefault((row[1], row[2]), len(code_of)) for row in grade_rows], dtype=int)
+    scores = np.array([row[3] for row in grade_rows], dtype=float)
+    max_scores = np.array([row[4] for row in grade_rows], dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Same rule as GradeRecord.get_percentage: a zero max score counts as 0%
+        g_percent = np.where(max_scores > 0, scores / max_scores * 100, 0.0)
+
+    return (e_course, e_average), (g_course, g_codes, g_percent, list(code_of))
+
+
+def course_statistics(user, course=None, bins=DEFAULT_BINS):
+    """
+    Statistics for one course, or for every course the user owns plus an
+    'overall' summary across all of them.
+    """
+    (e_course, e_average), (g_course, g_codes, g_percent, assessments) = load_arrays(user, course)
+    courses = [course] if course is not None else list(Course.objects.filter(user=user).order_by('name'))
+
+    results = []
+    for c in courses:
+        e_rows = e_course == c.pk
+        g_rows = g_course == c.pk
+        results.append({
+            'id': c.pk,
+            'name': c.name,
+            'averages': summarize(e_average[e_rows], bins),
+            'grade_bands': grade_bands(e_average[e_rows]),
+            'grades': summarize(g_percent[g_rows], bins),
+            'assessments': assessment_difficulty(g_codes[g_rows], g_percent[g_rows], assessments),
+        })
+
+    return {
+        'bins': bins,
+        'courses': results,
+        'overall': {
+            'averages': summarize(e_average, bins),
+            'grade_bands': grade_bands(e_average),
+            'grades': summarize(g_percent, bins),
+        },
+    }
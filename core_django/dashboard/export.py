@@ -0,0 +1,241 @@
+"""
+Columnar export of attendance, grades, enrollments and payments for
+offline analysis in pandas/NumPy.
+
+    python manage.py export_columns /data/export --user teacher
+    >>> df = load_table('/data/export', 'attendance')
+    >>> columns = load_columns('/data/export', 'attendance')  # memory-mapped arrays
+
+Rows are read with values_list() in id-ordered pages of `chunk_size`
+(keyset paging, no model instances), converted column by column to NumPy
+arrays and written as below. Dates and timestamps are selected as text and
+decimals as floats, so no per-value Python converter runs; NumPy parses
+whole columns of ISO strings in C.
+
+
+    npy      <dir>/<table>/<column>.npy, uncompressed; load_table() memory-maps them
+    npz      <dir>/<table>.npz, zip-compressed
+    parquet  <dir>/<table>.parquet, one row group per page (needs pyarrow)
+
+Text columns (status, description, reference_id, notes) are dictionary
+encoded in the NumPy formats: <column> holds int32 codes (-1 for NULL) and
+<column>_dict the distinct values, which load_table() turns into a pandas
+Categorical (Parquet dictionary-encodes them itself). Dates are
+datetime64[D], timestamps datetime64[us] in UTC and money float64.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from django.db import models
+from django.db.models.functions import Cast
+
+from .models import Attendance, Enrollment, GradeRecord, Payment
+
+CHUNK_SIZE = 50000
+FORMATS = ['npy', 'npz', 'parquet']
+DICT_SUFFIX = '_dict'
+
+# table -> model, the lookup that scopes rows to a user, and column -> values_list() lookup
+TABLES = {
+    'attendance': {
+        'model': Attendance,
+        'owner': 'user',
+        'columns': {'id': 'id', 'user': 'user_id', 'student': 'student_id', 'course': 'course_id',
+                    'date': 'date', 'status': 'status'},
+    },
+    'grades': {
+        'model': GradeRecord,
+        'owner': 'user',
+        'columns': {'id': 'id', 'user': 'user_id', 'student': 'student_id', 'course': 'course_id',
+                    'description': 'description', 'date': 'date', 'score_obtained': 'score_obtained',
+                    'max_score': 'max_score', 'created_at': 'created_at'},
+    },
+    'enrollments': {
+        'model': Enrollment,
+        'owner': 'student__user',
+        'columns': {'id': 'id', 'user': 'student__user_id', 'student': 'student_id', 'course': 'course_id',
+                    'start_date': 'start_date', 'current_average': 'current_average'},
+    },
+    'payments': {
+        'model': Payment,
+        'owner': 'user',
+        'columns': {'id': 'id', 'user': 'user_id', 'student': 'student_id', 'amount': 'amount',
+                    'date_of_payment': 'date_of_payment', 'reference_id': 'reference_id', 'notes': 'notes',
+                    'date_recorded': 'date_recorded'},
+    },
+}
+
+
+def column_kind(model, lookup):
+    """'int', 'float', 'date', 'datetime' or 'text' for a values_list() lookup."""
+    *path, name = lookup.split('__')
+    for step in path:
+        model = model._meta.get_field(step).related_model
+    field = model._meta.get_field(name)
+    if isinstance(field, (models.ForeignKey, models.IntegerField)):
+        return 'int'
+    if isinstance(field, (models.FloatField, models.DecimalField)):
+        return 'float'
+    if isinstance(field, models.DateTimeField):
+        return 'datetime'
+    if isinstance(field, models.DateField):
+        return 'date'
+    return 'text'
+
+
+def to_array(values, kind, dictionary=None):
+    """
+    One page of one column (an object array) as a typed array; text becomes
+    int32 codes into `dictionary` (value -> code), which grows as needed.
+    """
+    if kind == 'int':
+        return values.astype(np.int64)
+    if kind == 'float':
+        return values.astype(np.float64)
+    if kind == 'date':
+        return values.astype('datetime64[D]')
+    if kind == 'datetime':
+        # Stored in UTC; numpy has no time zones
+        return values.astype('datetime64[us]')
+    # Factorize the page in C, then map its few distinct values to the table-wide codes
+    codes, uniques = pd.factorize(values)
+    mapping = np.array([dictionary.setdefault(value, len(dictionary)) for value in uniques] + [-1], dtype=np.int32)
+    return mapping[codes]
+
+
+def selected(model, lookup):
+    """What values_list() selects for a column: dates as ISO text, decimals as floats."""
+    kind = column_kind(model, lookup)
+    if kind in ('date', 'datetime'):
+        return Cast(lookup, models.CharField())
+    if kind == 'float':
+        return Cast(lookup, models.FloatField())
+    return lookup
+
+
+def read_pages(table, users=None, chunk_size=CHUNK_SIZE):
+    """Yields pages of rows as 2-D object arrays, in id order, `chunk_size` rows at a time."""
+    spec = TABLES[table]
+    queryset = spec['model'].objects.all()
+    if users is not None:
+        queryset = queryset.filter(**{f"{spec['owner']}__in": users})
+    lookups = [selected(spec['model'], lookup) for lookup in spec['columns'].values()]
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*lookups)[:chunk_size])
+        if rows:
+            page = np.empty((len(rows), len(lookups)), dtype=object)
+            page[:] = rows
+            yield page
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def read_columns(table, users=None, chunk_size=CHUNK_SIZE):
+    """{column: array} for the whole table (of `users`), text columns with their <column>_dict."""
+    spec = TABLES[table]
+    names = list(spec['columns'])
+    kinds = [column_kind(spec['model'], lookup) for lookup in spec['columns'].values()]
+    dictionaries = {name: {} for name, kind in zip(names, kinds) if kind == 'text'}
+
+    chunks = {name: [] for name in names}
+    for page in read_pages(table, users, chunk_size):
+        for i, (name, kind) in enumerate(zip(names, kinds)):
+            chunks[name].append(to_array(page[:, i], kind, dictionaries.get(name)))
+
+    columns = {}
+    for name, kind in zip(names, kinds):
+        empty = to_array(np.empty(0, dtype=object), kind, {})
+        columns[name] = np.concatenate(chunks[name]) if chunks[name] else empty
+        if kind == 'text':
+            # Insertion order is code order
+            columns[name + DICT_SUFFIX] = np.array(list(dictionaries[name]), dtype=str)
+    return columns
+
+
+def write_parquet(table, path, users=None, chunk_size=CHUNK_SIZE):
+    """Streams the table into a Parquet file, one row group per page. Returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    spec = TABLES[table]
+    names = list(spec['columns'])
+    kinds = [column_kind(spec['model'], lookup) for lookup in spec['columns'].values()]
+    types = {'int': pa.int64(), 'float': pa.float64(), 'date': pa.date32(),
+             'datetime': pa.timestamp('us'), 'text': pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in zip(names, kinds)])
+
+    rows_written = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for page in read_pages(table, users, chunk_size):
+            arrays = [
+                pa.array(page[:, i] if kind == 'text' else to_array(page[:, i], kind), type=types[kind])
+                for i, kind in enumerate(kinds)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows_written += len(page)
+    return rows_written
+
+
+def export_table(table, directory, fmt='npy', users=None, chunk_size=CHUNK_SIZE):
+    """Writes one table under `directory` in `fmt`. Returns (path, rows)."""
+    if fmt == 'parquet':
+        path = os.path.join(directory, f"{table}.parquet")
+        return path, write_parquet(table, path, users, chunk_size)
+
+    columns = read_columns(table, users, chunk_size)
+    rows = len(columns['id'])
+    if fmt == 'npz':
+        path = os.path.join(directory, f"{table}.npz")
+        np.savez_compressed(path, **columns)
+    else:
+        path = os.path.join(directory, table)
+        os.makedirs(path, exist_ok=True)
+        for name, array in columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+    return path, rows
+
+
+def export(directory, tables=None, fmt='npy', users=None, chunk_size=CHUNK_SIZE):
+    """Exports `tables` (default: all) and writes manifest.json. Returns {table: rows}."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Available: {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table in tables or TABLES:
+        _, counts[table] = export_table(table, directory, fmt, users, chunk_size)
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump({'format': fmt, 'tables': counts, 'columns': {t: list(TABLES[t]['columns']) for t in counts}}, f, indent=2)
+    return counts
+
+
+def load_columns(directory, table):
+    """{column: array} of a NumPy export; npy exports are memory-mapped, not read."""
+    npz_path = os.path.join(directory, f"{table}.npz")
+    if os.path.exists(npz_path):
+        with np.load(npz_path) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+    else:
+        path = os.path.join(directory, table)
+        arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                  for name in os.listdir(path) if name.endswith('.npy')}
+    return arrays
+
+
+def load_table(directory, table):
+    """An exported table as a DataFrame, text columns as Categoricals."""
+    parquet_path = os.path.join(directory, f"{table}.parquet")
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path)
+
+    arrays = load_columns(directory, table)
+    data = {}
+    for name in TABLES[table]['columns']:
+        if name + DICT_SUFFIX in arrays:
+            data[name] = pd.Categorical.from_codes(arrays[name], categories=arrays[name + DICT_SUFFIX])
+        else:
+            data[name] = arrays[name]
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,50 @@
+"""
+The grade predictor's inputs, read from the StudentFeatures store.
+
+StudentFeatures holds each student's current feature vector, maintained by
+Student and Attendance writes (see models.py), so the student page, batch
+scoring (scoring.py) and training (train_grade_predictor) all read the same
+four stored columns and none of them aggregates attendance rows again.
+"""
+import numpy as np
+from django.db.models import Avg
+
+from .models import Enrollment, Student, StudentFeatures
+
+# Same columns, in the same order, the predictor was trained on
+FEATURES = ['attendance_rate', 'study_hours', 'previous_grade', 'payment_delays']
+
+
+def ensure_features(students):
+    """Builds the missing feature rows of `students` (created without save()). Returns how many."""
+    missing = students.filter(features__isnull=True).values('pk')
+    return StudentFeatures.rebuild(students=missing) if missing.exists() else 0
+
+
+def feature_vector(features):
+    """One student's row for model.predict(), from a StudentFeatures instance."""
+    return [[float(getattr(features, name)) for name in FEATURES]]
+
+
+def training_data(users=None):
+    """
+    (X, y) from students with grade records: X is their stored feature
+    vectors, y their average across enrollments.
+    """
+    students = Student.objects.filter(graderecord__isnull=False)
+    if users is not None:
+        students = students.filter(user__in=users)
+    ensure_features(students)
+
+    averages = dict(
+        Enrollment.objects.filter(student__in=students.values('pk')).values('student_id').order_by()
+        .annotate(average=Avg('current_average')).values_list('student_id', 'average')
+    )
+    rows = StudentFeatures.objects.filter(student__in=students.values('pk')).order_by('student_id')\
+        .values_list('student_id', *FEATURES)
+    X, y = [], []
+    for pk, *values in rows.iterator(chunk_size=5000):
+        if averages.get(pk) is not None:
+            X.append(values)
+            y.append(averages[pk])
+    return np.array(X, dtype=float).reshape(-1, len(FEATURES)), np.array(y, dtype=float)
@@ -0,0 +1,291 @@
+"""
+Revenue forecasting over the MonthlyRevenue rollup.
+
+All models work on a 2-D array of monthly series (one row per tenant), right
+aligned on the latest month with NaN before a tenant's first payment, so one
+call can forecast a single user or every user at once:
+
+  * linear    - least-squares trend line
+  * seasonal  - seasonal naive (same month last season), for term-start spikes
+  * smoothing - Holt's linear exponential smoothing, alpha/beta grid searched
+  * auto      - per series, whichever of the above had the lowest error on
+                the last few held-out months
+
+Prediction intervals are the usual normal approximations from each model's
+residual spread (roughly 95% with the default z).
+"""
+import hashlib
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import MonthlyRevenue
+
+METHODS = ('linear', 'seasonal', 'smoothing')
+SEASON_LENGTH = 12
+Z_95 = 1.96
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Smoothing parameter grid, searched for every series in one vectorized pass
+ALPHAS = np.linspace(0.1, 0.9, 9)
+BETAS = np.linspace(0.0, 0.5, 6)
+
+
+def masked_mean(values, axis):
+    """np.nanmean without the empty-slice warning: all-NaN rows give NaN."""
+    count = (~np.isnan(values)).sum(axis=axis)
+    total = np.nansum(values, axis=axis)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+# Models: Y is (n_series, n_months), returns (forecast, sigma) with shape (n_series, horizon)
+
+def linear_trend(Y, horizon):
+    valid = ~np.isnan(Y)
+    x = np.broadcast_to(np.arange(Y.shape[1], dtype=float), Y.shape)
+    y = np.where(valid, Y, 0.0)
+    xv = np.where(valid, x, 0.0)
+
+    n = valid.sum(axis=1)
+    sx, sy = xv.sum(axis=1), y.sum(axis=1)
+    sxy, sxx = (xv * y).sum(axis=1), (xv * xv).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = n * sxx - sx ** 2
+        slope = np.where(denom > 0, (n * sxy - sx * sy) / denom, 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, 0.0)
+
+        resid = np.where(valid, Y - (intercept[:, None] + slope[:, None] * x), 0.0)
+        sigma = np.sqrt((resid ** 2).sum(axis=1) / np.maximum(n - 2, 1))
+
+    future_x = np.arange(Y.shape[1], Y.shape[1] + horizon, dtype=float)
+    forecast = intercept[:, None] + slope[:, None] * future_x
+    return forecast, np.repeat(sigma[:, None], horizon, axis=1)
+
+
+def seasonal_naive(Y, horizon, season_length=SEASON_LENGTH):
+    n_months = Y.shape[1]
+    if n_months < season_length:
+        nan = np.full((Y.shape[0], horizon), np.nan)
+        return nan, nan
+
+    # Month h ahead repeats the value from the same position in the last full season
+    steps = np.arange(horizon)
+    forecast = Y[:, n_months - season_length + steps % season_length]
+
+    diffs = Y[:, season_length:] - Y[:, :-season_length]
+    sigma = np.sqrt(masked_mean(diffs ** 2, axis=1))
+    # Uncertainty grows with each extra season we project forward
+    return forecast, sigma[:, None] * np.sqrt(steps // season_length + 1)
+
+
+def holt_smoothing(Y, horizon):
+    n_series, n_months = Y.shape
+    alpha = ALPHAS[:, None]
+    beta = BETAS[None, :]
+    shape = (n_series, len(ALPHAS), len(BETAS))
+
+    level = np.full(shape, np.nan)
+    trend = np.zeros(shape)
+    sse = np.zeros(shape)
+    n_errors = np.zeros(n_series)
+
+    for t in range(n_months):
+        y = Y[:, t][:, None, None]
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level)
+
+        # One-step-ahead error for series that already have a level
+        step = observed & started
+        error = np.where(step, y - (level + trend), 0.0)
+        sse += error ** 2
+        n_errors += step[:, 0, 0]
+
+        new_level = alpha[None] * y + (1 - alpha[None]) * (level + trend)
+        new_trend = beta[None] * (new_level - level) + (1 - beta[None]) * trend
+        level = np.where(step, new_level, np.where(observed & ~started, y, level))
+        trend = np.where(step, new_trend, trend)
+
+    # Best (alpha, beta) per series
+    flat = sse.reshape(n_series, -1)
+    best = flat.argmin(axis=1)
+    rows = np.arange(n_series)
+    best_level = level.reshape(n_series, -1)[rows, best]
+    best_trend = trend.reshape(n_series, -1)[rows, best]
+    best_alpha = np.repeat(ALPHAS, len(BETAS))[best]
+    best_beta = np.tile(BETAS, len(ALPHAS))[best]
+    sigma = np.sqrt(flat[rows, best] / np.maximum(n_errors, 1))
+
+    steps = np.arange(1, horizon + 1)
+    forecast = best_level[:, None] + best_trend[:, None] * steps
+    # Var(h) = sigma^2 * (1 + sum_{j<h} (alpha * (1 + j * beta))^2)
+    j = np.arange(horizon)[None, :]
+    growth = (best_alpha[:, None] * (1 + j * best_beta[:, None])) ** 2
+    growth[:, 0] = 0.0
+    return forecast, sigma[:, None] * np.sqrt(1 + np.cumsum(growth, axis=1))
+
+
+def run_model(method, Y, horizon):
+    if method == 'linear':
+        return linear_trend(Y, horizon)
+    if method == 'seasonal':
+        return seasonal_naive(Y, horizon)
+    return holt_smoothing(Y, horizon)
+
+
+def pick_methods(Y, holdout=3):
+    """Returns the method index (into METHODS) with the lowest holdout MAE, per series."""
+    n_series, n_months = Y.shape
+    if n_months <= holdout + 2:
+        return np.zeros(n_series, dtype=int)  # Too short to compare: linear
+
+    train, actual = Y[:, :-holdout], Y[:, -holdout:]
+    errors = np.full((n_series, len(METHODS)), np.inf)
+    for i, method in enumerate(METHODS):
+        forecast, _ = run_model(method, train, holdout)
+        mae = masked_mean(np.abs(forecast - actual), axis=1)
+        errors[:, i] = np.where(np.isnan(mae), np.inf, mae)
+    return errors.argmin(axis=1)
+
+
+def forecast_matrix(Y, horizon=3, method='auto'):
+    """
+    Forecasts every row of Y. Returns a dict of arrays:
+    'method' (n_series,), and 'forecast', 'lower', 'upper' (n_series, horizon).
+    Revenue can't go negative, so everything is clipped at zero.
+    """
+    Y = np.asarray(Y, dtype=float)
+    n_series = Y.shape[0]
+
+    if method == 'auto':
+        choice = pick_methods(Y)
+    elif method in METHODS:
+        choice = np.full(n_series, METHODS.index(method))
+    else:
+        raise ValueError(f"Unknown forecast method '{method}'. Choose from: auto, {', '.join(METHODS)}")
+
+    forecast = np.zeros((n_series, horizon))
+    sigma = np.zeros((n_series, horizon))
+    for i, name in enumerate(METHODS):
+        rows = choice == i
+        if rows.any():
+            forecast[rows], sigma[rows] = run_model(name, Y[rows], horizon)
+
+    # Seasonal naive has gaps where last season had no data: fall back to the trend line
+    gaps = np.isnan(forecast).any(axis=1) & (choice != 0)
+    if gaps.any():
+        forecast[gaps], sigma[gaps] = linear_trend(Y[gaps], horizon)
+        choice = np.where(gaps, 0, choice)
+
+    # A series with no data at all forecasts zero
+    forecast = np.nan_to_num(forecast)
+    sigma = np.nan_to_num(sigma)
+    return {
+        'method': np.array(METHODS)[choice],
+        'forecast': np.clip(forecast, 0, None),
+        'lower': np.clip(forecast - Z_95 * sigma, 0, None),
+        'upper': np.clip(forecast + Z_95 * sigma, 0, None),
+    }
+
+
+# Loading series from the rollup
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_index(month):
+    return month.year * 12 + month.month - 1
+
+
+def load_series(user):
+    """Returns (months, totals) for a user with gaps between payments filled with 0."""
+    rows = list(MonthlyRevenue.objects.filter(user=user).order_by('month').values_list('month', 'total'))
+    if not rows:
+        return [], np.zeros(0)
+
+    first = rows[0][0]
+    n_months = month_index(rows[-1][0]) - month_index(first) + 1
+    totals = np.zeros(n_months)
+    for month, total in rows:
+        totals[month_index(month) - month_index(first)] = float(total)
+    return [add_months(first, i) for i in range(n_months)], totals
+
+
+def series_version(months, totals):
+    """Fingerprint of a series; any payment write changes it and so misses the cache."""
+    digest = hashlib.sha1()
+    digest.update(months[0].isoformat().encode() if months else b'')
+    digest.update(np.asarray(totals, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def forecast_user_revenue(user, horizon=3, method='auto'):
+    """
+    Forecasts the next `horizon` months of a user's revenue. Results are cached
+    per user and series version, so repeat page views skip the model fits.
+    """
+    months, totals = load_series(user)
+    key = f"revenue_forecast:{user.pk}:{method}:{horizon}:{series_version(months, totals)}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    if len(totals):
+        fitted = forecast_matrix(totals[None, :], horizon, method)
+        chosen = str(fitted['method'][0])
+        forecast, lower, upper = (fitted[k][0].tolist() for k in ('forecast', 'lower', 'upper'))
+    else:
+        chosen = 'linear'
+        forecast = lower = upper = [0.0] * horizon
+
+    start = add_months(months[-1], 1) if months else None
+    result = {
+        'history_months': months,
+        'history': totals.tolist(),
+        'months': [add_months(start, i) for i in range(horizon)] if start else [],
+        'method': chosen,
+        'forecast': forecast,
+        'lower': lower,
+        'upper': upper,
+    }
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def forecast_all_users(horizon=3, method='auto'):
+    """
+    Batch forecast for every tenant from a single rollup query, e.g. for an
+    admin overview. Returns {user_id: {'method', 'forecast', 'lower', 'upper'}}.
+    """
+    rows = list(MonthlyRevenue.objects.order_by('user_id', 'month').values_list('user_id', 'month', 'total'))
+    if not rows:
+        return {}
+
+    user_ids = sorted({user_id for user_id, _, _ in rows})
+    row_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    first = min(month_index(month) for _, month, _ in rows)
+    last = max(month_index(month) for _, month, _ in rows)
+
+    # Each tenant is NaN before its first payment month and 0 in gaps after it
+    Y = np.full((len(user_ids), last - first + 1), np.nan)
+    starts = {}
+    for user_id, month, total in rows:
+        starts.setdefault(user_id, month_index(month) - first)
+        Y[row_of[user_id], month_index(month) - first] = float(total)
+    for user_id, start in starts.items():
+        row = Y[row_of[user_id], start:]
+        row[np.isnan(row)] = 0.0
+
+    fitted = forecast_matrix(Y, horizon, method)
+    return {
+        user_id: {
+            'method': str(fitted['method'][i]),
+            'forecast': fitted['forecast'][i].tolist(),
+            'lower': fitted['lower'][i].tolist(),
+            'upper': fitted['upper'][i].tolist(),
+        }
+        for i, user_id in enumerate(user_ids)
+    }
@@ -0,0 +1,166 @@
+"""
+Student x assessment gradebook matrix for a course.
+
+All GradeRecord rows for the course come back in one query and are pivoted
+into a dense (n_students, n_assessments) array of percentages with NaN where
+a student has no grade. An assessment is a (date, description) pair; several
+records in the same cell are averaged, the same way Enrollment.update_average
+treats repeated entries.
+
+The result is cached under the course's 'grades' version and the owner's
+'student' version (see caching.py), so it is only rebuilt after a grade,
+enrollment or student name for that course changes.
+"""
+import warnings
+
+import numpy as np
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .caching import get_versions
+from .models import Enrollment, GradeRecord
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def pivot(row_ids, col_keys, rows, cols, values):
+    """
+    Averages `values` into a (len(row_ids), len(col_keys)) matrix.
+    rows/cols are integer positions per value; empty cells are NaN.
+    """
+    shape = (len(row_ids), len(col_keys))
+    totals = np.zeros(shape)
+    counts = np.zeros(shape)
+    np.add.at(totals, (rows, cols), values)
+    np.add.at(counts, (rows, cols), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def nan_stats(matrix, axis):
+    """mean/median/min/max/std/count along an axis; empty slices give NaN."""
+    n_out = matrix.shape[1 - axis]
+    if matrix.shape[axis] == 0:
+        nan = np.full(n_out, np.nan)
+        return {'mean': nan, 'median': nan, 'min': nan, 'max': nan, 'std': nan, 'count': np.zeros(n_out, dtype=int)}
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN slices
+        return {
+            'mean': np.nanmean(matrix, axis=axis),
+            'median': np.nanmedian(matrix, axis=axis),
+            'min': np.nanmin(matrix, axis=axis),
+            'max': np.nanmax(matrix, axis=axis),
+            'std': np.nanstd(matrix, axis=axis),
+            'count': (~np.isnan(matrix)).sum(axis=axis),
+        }
+
+
+def display(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def cell_html(value):
+    # Cells are plain numbers, so they are rendered here instead of in a
+    # template loop; 30k {% if %} blocks per page cost well over a second
+    if value is None:
+        return '<td class="text-muted">-</td>'
+    if value < 60:
+        return f'<td class="text-danger">{value}</td>'
+    return f'<td>{value}</td>'
+
+
+def build_matrix(course):
+    """Loads the roster and grade records (one query each) and pivots them."""
+    students = list(
+        Enrollment.objects.filter(course=course)
+        .order_by('student__last_name', 'student__first_name')
+        .values_list('id', 'student_id', 'student__first_name', 'student__last_name', 'student__student_id')
+    )
+    records = list(
+        GradeRecord.objects.filter(user_id=course.user_id, course=course)
+        .order_by()
+        .values_list('student_id', 'date', 'description', 'score_obtained', 'max_score')
+    )
+
+    row_of = {student_id: i for i, (_, student_id, _, _, _) in enumerate(students)}
+    # Records for students no longer enrolled don't get a row
+    records = [r for r in records if r[0] in row_of]
+    assessments = sorted({(day, description) for _, day, description, _, _ in records})
+    col_of = {key: j for j, key in enumerate(assessments)}
+
+    if records:
+        student_ids, days, descriptions, scores, max_scores = zip(*records)
+        scores = np.array(scores, dtype=float)
+        max_scores = np.array(max_scores, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Same rule as GradeRecord.get_percentage: a zero max score counts as 0%
+            percent = np.where(max_scores > 0, scores / max_scores * 100, 0.0)
+        rows = np.array([row_of[s] for s in student_ids], dtype=int)
+        cols = np.array([col_of[key] for key in zip(days, descriptions)], dtype=int)
+    else:
+        percent = np.zeros(0)
+        rows = cols = np.zeros(0, dtype=int)
+
+    matrix = pivot(students, assessments, rows, cols, percent)
+    result = {
+        'students': [
+            {'enrollment_id': enrollment_id, 'id': pk, 'name': f"{first} {last}", 'student_id': code}
+            for enrollment_id, pk, first, last, code in students
+        ],
+        'assessments': [{'date': day, 'description': description} for day, description in assessments],
+        'matrix': matrix,
+        'by_student': nan_stats(matrix, axis=1),
+        'by_assessment': nan_stats(matrix, axis=0),
+    }
+    # Display rows are built once here and cached with the arrays
+    result['rows'] = table_rows(result)
+    result['assessment_rows'] = assessment_rows(result)
+    return result
+
+
+def matrix_version(course):
+    grades = get_versions(course.pk, kinds=('grades',))['grades_version']
+    students = get_versions(course.user_id, kinds=('student',))['student_version']
+    return f"{grades}.{students}"
+
+
+def course_matrix(course, version=None):
+    """Cached build_matrix(); misses after any grade/enrollment/student write for the course."""
+    version = version or matrix_version(course)
+    key = f"gradebook_matrix:{course.pk}:{version}"
+    result = cache.get(key)
+    if result is None:
+        result = build_matrix(course)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def table_rows(result):
+    """One row per student: rounded cells plus their own mean and missing count."""
+    stats = result['by_student']
+    n_assessments = len(result['assessments'])
+    rows = []
+    for i, student in enumerate(result['students']):
+        cells = [display(v) for v in result['matrix'][i]]
+        rows.append({
+            'student': student,
+            'cells': cells,
+            'cells_html': mark_safe(''.join(cell_html(v) for v in cells)),
+            'mean': display(stats['mean'][i]),
+            'missing': n_assessments - int(stats['count'][i]),
+        })
+    return rows
+
+
+def assessment_rows(result):
+    """Per-assessment summary, used for the footer rows and the difficulty ranking."""
+    stats = result['by_assessment']
+    return [
+        {
+            'assessment': assessment,
+            **{name: display(stats[name][j]) for name in ('mean', 'median', 'min', 'max', 'std')},
+            'count': int(stats['count'][j]),
+        }
+        for j, assessment in enumerate(result['assessments'])
+    ]
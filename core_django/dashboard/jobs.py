@@ -0,0 +1,202 @@
+"""
+Database-backed job queue: no broker, just the Job table.
+
+    @task('recompute_averages')
+    def recompute_averages(job):
+        ...
+
+    enqueue('recompute_averages', {'enrollment_ids': [1, 2]}, user=request.user)
+
+Workers (`python manage.py run_jobs --concurrency 4`) claim the highest
+priority job whose run_after has passed, run the registered function and
+store its return value in Job.result. A job that raises is retried with
+exponential backoff until max_attempts, then marked failed.
+
+While a job runs, a heartbeat thread moves its locked_at forward every
+HEARTBEAT, so however long it takes it never looks abandoned. A job whose
+locked_at is older than STALE_AFTER lost its worker (killed, out of
+memory) and is claimed again, counting as an attempt; once it is out of
+attempts it is marked failed instead, so a job that kills its worker can't
+loop forever.
+
+Claiming happens inside a write transaction; on SQLite that is BEGIN
+IMMEDIATE (see settings), so two workers can never claim the same row.
+"""
+import datetime
+import logging
+import os
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+RETRY_DELAY = 30  # seconds, doubled on every further attempt
+HEARTBEAT = datetime.timedelta(minutes=1)
+STALE_AFTER = 5 * HEARTBEAT
+
+TASKS = {}
+
+
+def task(name):
+    """Registers a function as the handler for jobs called `name`. It receives the Job."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, user=None, priority=PRIORITY_NORMAL, delay=0, max_attempts=3):
+    """
+    Queues a job and returns it. Inside a transaction the row commits with
+    it, so a worker never picks up work whose data was rolled back.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown job '{name}'. Registered: {', '.join(sorted(TASKS))}")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker=None):
+    """Marks the next runnable job as running and returns it, or None if there is nothing to do."""
+    now = timezone.now()
+    stale = Q(status=Job.Status.RUNNING, locked_at__lt=now - STALE_AFTER)
+    runnable = Q(status=Job.Status.QUEUED, run_after__lte=now) | (stale & Q(attempts__lt=F('max_attempts')))
+
+    with transaction.atomic():
+        Job.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+            status=Job.Status.FAILED,
+            error=Concat(Value('Worker '), F('locked_by'), Value(' stopped responding and no attempts are left.')),
+            finished_at=now,
+            locked_by='',
+            locked_at=None,
+        )
+        job = Job.objects.select_for_update(skip_locked=True)\
+            .filter(runnable).order_by('-priority', 'run_after', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.Status.RUNNING
+        job.locked_by = worker or worker_name()
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_by', 'locked_at', 'attempts'])
+    return job
+
+
+def beat(job):
+    """Moves a running job's locked_at to now, unless another worker has claimed it since."""
+    return Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=job.locked_by)\
+        .update(locked_at=timezone.now()) > 0
+
+
+@contextmanager
+def heartbeat(job):
+    """beat()s every HEARTBEAT from a background thread while the block runs."""
+    stopped = threading.Event()
+
+    def loop():
+        try:
+            while not stopped.wait(HEARTBEAT.total_seconds()):
+                try:
+                    beat(job)
+                except OperationalError:
+                    # The job itself holds the write lock; the next beat will do
+                    logger.warning("Heartbeat for job %s skipped: database busy", job)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=loop, name=f"heartbeat-{job.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run(job):
+    """
+    Runs a claimed job and records the outcome, unless the job was reclaimed
+    by another worker meanwhile (then that worker owns it). Returns the job.
+    """
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"No task registered for '{job.name}'")
+        with heartbeat(job):
+            result = func(job)
+        # A result the JSON column can't store fails the job here, not in the save below
+        Job._meta.get_field('result').get_db_prep_save(result, connection)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            logger.warning("Job %s failed (attempt %s/%s), retrying", job, job.attempts, job.max_attempts)
+            job.status = Job.Status.QUEUED
+            job.run_after = timezone.now() + datetime.timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            logger.error("Job %s failed permanently:\n%s", job, job.error)
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.Status.DONE
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+    worker = job.locked_by
+    job.locked_by = ''
+    job.locked_at = None
+    fields = ['status', 'result', 'error', 'run_after', 'finished_at', 'locked_by', 'locked_at']
+    saved = Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=worker)\
+        .update(**{field: getattr(job, field) for field in fields})
+    if not saved:
+        logger.warning("Job %s was reclaimed from %s while it ran; its outcome is dropped", job, worker)
+    return job
+
+
+def run_pending(limit=None, worker=None):
+    """Claims and runs jobs until the queue is empty (or `limit` jobs). Returns how many ran."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        count += 1
+    return count
+
+
+def as_dict(job):
+    """Status payload for the polling endpoint."""
+    return {
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,192 @@
+"""
+Incremental updates of the grade predictor, without retraining.
+
+The predictor is an ordinary least-squares fit, and least squares only
+needs two sums over the training rows: XᵀX and Xᵀy (X with a column of
+ones for the intercept). PredictorStats keeps them, so folding in new
+outcomes costs O(rows added) and refitting is a 5x5 solve, however much
+history has accumulated.
+
+An outcome is an enrollment whose course has ended and that has grades:
+the student's StudentFeatures vector against the enrollment's average,
+saved as a GradeOutcome. If the average changes later (a late grade, a
+correction) the old row is subtracted from the sums and the new one added.
+
+publish() bumps PredictorStats.version and writes the refitted model next
+to the artifact; only once that transaction commits is the file
+os.replace()d in, so a rolled-back bump never leaves a newer model behind
+an older version. scoring.load_model() sees the new file and reloads it, so web and worker
+processes switch models without a restart and never read half a file.
+
+Run with: python manage.py update_grade_predictor (nightly, as courses end);
+grade changes in ended courses also queue it (schedule_update()).
+"""
+import os
+import tempfile
+
+import joblib
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from sklearn.linear_model import LinearRegression
+
+from .features import FEATURES, ensure_features
+from .jobs import PRIORITY_LOW, enqueue
+from .models import Enrollment, GradeOutcome, GradeRecord, Job, PredictorStats, Student
+from .scoring import MODEL_PATH
+
+STATS_NAME = 'grade_predictor'
+CHUNK_SIZE = 1000
+# With fewer outcomes than this the fit is mostly noise; the current model stays
+MIN_SAMPLES = 30
+DIMENSIONS = len(FEATURES) + 1  # the features plus the intercept
+
+
+def finalized_enrollments(today=None):
+    """Graded enrollments of courses that have ended: the outcomes the predictor learns from."""
+    graded = GradeRecord.objects.filter(student=OuterRef('student_id'), course=OuterRef('course_id'))
+    return Enrollment.objects.filter(
+        Exists(graded), course__end_date__lt=today or timezone.localdate(),
+        course__deleted_at__isnull=True, student__deleted_at__isnull=True,
+    )
+
+
+def pending_outcomes(today=None):
+    """Finalized enrollments not folded in yet, or changed since they were."""
+    folded = GradeOutcome.objects.filter(enrollment_id=OuterRef('pk'), folded_at__gte=OuterRef('updated_at'))
+    return finalized_enrollments(today).exclude(Exists(folded))
+
+
+def design_matrix(rows):
+    """Feature tuples -> X with a leading column of ones."""
+    X = np.array(rows, dtype=float).reshape(-1, len(FEATURES))
+    return np.column_stack([np.ones(len(X)), X])
+
+
+def get_stats(lock=False):
+    queryset = PredictorStats.objects.select_for_update() if lock else PredictorStats.objects
+    stats, _ = queryset.get_or_create(name=STATS_NAME, defaults={
+        'xtx': np.zeros((DIMENSIONS, DIMENSIONS)).tolist(), 'xty': np.zeros(DIMENSIONS).tolist(),
+    })
+    return stats
+
+
+def fold(enrollment_ids):
+    """Adds enrollments' outcomes to the statistics, replacing earlier versions of them. Returns how many."""
+    ensure_features(Student.objects.filter(enrollment__in=enrollment_ids))
+    with transaction.atomic():
+        stats = get_stats(lock=True)
+        rows = list(Enrollment.objects.filter(pk__in=enrollment_ids).values_list(
+            'pk', 'current_average', *(f'student__features__{name}' for name in FEATURES),
+        ))
+        previous = list(GradeOutcome.objects.filter(enrollment_id__in=[row[0] for row in rows])
+                        .values_list('grade', *FEATURES))
+
+        xtx, xty = np.array(stats.xtx), np.array(stats.xty)
+        if previous:
+            X_old = design_matrix([row[1:] for row in previous])
+            xtx -= X_old.T @ X_old
+            xty -= X_old.T @ np.array([row[0] for row in previous])
+        X = design_matrix([row[2:] for row in rows])
+        xtx += X.T @ X
+        xty += X.T @ np.array([row[1] for row in rows], dtype=float)
+
+        now = timezone.now()
+        GradeOutcome.objects.bulk_create(
+            [GradeOutcome(enrollment_id=row[0], grade=row[1], folded_at=now, **dict(zip(FEATURES, row[2:])))
+             for row in rows],
+            update_conflicts=True, unique_fields=['enrollment_id'], update_fields=['grade', 'folded_at', *FEATURES],
+        )
+        stats.samples += len(rows) - len(previous)
+        stats.xtx, stats.xty = xtx.tolist(), xty.tolist()
+        stats.save()
+    return len(rows)
+
+
+def solve(stats):
+    """(coef, intercept) of the least-squares fit the statistics describe."""
+    # lstsq rather than solve: a feature that hasn't varied yet leaves XᵀX singular
+    beta = np.linalg.lstsq(np.array(stats.xtx), np.array(stats.xty), rcond=None)[0]
+    return beta[1:], beta[0]
+
+
+def build_model(coef, intercept):
+    """A fitted LinearRegression with the given parameters, interchangeable with a trained one."""
+    model = LinearRegression()
+    model.coef_, model.intercept_ = np.asarray(coef, dtype=float), float(intercept)
+    model.n_features_in_ = len(FEATURES)
+    model.feature_names_in_ = np.array(FEATURES, dtype=object)
+    return model
+
+
+def stage_model(model, path):
+    """Pickles `model` to a temporary file next to `path` and returns its name, ready to os.replace() in."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.pkl.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def save_model(model, path):
+    """Pickles `model` to `path` via a temporary file and a rename, so readers see the old or the new file."""
+    os.replace(stage_model(model, path), path)
+
+
+def publish(path=MODEL_PATH, min_samples=MIN_SAMPLES):
+    """
+    Refits from the statistics and, once the new version has committed, swaps
+    the model file. Returns the new version, or None if too few samples.
+    """
+    staged = None
+    try:
+        with transaction.atomic():
+            # The row lock orders concurrent publishers, so an older fit never replaces a newer one
+            stats = get_stats(lock=True)
+            if stats.samples < min_samples:
+                return None
+            staged = stage_model(build_model(*solve(stats)), path)
+            stats.version += 1
+            stats.published_at = timezone.now()
+            stats.save(update_fields=['version', 'published_at', 'updated_at'])
+            # Runs straight after COMMIT, before the next publisher can take the lock and refit
+            transaction.on_commit(lambda: os.replace(staged, path))
+    except BaseException:
+        # Rolled back, the bump included: the old file and version stay
+        if staged and os.path.exists(staged):
+            os.unlink(staged)
+        raise
+    return stats.version
+
+
+def reset():
+    """Forgets every outcome; the next update refolds all finalized enrollments."""
+    with transaction.atomic():
+        GradeOutcome.objects.all().delete()
+        stats = get_stats(lock=True)
+        stats.samples = 0
+        stats.xtx, stats.xty = np.zeros((DIMENSIONS, DIMENSIONS)).tolist(), np.zeros(DIMENSIONS).tolist()
+        stats.save()
+
+
+def update_predictor(path=MODEL_PATH, min_samples=MIN_SAMPLES, chunk_size=CHUNK_SIZE, today=None):
+    """
+    Folds every pending outcome in, chunk_size per transaction, and publishes
+    if anything changed. Returns {'folded', 'samples', 'version'}; version is
+    None when nothing was published.
+    """
+    ids = list(pending_outcomes(today).order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), chunk_size):
+        fold(ids[start:start + chunk_size])
+    version = publish(path, min_samples) if ids else None
+    return {'folded': len(ids), 'samples': get_stats().samples, 'version': version}
+
+
+def schedule_update(user=None):
+    """Queues an update_grade_predictor job unless one is already waiting."""
+    if not Job.objects.filter(name='update_grade_predictor', status=Job.Status.QUEUED).exists():
+        enqueue('update_grade_predictor', user=user, priority=PRIORITY_LOW)
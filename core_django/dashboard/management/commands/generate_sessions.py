@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from dashboard.changes import touch
+from dashboard.management.users import named_users
+from dashboard.models import ClassSession, Course
+
+
+class Command(BaseCommand):
+    help = ("Generates ClassSession rows from course schedules. Run nightly: courses without an end_date "
+            "only have sessions up to a rolling horizon.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only this user's courses (repeatable). Default: everyone.")
+        parser.add_argument('--recount', action='store_true',
+                            help="Also recompute roll-call counts from the Attendance table.")
+
+    def handle(self, *args, **options):
+        # Ended courses already have their whole calendar
+        courses = Course.objects.filter(Q(end_date__isnull=True) | Q(end_date__gte=timezone.localdate()))
+        sessions = ClassSession.objects.all()
+        if options['usernames']:
+            users = named_users(options['usernames'])
+            courses = courses.filter(user__in=users)
+            sessions = sessions.filter(user__in=users)
+
+        added = removed = 0
+        user_ids = set()
+        for course in courses.iterator(chunk_size=500):
+            course_added, course_removed = ClassSession.generate(course)
+            added += course_added
+            removed += course_removed
+            if course_added or course_removed:
+                user_ids.add(course.user_id)
+        touch(users=user_ids)
+
+        message = f"Generated class sessions: {added} added, {removed} removed."
+        if options['recount']:
+            message += f" Recounted {ClassSession.recount(sessions)} sessions."
+        self.stdout.write(self.style.SUCCESS(message))
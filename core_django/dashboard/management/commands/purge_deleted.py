@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.management.users import named_users
+from dashboard.purge import CHUNK_SIZE, PAUSE, purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Permanently removes soft-deleted students and courses, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only purge this user's rows (repeatable). Default: everyone.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f"Rows deleted per transaction (default: {CHUNK_SIZE}).")
+        parser.add_argument('--pause', type=float, default=PAUSE,
+                            help=f"Seconds to release the write lock between batches (default: {PAUSE}).")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = named_users(options['usernames'])
+
+        totals = purge_deleted(users, chunk_size=options['chunk_size'], pause=options['pause'])
+        if not totals:
+            self.stdout.write("Nothing to purge.")
+            return
+        for table, count in sorted(totals.items()):
+            self.stdout.write(f"  {table}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Purged {sum(totals.values())} rows."))
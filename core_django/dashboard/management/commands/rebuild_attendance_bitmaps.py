@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.models import AttendanceBitmap, Course
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the AttendanceBitmap table from the Attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', action='append', dest='course_ids', type=int, metavar='COURSE_ID',
+                            help="Only rebuild this course's bitmaps (repeatable). Default: all courses.")
+
+    def handle(self, *args, **options):
+        courses = None
+        if options['course_ids']:
+            courses = Course.objects.filter(pk__in=options['course_ids'])
+
+        written = AttendanceBitmap.rebuild(courses)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt attendance bitmaps: {written} student/course rows."))
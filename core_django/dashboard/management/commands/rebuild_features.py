@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.management.users import named_users
+from dashboard.models import StudentFeatures
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the StudentFeatures table from the Student and Attendance tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only rebuild this user's students (repeatable). Default: everyone.")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = named_users(options['usernames'])
+
+        written = StudentFeatures.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt student features: {written} rows."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.management.users import named_users
+from dashboard.models import MonthlyRevenue
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the MonthlyRevenue rollup from the Payment table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only rebuild this user's months (repeatable). Default: all users.")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = named_users(options['usernames'])
+
+        written = MonthlyRevenue.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt revenue rollup: {written} month rows."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreates the student FTS5 search index and its sync triggers, then reindexes every student."
+
+    def handle(self, *args, **options):
+        install_search_index()
+        self.stdout.write(self.style.SUCCESS("Student search index rebuilt."))
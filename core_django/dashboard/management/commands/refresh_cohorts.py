@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from dashboard.cohorts import refresh
+from dashboard.management.users import named_users
+from dashboard.models import Student
+
+
+class Command(BaseCommand):
+    help = "Brings the cohort cube up to date with the students changed since its last refresh (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only refresh this user's cube (repeatable). Default: everyone with students.")
+        parser.add_argument('--full', action='store_true', help="Rebuild the cubes from scratch.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(pk__in=Student.all_objects.values('user_id'))
+        if options['usernames']:
+            users = named_users(options['usernames'])
+
+        for user in users:
+            result = refresh(user, full=options['full'])
+            scope = "rebuilt" if result['cohorts'] is None else f"{result['cohorts']} cohorts recomputed"
+            self.stdout.write(f"{user.username}: {scope}, {result['cells']} cells written.")
+        self.stdout.write(self.style.SUCCESS("Cohort cube refreshed."))
@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from dashboard import jobs
+
+
+def work(poll_interval, once, max_jobs):
+    """One worker's loop: drain the queue, then poll every `poll_interval` seconds."""
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        close_old_connections()
+        ran = jobs.run_pending(limit=1)
+        done += ran
+        if not ran:
+            if once:
+                break
+            time.sleep(poll_interval)
+    return done
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs from the Job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="Worker processes to run (default: 1, in this process).")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit when the queue is empty instead of polling.")
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help="Exit after this many jobs per worker (e.g. to recycle memory).")
+
+    def handle(self, *args, **options):
+        worker_args = (options['poll_interval'], options['once'], options['max_jobs'])
+
+        if options['concurrency'] <= 1:
+            done = work(*worker_args)
+            self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs."))
+            return
+
+        # Forked workers must not share the parent's open database connections
+        connections.close_all()
+        workers = [multiprocessing.Process(target=work, args=worker_args, daemon=True)
+                   for _ in range(options['concurrency'])]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} workers.")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.management.users import named_users
+from dashboard.scoring import CHUNK_SIZE, MODEL_PATH, score_students
+
+
+class Command(BaseCommand):
+    help = "Scores every student with the grade predictor and stores the results in StudentScore (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only score this user's students (repeatable). Default: all users.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker processes (default: one per CPU; 1 runs in-process).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Maximum students per partition.")
+        parser.add_argument('--model', default=MODEL_PATH,
+                            help="Path to the joblib grade predictor (default: ml_engine/grade_predictor.pkl).")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = named_users(options['usernames'])
+
+        started = time.perf_counter()
+        try:
+            scored, chunks = score_students(users, workers=options['workers'], chunk_size=options['chunk_size'],
+                                            model_path=options['model'])
+        except (OSError, EOFError) as exc:
+            raise CommandError(f"Could not load the grade predictor from {options['model']}: {exc}. "
+                               "Train it with ml_engine/train_grade_predictor.py.")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} students in {chunks} partitions in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,34 @@
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.linear_model import LinearRegression
+
+from dashboard.features import FEATURES, training_data
+from dashboard.learning import save_model
+from dashboard.management.users import named_users
+from dashboard.scoring import MODEL_PATH
+
+
+class Command(BaseCommand):
+    help = ("Trains the grade predictor on the stored student features and real course averages "
+            "(ml_engine/train_grade_predictor.py trains it on synthetic data instead).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only train on this user's students (repeatable). Default: everyone.")
+        parser.add_argument('--output', default=MODEL_PATH,
+                            help="Where to write the model (default: ml_engine/grade_predictor.pkl).")
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = named_users(options['usernames'])
+
+        X, y = training_data(users)
+        if len(y) <= len(FEATURES):
+            raise CommandError(f"Only {len(y)} students with grades; need more than {len(FEATURES)} to train.")
+
+        model = LinearRegression().fit(pd.DataFrame(X, columns=FEATURES), y)
+        save_model(model, options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {len(y)} students. Coefficients: {dict(zip(FEATURES, (round(float(c), 3) for c in model.coef_)))}"
+        ))
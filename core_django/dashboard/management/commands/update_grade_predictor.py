@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.learning import CHUNK_SIZE, MIN_SAMPLES, reset, update_predictor
+from dashboard.scoring import MODEL_PATH
+
+
+class Command(BaseCommand):
+    help = ("Folds the outcomes of ended courses into the grade predictor's statistics and publishes "
+            "the refitted model, without retraining from scratch (run nightly).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=MODEL_PATH,
+                            help="Model file to replace (default: ml_engine/grade_predictor.pkl).")
+        parser.add_argument('--min-samples', type=int, default=MIN_SAMPLES,
+                            help=f"Keep the current model until this many outcomes are folded in (default: {MIN_SAMPLES}).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f"Outcomes folded per transaction (default: {CHUNK_SIZE}).")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Forget the folded outcomes and refold every ended course's enrollments.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset()
+        result = update_predictor(options['output'], options['min_samples'], options['chunk_size'])
+        if result['version'] is None:
+            self.stdout.write(f"Folded {result['folded']} outcomes ({result['samples']} in total); model unchanged.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {result['folded']} outcomes ({result['samples']} in total); published version {result['version']}."
+        ))
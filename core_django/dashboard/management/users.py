@@ -0,0 +1,11 @@
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+
+
+def named_users(usernames):
+    """The users given by repeatable --user options; any name that doesn't exist is an error."""
+    users = User.objects.filter(username__in=usernames)
+    missing = set(usernames) - set(users.values_list('username', flat=True))
+    if missing:
+        raise CommandError(f"No such user: {', '.join(sorted(missing))}")
+    return users
@@ -0,0 +1,82 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_tenant_user(apps, schema_editor):
+    """Copies student.user onto existing Attendance and GradeRecord rows."""
+    for model_name in ('Attendance', 'GradeRecord'):
+        model = apps.get_model('dashboard', model_name)
+        Student = apps.get_model('dashboard', 'Student')
+        model.objects.filter(user__isnull=True).update(
+            user=models.Subquery(
+                Student.objects.filter(pk=models.OuterRef('student_id')).values('user_id')[:1]
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_course_start_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # 1. Add the tenant FK as nullable, fill it in, then make it required
+        migrations.AddField(
+            model_name='attendance',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='graderecord',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_tenant_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendance',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='graderecord',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+
+        # 2. Composite indexes for the per-tenant access paths in views.py
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'date_of_payment'], name='payment_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', 'date_of_payment'], name='payment_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'status'], name='attendance_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'status'], name='attendance_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['course', 'date'], name='attendance_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'current_average'], name='enrollment_student_avg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graderecord',
+            index=models.Index(fields=['student', 'course', 'date'], name='graderecord_student_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='graderecord',
+            index=models.Index(fields=['user', 'course'], name='graderecord_user_course_idx'),
+        ),
+    ]
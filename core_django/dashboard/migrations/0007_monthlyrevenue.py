@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_revenue(apps, schema_editor):
+    Payment = apps.get_model('dashboard', 'Payment')
+    MonthlyRevenue = apps.get_model('dashboard', 'MonthlyRevenue')
+    monthly = Payment.objects.annotate(month=TruncMonth('date_of_payment'))\
+        .values('user_id', 'month')\
+        .annotate(total=Sum('amount'), payment_count=Count('id'))
+    MonthlyRevenue.objects.bulk_create([MonthlyRevenue(**item) for item in monthly], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_tenant_user_and_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month'],
+                'unique_together': {('user', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_revenue, migrations.RunPython.noop),
+    ]
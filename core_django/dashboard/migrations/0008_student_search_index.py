@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# Copy of the search.py index SQL as of this migration, so later changes there can't alter it
+FTS_TABLE = 'dashboard_student_fts'
+FTS_COLUMNS = ['first_name', 'last_name', 'student_id', 'email', 'city', 'country', 'user_id']
+
+_columns = ', '.join(FTS_COLUMNS)
+_new = ', '.join(f"new.{c}" for c in FTS_COLUMNS)
+_old = ', '.join(f"old.{c}" for c in FTS_COLUMNS)
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        first_name, last_name, student_id, email, city, country,
+        user_id UNINDEXED,
+        content='dashboard_student', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    # Index the students that already exist
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    run(schema_editor, DROP_SQL + CREATE_SQL)
+
+
+def backwards(apps, schema_editor):
+    run(schema_editor, DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_monthlyrevenue'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
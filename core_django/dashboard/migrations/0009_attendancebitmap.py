@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:32
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Copies of the models.py helpers as of this migration, so later changes there can't alter it
+ATTENDANCE_BIT_FIELDS = {'P': 'present', 'A': 'absent', 'L': 'late', 'E': 'excused'}
+
+
+def set_attendance_day(bitmap, day, status):
+    if day < bitmap.first_day:
+        pad = -(-(bitmap.first_day - day).days // 8)
+        bitmap.first_day -= datetime.timedelta(days=pad * 8)
+        for field in ATTENDANCE_BIT_FIELDS.values():
+            setattr(bitmap, field, bytes(pad) + bytes(getattr(bitmap, field)))
+
+    offset = (day - bitmap.first_day).days
+    index, bit = offset >> 3, 1 << (offset & 7)
+    for code, field in ATTENDANCE_BIT_FIELDS.items():
+        bits = bytearray(getattr(bitmap, field))
+        if code == status:
+            if len(bits) <= index:
+                bits.extend(bytes(index + 1 - len(bits)))
+            bits[index] |= bit
+        elif index < len(bits):
+            bits[index] &= ~bit
+        setattr(bitmap, field, bytes(bits))
+
+
+def build_attendance_bitmaps(model, rows):
+    built = {}
+    for course_id, student_id, user_id, day, status in rows:
+        bitmap = built.get((course_id, student_id))
+        if bitmap is None:
+            bitmap = built[course_id, student_id] = model(
+                course_id=course_id, student_id=student_id, user_id=user_id, first_day=day,
+            )
+        set_attendance_day(bitmap, day, status)
+    return list(built.values())
+
+
+def backfill_attendance_bitmaps(apps, schema_editor):
+    Attendance = apps.get_model('dashboard', 'Attendance')
+    AttendanceBitmap = apps.get_model('dashboard', 'AttendanceBitmap')
+    rows = Attendance.objects.order_by('course_id', 'student_id', 'date')\
+        .values_list('course_id', 'student_id', 'user_id', 'date', 'status')
+    bitmaps = build_attendance_bitmaps(AttendanceBitmap, rows.iterator(chunk_size=5000))
+    AttendanceBitmap.objects.bulk_create(bitmaps, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_student_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_day', models.DateField(help_text='Day of bit 0; only ever moves back in whole bytes (8 days)')),
+                ('present', models.BinaryField(default=b'')),
+                ('absent', models.BinaryField(default=b'')),
+                ('late', models.BinaryField(default=b'')),
+                ('excused', models.BinaryField(default=b'')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.student')),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('course', 'student')},
+            },
+        ),
+        migrations.RunPython(backfill_attendance_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_attendancebitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('predicted_grade', models.FloatField()),
+                ('attendance_rate', models.FloatField(help_text='0-1, as fed to the model')),
+                ('balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('risk_score', models.PositiveSmallIntegerField()),
+                ('risk_label', models.CharField(max_length=20)),
+                ('model_version', models.CharField(max_length=40)),
+                ('scored_at', models.DateTimeField()),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='score', to='dashboard.student')),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'risk_score'], name='studentscore_user_risk_idx')],
+            },
+        ),
+    ]
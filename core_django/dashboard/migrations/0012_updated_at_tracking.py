@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Copy of the search.py index SQL as of this migration, so later changes there can't alter it
+FTS_TABLE = 'dashboard_student_fts'
+FTS_COLUMNS = ['first_name', 'last_name', 'student_id', 'email', 'city', 'country', 'user_id']
+
+_columns = ', '.join(FTS_COLUMNS)
+_new = ', '.join(f"new.{c}" for c in FTS_COLUMNS)
+_old = ', '.join(f"old.{c}" for c in FTS_COLUMNS)
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        first_name, last_name, student_id, email, city, country,
+        user_id UNINDEXED,
+        content='dashboard_student', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    # Index the students that already exist
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Adding updated_at rebuilds dashboard_student on SQLite, dropping the
+    # FTS triggers; this also installs the narrower update trigger
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in DROP_SQL + CREATE_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('dashboard', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LastChange',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='graderecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
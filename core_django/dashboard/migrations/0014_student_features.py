@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_student_features(apps, schema_editor):
+    Student = apps.get_model('dashboard', 'Student')
+    Attendance = apps.get_model('dashboard', 'Attendance')
+    StudentFeatures = apps.get_model('dashboard', 'StudentFeatures')
+    counts = {
+        item['student_id']: (item['total'], item['present'])
+        for item in Attendance.objects.values('student_id').order_by()
+        .annotate(total=Count('id'), present=Count('id', filter=Q(status='P')))
+    }
+    rows = Student.objects.values_list('pk', 'user_id', 'study_hours', 'previous_grade', 'payment_delays')
+    built = []
+    for pk, user_id, study_hours, previous_grade, payment_delays in rows.iterator(chunk_size=5000):
+        total, present = counts.get(pk, (0, 0))
+        built.append(StudentFeatures(
+            student_id=pk, user_id=user_id, attendance_total=total, attendance_present=present,
+            attendance_rate=present / total if total else 1.0,
+            study_hours=study_hours, previous_grade=previous_grade, payment_delays=payment_delays,
+        ))
+    StudentFeatures.objects.bulk_create(built, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeatures',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='dashboard.student')),
+                ('attendance_present', models.PositiveIntegerField(default=0)),
+                ('attendance_total', models.PositiveIntegerField(default=0)),
+                ('attendance_rate', models.FloatField(default=1.0, help_text='present / total, 1.0 before the first roll-call')),
+                ('study_hours', models.PositiveIntegerField(default=0)),
+                ('previous_grade', models.FloatField(default=0.0)),
+                ('payment_delays', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_student_features, migrations.RunPython.noop),
+    ]
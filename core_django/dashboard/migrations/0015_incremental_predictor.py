@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_student_features'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeOutcome',
+            fields=[
+                ('enrollment_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('attendance_rate', models.FloatField()),
+                ('study_hours', models.FloatField()),
+                ('previous_grade', models.FloatField()),
+                ('payment_delays', models.FloatField()),
+                ('grade', models.FloatField()),
+                ('folded_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PredictorStats',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('xtx', models.JSONField(default=list)),
+                ('xty', models.JSONField(default=list)),
+                ('version', models.PositiveIntegerField(default=0, help_text='Bumped on every publish')),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'predictor stats',
+            },
+        ),
+    ]
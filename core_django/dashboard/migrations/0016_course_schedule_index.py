@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:21
+
+import re
+
+from django.db import migrations, models
+
+# Copies of the models.py helpers, so later changes there can't alter this migration
+DAY_NAMES = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1, 'wed': 2, 'weds': 2, 'wednesday': 2,
+    'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'fri': 4, 'friday': 4,
+    'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6,
+}
+RANGE_WORDS = {'-', '–', 'to', 'through', 'thru'}
+DAY_LETTERS = {'m': 0, 't': 1, 'w': 2, 'r': 3, 'th': 3, 'f': 4, 's': 5, 'u': 6}
+DAY_CODE = re.compile(r'(?:th|[mtwrfsu])+')
+
+
+def day_of(word):
+    if word in DAY_NAMES:
+        return DAY_NAMES[word]
+    return DAY_NAMES.get(word[:-1]) if word.endswith('s') else None
+
+
+def parse_schedule_days(text):
+    text = (text or '').lower()
+    tokens = re.findall(r'[a-z]+|[-–]', text)
+    words = set(tokens)
+    if words & {'daily', 'everyday'} or 'every day' in text:
+        return 0b1111111
+    mask = 0
+    if words & {'weekday', 'weekdays'}:
+        mask |= 0b0011111
+    if words & {'weekend', 'weekends'}:
+        mask |= 0b1100000
+    for i, token in enumerate(tokens):
+        day = day_of(token)
+        if day is None:
+            continue
+        mask |= 1 << day
+        end = day_of(tokens[i + 2]) if i + 2 < len(tokens) and tokens[i + 1] in RANGE_WORDS else None
+        if end is not None:
+            for offset in range((end - day) % 7 + 1):
+                mask |= 1 << ((day + offset) % 7)
+    if not mask:
+        compact = re.sub(r'[\s,/]+', '', text)
+        if DAY_CODE.fullmatch(compact):
+            for code in re.findall(r'th|[mtwrfsu]', compact):
+                mask |= 1 << DAY_LETTERS[code]
+    return mask
+
+
+def minute_of_day(value):
+    return None if value is None else value.hour * 60 + value.minute
+
+
+def backfill_schedule_index(apps, schema_editor):
+    Course = apps.get_model('dashboard', 'Course')
+    courses = list(Course.objects.only('schedule_days', 'start_time', 'end_time'))
+    for course in courses:
+        course.schedule_mask = parse_schedule_days(course.schedule_days)
+        course.start_minute = minute_of_day(course.start_time)
+        course.end_minute = minute_of_day(course.end_time)
+    Course.objects.bulk_update(courses, ['schedule_mask', 'start_minute', 'end_minute'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_incremental_predictor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='end_minute',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='schedule_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Weekday bits, Monday = 1'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='start_minute',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_schedule_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:26
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# Copies of the models.py helpers as of this migration, so later changes there can't alter it
+CALENDAR_HORIZON = 180
+
+
+def session_dates(mask, first, last):
+    dates = []
+    for weekday in range(7):
+        if mask & (1 << weekday):
+            day = first + datetime.timedelta(days=(weekday - first.weekday()) % 7)
+            while day <= last:
+                dates.append(day)
+                day += datetime.timedelta(days=7)
+    return sorted(dates)
+
+
+def calendar_end(end_date):
+    horizon = datetime.date.today() + datetime.timedelta(days=CALENDAR_HORIZON)
+    return horizon if end_date is None else min(end_date, horizon)
+
+
+def generate_class_sessions(apps, schema_editor):
+    Course = apps.get_model('dashboard', 'Course')
+    Attendance = apps.get_model('dashboard', 'Attendance')
+    ClassSession = apps.get_model('dashboard', 'ClassSession')
+    counts = {
+        (item['course_id'], item['date']): item['count']
+        for item in Attendance.objects.values('course_id', 'date').order_by().annotate(count=Count('id'))
+    }
+    courses = Course.objects.filter(schedule_mask__gt=0)\
+        .values_list('pk', 'user_id', 'schedule_mask', 'start_minute', 'end_minute', 'start_date', 'end_date')
+    sessions = [
+        ClassSession(course_id=pk, user_id=user_id, date=day, start_minute=start_minute, end_minute=end_minute,
+                     recorded=counts.get((pk, day), 0))
+        for pk, user_id, mask, start_minute, end_minute, start_date, end_date in courses.iterator()
+        for day in session_dates(mask, start_date, calendar_end(end_date))
+    ]
+    ClassSession.objects.bulk_create(sessions, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_course_schedule_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('end_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('recorded', models.PositiveIntegerField(default=0, help_text='Attendance rows for the course on this date')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='dashboard.course')),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date', 'start_minute'], name='session_user_date_idx'), models.Index(condition=models.Q(('recorded', 0)), fields=['user', 'date'], name='session_unrecorded_idx')],
+                'unique_together': {('course', 'date')},
+            },
+        ),
+        migrations.RunPython(generate_class_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('dashboard', '0017_class_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CohortMember',
+            fields=[
+                ('student_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('age_band', models.CharField(max_length=20)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CohortCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('age_band', models.CharField(max_length=20)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('students', models.PositiveIntegerField(default=0, help_text='Students added this month')),
+                ('enrollments', models.PositiveIntegerField(default=0, help_text='Enrollments starting this month')),
+                ('grades', models.PositiveIntegerField(default=0)),
+                ('grade_total', models.FloatField(default=0.0, help_text='Sum of grade percentages')),
+                ('attendance_total', models.PositiveIntegerField(default=0)),
+                ('attendance_present', models.PositiveIntegerField(default=0)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='dashboard.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'country', 'city', 'age_band'], name='cohort_cell_cohort_idx'), models.Index(fields=['user', 'month'], name='cohort_cell_month_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+import re
+
+from django.db import migrations
+
+# Copy of models.parse_schedule_days as of this migration
+DAY_NAMES = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1, 'wed': 2, 'weds': 2, 'wednesday': 2,
+    'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'fri': 4, 'friday': 4,
+    'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6,
+}
+RANGE_WORDS = {'-', '–', 'to', 'through', 'thru'}
+DAY_LETTERS = {'m': 0, 't': 1, 'w': 2, 'r': 3, 'th': 3, 'f': 4, 's': 5, 'u': 6}
+DAY_CODE = re.compile(r'(?:th|[mtwrfsu])+')
+
+
+def day_of(word):
+    if word in DAY_NAMES:
+        return DAY_NAMES[word]
+    return DAY_NAMES.get(word[:-1]) if word.endswith('s') else None
+
+
+def parse_schedule_days(text):
+    text = (text or '').lower()
+    tokens = re.findall(r'[a-z]+|[-–]', text)
+    words = set(tokens)
+    if words & {'daily', 'everyday'} or 'every day' in text:
+        return 0b1111111
+    mask = 0
+    if words & {'weekday', 'weekdays'}:
+        mask |= 0b0011111
+    if words & {'weekend', 'weekends'}:
+        mask |= 0b1100000
+    for i, token in enumerate(tokens):
+        day = day_of(token)
+        if day is None:
+            continue
+        mask |= 1 << day
+        end = day_of(tokens[i + 2]) if i + 2 < len(tokens) and tokens[i + 1] in RANGE_WORDS else None
+        if end is not None:
+            for offset in range((end - day) % 7 + 1):
+                mask |= 1 << ((day + offset) % 7)
+    if not mask:
+        compact = re.sub(r'[\s,/]+', '', text)
+        if DAY_CODE.fullmatch(compact):
+            for code in re.findall(r'th|[mtwrfsu]', compact):
+                mask |= 1 << DAY_LETTERS[code]
+    return mask
+
+
+def reparse_schedule_days(apps, schema_editor):
+    """
+    The first parser read words like "Weekly" or "Sunday" as extra days.
+    Re-parses every schedule and drops the sessions generated for days that
+    were never scheduled, unless a roll-call was taken; generate_sessions
+    adds any that were missed.
+    """
+    Course = apps.get_model('dashboard', 'Course')
+    ClassSession = apps.get_model('dashboard', 'ClassSession')
+    changed = []
+    for course in Course.objects.only('schedule_days', 'schedule_mask').iterator(chunk_size=1000):
+        mask = parse_schedule_days(course.schedule_days)
+        if mask != course.schedule_mask:
+            course.schedule_mask = mask
+            changed.append(course)
+    Course.objects.bulk_update(changed, ['schedule_mask'], batch_size=1000)
+
+    for course in changed:
+        phantom = [
+            pk for pk, day in ClassSession.objects.filter(course=course, recorded=0).values_list('pk', 'date')
+            if not course.schedule_mask & (1 << day.weekday())
+        ]
+        ClassSession.objects.filter(pk__in=phantom).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0018_cohort_cube'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_schedule_days, migrations.RunPython.noop),
+    ]
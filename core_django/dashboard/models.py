@@ -1,9 +1,134 @@
-from django.db import models
+import datetime
+import re
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Sum, Avg
-                
-class Course(models.Model):
+from django.db.models import Sum, Avg, F
+from django.db.models.functions import Cast, Coalesce, TruncMonth
+
+
+class ActiveManager(models.Manager):
+    """Default manager for soft-deletable models: rows with deleted_at set are hidden."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeleteModel(models.Model):
+    """
+    delete_student/delete_course only set deleted_at, which hides the row
+    everywhere that goes through `objects` (including get_object_or_404 and
+    ModelForm validation). `python manage.py purge_deleted`, or the job the
+    views queue, removes the row and its children later in small batches.
+    `all_objects` still sees deleted rows.
+    """
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    # Unique fields to blank on delete, so their values can be re-used before the purge
+    clear_on_delete = ()
+
+    class Meta:
+        abstract = True
+
+    def soft_delete(self):
+        with transaction.atomic():
+            self.remove_from_rollups()
+            for field in self.clear_on_delete:
+                setattr(self, field, None)
+            self.deleted_at = timezone.now()
+            self.save(update_fields=['deleted_at', 'updated_at', *self.clear_on_delete])
+
+    def remove_from_rollups(self):
+        """
+        Takes the row's children out of the tables derived from them, just
+        before it is hidden. Rollups only count rows under live students and
+        courses, so the purge has nothing left to subtract.
+        """
+
+
+class LiveChildManager(models.Manager):
+    """
+    Default manager for rows under a student or course (enrollments, grades,
+    attendance, payments): rows whose parent is soft-deleted are hidden with
+    it, so totals and rosters drop them at once rather than at the purge.
+    `all_objects` still sees them.
+    """
+
+    def get_queryset(self):
+        parents = {
+            f'{field.name}__deleted_at__isnull': True
+            for field in self.model._meta.fields
+            if field.is_relation and issubclass(field.related_model, SoftDeleteModel)
+        }
+        return super().get_queryset().filter(**parents)
+
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+# Whole words only, so "Weekly" or "Sunday mornings" don't add phantom days
+DAY_NAMES = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1, 'wed': 2, 'weds': 2, 'wednesday': 2,
+    'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'fri': 4, 'friday': 4,
+    'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6,
+}
+RANGE_WORDS = {'-', '\u2013', 'to', 'through', 'thru'}
+# Single-letter codes as in "MWF", "TR" or "TTh", read only when they are the whole text
+DAY_LETTERS = {'m': 0, 't': 1, 'w': 2, 'r': 3, 'th': 3, 'f': 4, 's': 5, 'u': 6}
+DAY_CODE = re.compile(r'(?:th|[mtwrfsu])+')
+
+
+def day_of(word):
+    """Weekday index of a day name or abbreviation ("tues", "mondays"), else None."""
+    if word in DAY_NAMES:
+        return DAY_NAMES[word]
+    return DAY_NAMES.get(word[:-1]) if word.endswith('s') else None
+
+
+def parse_schedule_days(text):
+    """
+    Weekday bitmask (bit 0 = Monday) of free-text schedule days such as
+    "Mon/Wed", "Tuesday & Thursday", "Mon-Fri", "Mon through Fri",
+    "Weekends" or "MWF". Words that aren't days are ignored.
+    """
+    text = (text or '').lower()
+    tokens = re.findall(r'[a-z]+|[-\u2013]', text)
+    words = set(tokens)
+    if words & {'daily', 'everyday'} or 'every day' in text:
+        return 0b1111111
+    mask = 0
+    if words & {'weekday', 'weekdays'}:
+        mask |= 0b0011111
+    if words & {'weekend', 'weekends'}:
+        mask |= 0b1100000
+    for i, token in enumerate(tokens):
+        day = day_of(token)
+        if day is None:
+            continue
+        mask |= 1 << day
+        end = day_of(tokens[i + 2]) if i + 2 < len(tokens) and tokens[i + 1] in RANGE_WORDS else None
+        if end is not None:
+            # Ranges may wrap past Sunday: "Sat-Mon"
+            for offset in range((end - day) % 7 + 1):
+                mask |= 1 << ((day + offset) % 7)
+    if not mask:
+        compact = re.sub(r'[\s,/]+', '', text)
+        if DAY_CODE.fullmatch(compact):
+            for code in re.findall(r'th|[mtwrfsu]', compact):
+                mask |= 1 << DAY_LETTERS[code]
+    return mask
+
+
+def minute_of_day(value):
+    """Minutes since midnight of a time (or "HH:MM" string, as set before a save)."""
+    if isinstance(value, str):
+        value = datetime.time.fromisoformat(value)
+    return None if value is None else value.hour * 60 + value.minute
+
+
+class Course(SoftDeleteModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     course_code = models.CharField(max_length=20, blank=True, null=True)
@@ -17,8 +142,45 @@ class Course(models.Model):
     
     # Automatically records the timestamp when click on "Save Course"
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also moved forward when the course's enrollments or grades change (see changes.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # schedule_days/start_time/end_time normalized on save, for conflict checks (see schedule.py)
+    schedule_mask = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Weekday bits, Monday = 1")
+    start_minute = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    end_minute = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    SCHEDULE_FIELDS = ('schedule_days', 'start_time', 'end_time')
+    # Changing any of these regenerates the course's ClassSession calendar
+    CALENDAR_FIELDS = SCHEDULE_FIELDS + ('start_date', 'end_date')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='course_deleted_idx', condition=models.Q(deleted_at__isnull=False)),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.schedule_mask = parse_schedule_days(self.schedule_days)
+        self.start_minute = minute_of_day(self.start_time)
+        self.end_minute = minute_of_day(self.end_time)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SCHEDULE_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'schedule_mask', 'start_minute', 'end_minute'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or set(update_fields) & set(self.CALENDAR_FIELDS):
+                ClassSession.generate(self)
+
+    def remove_from_rollups(self):
+        # The course's roll-calls leave its students' attendance features
+        per_student = self.attendance_set.values('student_id').annotate(
+            total=models.Count('id'),
+            present=models.Count('id', filter=models.Q(status=Attendance.AttendanceStatus.PRESENT)),
+        ).order_by()
+        for item in per_student:
+            StudentFeatures.apply_attendance(item['student_id'], -item['total'], -item['present'])
 
-class Student(models.Model):
+class Student(SoftDeleteModel):
     class StudentStatus(models.TextChoices):
         ACTIVE = 'ACT', 'Active'
         LEAVE = 'LVE', 'On Leave'
@@ -55,12 +217,39 @@ class Student(models.Model):
     current_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     courses = models.ManyToManyField(Course, through='Enrollment', related_name='students', blank=True)
     date_added = models.DateTimeField(auto_now_add=True)
+    # Also moved forward when the student's enrollments, grades, attendance or payments change (see changes.py)
+    updated_at = models.DateTimeField(auto_now=True)
     previous_grade = models.FloatField(default=0.0, help_text="Entrance Exam/Baseline Score (0-100)")
     study_hours = models.PositiveIntegerField(default=0, help_text="Average self-reported study hours per week.")
     payment_delays = models.PositiveIntegerField(default=0, help_text="Total number of late payments recorded.")
 
     class Meta:
         unique_together = ('student_id', 'first_name', 'last_name') 
+        indexes = [
+            # purge_deleted's scan; almost every row is NULL
+            models.Index(fields=['deleted_at'], name='student_deleted_idx', condition=models.Q(deleted_at__isnull=False)),
+        ]
+
+    clear_on_delete = ('student_id',)
+
+    def save(self, *args, **kwargs):
+        # Keep the StudentFeatures row in the same transaction as the student
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or set(update_fields) & set(StudentFeatures.STUDENT_FIELDS):
+                StudentFeatures.sync_student(self)
+
+    def remove_from_rollups(self):
+        # The student's payments leave the revenue rollup...
+        monthly = self.payment_set.annotate(month=TruncMonth('date_of_payment'))\
+            .values('month').annotate(total=Sum('amount'), count=models.Count('id')).order_by()
+        for item in monthly:
+            MonthlyRevenue.apply(self.user_id, item['month'], -item['total'], -item['count'])
+        # ...and their roll-calls leave the sessions they were taken in
+        per_session = self.attendance_set.values('course_id', 'date').annotate(count=models.Count('id')).order_by()
+        for item in per_session:
+            ClassSession.apply_attendance(item['course_id'], item['date'], -item['count'])
 
     @property
     def current_balance(self):
@@ -88,9 +277,198 @@ class Payment(models.Model):
     reference_id = models.CharField(max_length=100, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     date_recorded = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveChildManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Revenue totals / monthly charts per tenant, student payment history
+            models.Index(fields=['user', 'date_of_payment'], name='payment_user_date_idx'),
+            models.Index(fields=['student', 'date_of_payment'], name='payment_student_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the MonthlyRevenue rollup in the same transaction as the payment.
+        # Deletes are handled by the post_delete receiver in signals.py.
+        # Strings, as in create(date_of_payment='2025-03-05'), become a date and Decimal first.
+        self.date_of_payment = self._meta.get_field('date_of_payment').to_python(self.date_of_payment)
+        self.amount = self._meta.get_field('amount').to_python(self.amount)
+        # Payments of soft-deleted students are already out of the rollup (see Student.remove_from_rollups).
+        with transaction.atomic():
+            if self.pk:
+                old = Payment.all_objects.filter(pk=self.pk)\
+                    .values('user_id', 'date_of_payment', 'amount', 'student__deleted_at').first()
+                if old and old['student__deleted_at'] is None:
+                    MonthlyRevenue.apply(old['user_id'], old['date_of_payment'], -old['amount'], -1)
+            super().save(*args, **kwargs)
+            if Payment.all_objects.filter(pk=self.pk, student__deleted_at__isnull=True).exists():
+                MonthlyRevenue.apply(self.user_id, self.date_of_payment, self.amount, 1)
+
     def __str__(self):
         return f"Payment of ${self.amount} for {self.student.first_name}"
+
+
+class MonthlyRevenue(models.Model):
+    """
+    Per-user, per-month payment totals, maintained incrementally by Payment
+    writes so revenue charts read O(months) rows instead of every payment.
+    Rebuild with: python manage.py rebuild_revenue_rollup
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    payment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'month')
+        ordering = ['month']
+
+    @staticmethod
+    def month_start(day):
+        if isinstance(day, datetime.datetime):
+            day = timezone.localtime(day).date() if timezone.is_aware(day) else day.date()
+        return day.replace(day=1)
+
+    @classmethod
+    def apply(cls, user_id, day, amount, count):
+        """Adds (or with negative values, removes) payments from a user's month."""
+        month = cls.month_start(day)
+        updated = cls.objects.filter(user_id=user_id, month=month).update(
+            total=F('total') + amount,
+            payment_count=F('payment_count') + count,
+        )
+        if not updated and count > 0:
+            cls.objects.create(user_id=user_id, month=month, total=amount, payment_count=count)
+        elif count < 0:
+            # Drop months with no payments left, matching the old TruncMonth query
+            cls.objects.filter(user_id=user_id, month=month, payment_count=0).delete()
+
+    @classmethod
+    def rebuild(cls, users=None):
+        """Recomputes the rollup from Payment rows. Returns the number of month rows written."""
+        payments = Payment.objects.all()
+        rollup = cls.objects.all()
+        if users is not None:
+            payments = payments.filter(user__in=users)
+            rollup = rollup.filter(user__in=users)
+
+        monthly = payments.annotate(month=TruncMonth('date_of_payment'))\
+            .values('user_id', 'month')\
+            .annotate(total=Sum('amount'), payment_count=models.Count('id'))
+
+        with transaction.atomic():
+            rollup.delete()
+            rows = cls.objects.bulk_create([cls(**item) for item in monthly], batch_size=1000)
+        return len(rows)
     
+class StudentScore(models.Model):
+    """
+    Latest early-warning score per student, written in bulk by
+    `python manage.py score_students` so dashboards can list at-risk
+    students without running the model while a page renders.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='score')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
+    predicted_grade = models.FloatField()
+    attendance_rate = models.FloatField(help_text="0-1, as fed to the model")
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    risk_score = models.PositiveSmallIntegerField()
+    risk_label = models.CharField(max_length=20)
+    model_version = models.CharField(max_length=40)
+    scored_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # "All at-risk students for this tenant", highest risk first
+            models.Index(fields=['user', 'risk_score'], name='studentscore_user_risk_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.risk_label} ({self.predicted_grade:.1f})"
+
+
+class StudentFeatures(models.Model):
+    """
+    The grade predictor's feature vector per student, kept current by
+    Student and Attendance writes so online inference, batch scoring and
+    training all read it instead of re-aggregating attendance.
+    Rebuild with: python manage.py rebuild_features
+    """
+    # Copied from Student as they are
+    STUDENT_FIELDS = ('study_hours', 'previous_grade', 'payment_delays')
+
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='features')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
+    attendance_present = models.PositiveIntegerField(default=0)
+    attendance_total = models.PositiveIntegerField(default=0)
+    attendance_rate = models.FloatField(default=1.0, help_text="present / total, 1.0 before the first roll-call")
+    study_hours = models.PositiveIntegerField(default=0)
+    previous_grade = models.FloatField(default=0.0)
+    payment_delays = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.student_id}: {self.attendance_rate:.2f}, {self.study_hours}h, {self.previous_grade}, {self.payment_delays}"
+
+    @classmethod
+    def sync_student(cls, student):
+        """Upserts the Student-owned features of one student."""
+        cls.objects.bulk_create(
+            [cls(student_id=student.pk, user_id=student.user_id,
+                 **{field: getattr(student, field) for field in cls.STUDENT_FIELDS})],
+            update_conflicts=True, unique_fields=['student'], update_fields=['user', *cls.STUDENT_FIELDS],
+        )
+
+    @classmethod
+    def apply_attendance(cls, student_id, total, present):
+        """
+        Adds (or with negative values, removes) roll-calls from a student's
+        attendance counts. Returns False if the student has no feature row.
+        """
+        new_total = F('attendance_total') + total
+        new_present = F('attendance_present') + present
+        return cls.objects.filter(student_id=student_id).update(
+            attendance_total=new_total,
+            attendance_present=new_present,
+            # SET expressions all see the old row, so the rate is computed from the new counts inline
+            attendance_rate=models.Case(
+                models.When(attendance_total__gt=-total, then=Cast(new_present, models.FloatField()) / new_total),
+                default=models.Value(1.0),
+                output_field=models.FloatField(),
+            ),
+        ) > 0
+
+    @classmethod
+    def rebuild(cls, users=None, students=None):
+        """Recomputes feature rows from Student and Attendance rows. Returns the number written."""
+        rows = Student.all_objects.all()
+        if users is not None:
+            rows = rows.filter(user__in=users)
+        if students is not None:
+            rows = rows.filter(pk__in=students)
+
+        counts = {
+            item['student_id']: (item['total'], item['present'])
+            for item in Attendance.objects.filter(student__in=rows).values('student_id').order_by()
+            .annotate(total=models.Count('id'),
+                      present=models.Count('id', filter=models.Q(status=Attendance.AttendanceStatus.PRESENT)))
+        }
+        built = []
+        for pk, user_id, *values in rows.values_list('pk', 'user_id', *cls.STUDENT_FIELDS).iterator(chunk_size=5000):
+            total, present = counts.get(pk, (0, 0))
+            built.append(cls(
+                student_id=pk, user_id=user_id, attendance_total=total, attendance_present=present,
+                attendance_rate=present / total if total else 1.0, **dict(zip(cls.STUDENT_FIELDS, values)),
+            ))
+        cls.objects.bulk_create(
+            built, batch_size=1000, update_conflicts=True, unique_fields=['student'],
+            update_fields=['user', 'attendance_total', 'attendance_present', 'attendance_rate', *cls.STUDENT_FIELDS],
+        )
+        return len(built)
+
+
 class Attendance(models.Model):
     class AttendanceStatus(models.TextChoices):
         PRESENT = 'P', 'Present'
@@ -100,21 +478,274 @@ class Attendance(models.Model):
 
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    # Copy of student.user so tenant-wide queries don't have to join through Student
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
     date = models.DateField(default=timezone.now)
     status = models.CharField(max_length=1, choices=AttendanceStatus.choices, default=AttendanceStatus.PRESENT)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveChildManager()
+    all_objects = models.Manager()
     
     class Meta:
         # Ensures a student can't be marked present twice for the same course on the same day
         unique_together = ('course', 'student', 'date')
+        indexes = [
+            models.Index(fields=['user', 'status'], name='attendance_user_status_idx'),
+            models.Index(fields=['student', 'status'], name='attendance_student_status_idx'),
+            models.Index(fields=['course', 'date'], name='attendance_course_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.student.user_id
+        # The bitmap does date arithmetic, so a string like '2025-03-05' becomes a date first
+        self.date = self._meta.get_field('date').to_python(self.date)
+        # Keep the AttendanceBitmap in the same transaction as the row.
+        # Deletes are handled by the post_delete receiver in signals.py.
+        # Likewise the StudentFeatures attendance counts, which leave out
+        # soft-deleted courses, and the ClassSession counts, which leave out
+        # soft-deleted students (see remove_from_rollups).
+        parents = ('student__deleted_at', 'course__deleted_at')
+        with transaction.atomic():
+            old = None
+            if self.pk:
+                old = Attendance.all_objects.filter(pk=self.pk)\
+                    .values('course_id', 'student_id', 'date', 'status', *parents).first()
+                if old:
+                    AttendanceBitmap.mark(old['course_id'], old['student_id'], self.user_id, old['date'], None)
+                    if old['course__deleted_at'] is None:
+                        StudentFeatures.apply_attendance(old['student_id'], -1, -int(old['status'] == self.AttendanceStatus.PRESENT))
+            super().save(*args, **kwargs)
+            new = Attendance.all_objects.filter(pk=self.pk).values(*parents).get()
+            # The session's roll-call count only moves with the row's course or date
+            old_session = (old['course_id'], old['date']) if old and old['student__deleted_at'] is None else None
+            new_session = (self.course_id, self.date) if new['student__deleted_at'] is None else None
+            if old_session != new_session:
+                if old_session:
+                    ClassSession.apply_attendance(*old_session, -1)
+                if new_session:
+                    ClassSession.apply_attendance(*new_session, 1)
+            AttendanceBitmap.mark(self.course_id, self.student_id, self.user_id, self.date, self.status)
+            if new['course__deleted_at'] is None and not StudentFeatures.apply_attendance(
+                    self.student_id, 1, int(self.status == self.AttendanceStatus.PRESENT)):
+                # Student created without save() (bulk_create, raw SQL): build the row from scratch
+                StudentFeatures.rebuild(students=[self.student_id])
 
     def __str__(self):
         return f"{self.student} - {self.course} - {self.date}"
-    
+
+
+# Sessions of courses without an end_date are generated this many days ahead
+# (python manage.py generate_sessions moves the horizon forward)
+CALENDAR_HORIZON = 180
+
+
+def session_dates(mask, first, last):
+    """Sorted dates from `first` to `last` (inclusive) whose weekday bit is set in `mask`."""
+    dates = []
+    for weekday in range(7):
+        if mask & (1 << weekday):
+            day = first + datetime.timedelta(days=(weekday - first.weekday()) % 7)
+            while day <= last:
+                dates.append(day)
+                day += datetime.timedelta(days=7)
+    return sorted(dates)
+
+
+def calendar_end(end_date, today=None):
+    """Last day to generate sessions for: the course's end_date, at most CALENDAR_HORIZON days ahead."""
+    horizon = (today or datetime.date.today()) + datetime.timedelta(days=CALENDAR_HORIZON)
+    return horizon if end_date is None else min(end_date, horizon)
+
+
+class ClassSession(models.Model):
+    """
+    One scheduled meeting of a course, generated from its schedule_mask,
+    times and date range (see generate()). `recorded` counts the course's
+    Attendance rows on that date, kept in step by Attendance writes like the
+    StudentFeatures counts, so "roll-call not taken" is recorded = 0.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sessions')
+    # Copy of course.user so the calendar is read per tenant without a join
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
+    date = models.DateField()
+    start_minute = models.PositiveSmallIntegerField(null=True, blank=True)
+    end_minute = models.PositiveSmallIntegerField(null=True, blank=True)
+    recorded = models.PositiveIntegerField(default=0, help_text="Attendance rows for the course on this date")
+
+    class Meta:
+        unique_together = ('course', 'date')
+        indexes = [
+            # "Today's classes"
+            models.Index(fields=['user', 'date', 'start_minute'], name='session_user_date_idx'),
+            # Sessions still waiting for a roll-call
+            models.Index(fields=['user', 'date'], name='session_unrecorded_idx', condition=models.Q(recorded=0)),
+        ]
+
+    def __str__(self):
+        return f"{self.course} - {self.date}"
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.course.user_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def generate(cls, course, today=None):
+        """
+        Brings a course's sessions in line with its schedule: adds the missing
+        dates, removes the ones no longer scheduled (unless a roll-call was
+        taken) and moves the rest to the current times. Returns (added, removed).
+        """
+        first = Course._meta.get_field('start_date').to_python(course.start_date)
+        end_date = Course._meta.get_field('end_date').to_python(course.end_date)
+        wanted = set(session_dates(course.schedule_mask, first, calendar_end(end_date, today)))
+
+        with transaction.atomic():
+            existing = dict(cls.objects.filter(course=course).values_list('date', 'recorded'))
+            stale = [day for day, recorded in existing.items() if day not in wanted and not recorded]
+            if stale:
+                cls.objects.filter(course=course, date__in=stale).delete()
+
+            new = sorted(wanted - existing.keys())
+            if new:
+                # Roll-calls taken before the date was scheduled
+                counts = dict(Attendance.objects.filter(course=course, date__gte=new[0], date__lte=new[-1])
+                              .values('date').annotate(count=models.Count('id')).values_list('date', 'count')
+                              .order_by())
+                cls.objects.bulk_create([
+                    cls(course_id=course.pk, user_id=course.user_id, date=day, start_minute=course.start_minute,
+                        end_minute=course.end_minute, recorded=counts.get(day, 0))
+                    for day in new
+                ], batch_size=1000)
+
+            cls.objects.filter(course=course).exclude(start_minute=course.start_minute, end_minute=course.end_minute)\
+                .update(start_minute=course.start_minute, end_minute=course.end_minute)
+        return len(new), len(stale)
+
+    @classmethod
+    def apply_attendance(cls, course_id, date, count):
+        """Adds (or with a negative count, removes) roll-call rows from a session, if one is scheduled."""
+        cls.objects.filter(course_id=course_id, date=date).update(recorded=F('recorded') + count)
+
+    @classmethod
+    def recount(cls, sessions=None):
+        """Recomputes `recorded` from the Attendance table (after raw or bulk writes). Returns the rows updated."""
+        rows = Attendance.objects.filter(course=models.OuterRef('course_id'), date=models.OuterRef('date'))\
+            .values('course').annotate(count=models.Count('id')).values('count')
+        sessions = cls.objects.all() if sessions is None else sessions
+        return sessions.update(recorded=Coalesce(models.Subquery(rows), 0))
+
+
+# Attendance status -> AttendanceBitmap field
+ATTENDANCE_BIT_FIELDS = {
+    Attendance.AttendanceStatus.PRESENT: 'present',
+    Attendance.AttendanceStatus.ABSENT: 'absent',
+    Attendance.AttendanceStatus.LATE: 'late',
+    Attendance.AttendanceStatus.EXCUSED: 'excused',
+}
+
+
+def set_attendance_day(bitmap, day, status):
+    """
+    Sets `day` to `status` in an AttendanceBitmap's bit arrays (None clears
+    it) without saving.
+    """
+    if day < bitmap.first_day:
+        # Prepend whole zero bytes so existing bits keep their positions
+        pad = -(-(bitmap.first_day - day).days // 8)
+        bitmap.first_day -= datetime.timedelta(days=pad * 8)
+        for field in ATTENDANCE_BIT_FIELDS.values():
+            setattr(bitmap, field, bytes(pad) + bytes(getattr(bitmap, field)))
+
+    offset = (day - bitmap.first_day).days
+    index, bit = offset >> 3, 1 << (offset & 7)
+    for code, field in ATTENDANCE_BIT_FIELDS.items():
+        bits = bytearray(getattr(bitmap, field))
+        if code == status:
+            if len(bits) <= index:
+                bits.extend(bytes(index + 1 - len(bits)))
+            bits[index] |= bit
+        elif index < len(bits):
+            bits[index] &= ~bit
+        setattr(bitmap, field, bytes(bits))
+
+
+def build_attendance_bitmaps(model, rows):
+    """Builds unsaved bitmaps from (course_id, student_id, user_id, date, status) rows."""
+    built = {}
+    for course_id, student_id, user_id, day, status in rows:
+        bitmap = built.get((course_id, student_id))
+        if bitmap is None:
+            bitmap = built[course_id, student_id] = model(
+                course_id=course_id, student_id=student_id, user_id=user_id, first_day=day,
+            )
+        set_attendance_day(bitmap, day, status)
+    return list(built.values())
+
+
+class AttendanceBitmap(models.Model):
+    """
+    Compact copy of a student's attendance in one course: one packed bit array
+    per status, where bit i is day `first_day + i` (little-endian bit order,
+    the same as numpy.packbits(bitorder='little')). A year of roll-calls is
+    ~46 bytes per status. Maintained incrementally by Attendance writes;
+    rebuild with: python manage.py rebuild_attendance_bitmaps
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
+    first_day = models.DateField(help_text="Day of bit 0; only ever moves back in whole bytes (8 days)")
+    present = models.BinaryField(default=b'')
+    absent = models.BinaryField(default=b'')
+    late = models.BinaryField(default=b'')
+    excused = models.BinaryField(default=b'')
+
+    class Meta:
+        unique_together = ('course', 'student')
+
+    @classmethod
+    def mark(cls, course_id, student_id, user_id, day, status):
+        """Records (or with status=None, clears) one day for a student in a course."""
+        if isinstance(day, datetime.datetime):
+            day = day.date()
+        bitmap = cls.objects.select_for_update().filter(course_id=course_id, student_id=student_id).first()
+        if bitmap is None:
+            if status is None:
+                return
+            bitmap = cls(course_id=course_id, student_id=student_id, user_id=user_id, first_day=day)
+        set_attendance_day(bitmap, day, status)
+        bitmap.save()
+
+    @classmethod
+    def rebuild(cls, courses=None):
+        """Recomputes bitmaps from Attendance rows. Returns the number of bitmaps written."""
+        records = Attendance.objects.all()
+        bitmaps = cls.objects.all()
+        if courses is not None:
+            records = records.filter(course__in=courses)
+            bitmaps = bitmaps.filter(course__in=courses)
+
+        rows = records.order_by('course_id', 'student_id', 'date')\
+            .values_list('course_id', 'student_id', 'user_id', 'date', 'status')
+        built = build_attendance_bitmaps(cls, rows.iterator(chunk_size=5000))
+
+        with transaction.atomic():
+            bitmaps.delete()
+            written = cls.objects.bulk_create(built, batch_size=1000)
+        return len(written)
+
+
 class Enrollment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     start_date = models.DateField(default=timezone.now)
     current_average = models.FloatField(default=0.0, help_text="Calculated average (0-100)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveChildManager()
+    all_objects = models.Manager()
 
     def update_average(self):
         """Recalculates the average based on ALL GradeRecords for this course."""
@@ -128,12 +759,33 @@ class Enrollment(models.Model):
     
         self.save()
 
+    @classmethod
+    def recompute_averages(cls, enrollments):
+        """
+        Set-based update_average() for many enrollments: one UPDATE with a
+        correlated AVG over their grade records. Returns the rows updated.
+        """
+        percentage = models.Case(
+            models.When(max_score__gt=0, then=F('score_obtained') * 100.0 / F('max_score')),
+            default=models.Value(0.0),
+            output_field=models.FloatField(),
+        )
+        average = GradeRecord.objects.filter(student=models.OuterRef('student_id'), course=models.OuterRef('course_id'))\
+            .order_by().values('student').annotate(average=Avg(percentage)).values('average')
+        return enrollments.update(current_average=Coalesce(models.Subquery(average), 0.0), updated_at=timezone.now())
+
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            # Grade distribution buckets are range filters on current_average
+            models.Index(fields=['student', 'current_average'], name='enrollment_student_avg_idx'),
+        ]
 
 class GradeRecord(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    # Copy of student.user so tenant-wide queries don't have to join through Student
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
     
     description = models.CharField(max_length=100, help_text="e.g. Quiz 1, Midterm, Homework")
     date = models.DateField(default=timezone.now)
@@ -142,9 +794,22 @@ class GradeRecord(models.Model):
     max_score = models.FloatField(default=100.0, help_text="Total points possible for this assignment")
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveChildManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-date'] # Most recent first
+        indexes = [
+            models.Index(fields=['student', 'course', 'date'], name='graderecord_student_course_idx'),
+            models.Index(fields=['user', 'course'], name='graderecord_user_course_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.student.user_id
+        super().save(*args, **kwargs)
 
     def get_percentage(self):
         if self.max_score > 0:
@@ -152,4 +817,152 @@ class GradeRecord(models.Model):
         return 0.0
 
     def __str__(self):
-        return f"{self.student} - {self.course}: {self.score_obtained}/{self.max_score}"
\ No newline at end of file
+        return f"{self.student} - {self.course}: {self.score_obtained}/{self.max_score}"
+
+class LastChange(models.Model):
+    """
+    When any of a user's students, courses, enrollments, attendance, grades,
+    payments or scores last changed: one row per user, so user-wide pages can
+    answer a conditional GET with a primary key lookup. Written by changes.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.changed_at}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, claimed and run by `python manage.py run_jobs`.
+    See jobs.py for enqueue() and the task registry.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    name = models.CharField(max_length=100, help_text="Registered task name, e.g. 'recompute_averages'")
+    payload = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's claim query: next queued job by priority, then age
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class GradeOutcome(models.Model):
+    """
+    A finalized enrollment (course ended, graded) as folded into the grade
+    predictor's PredictorStats: the student's features at the time and the
+    final average. Keyed by the enrollment id without a foreign key, so the
+    row, like its contribution to the statistics, outlives a deleted enrollment.
+    """
+    enrollment_id = models.PositiveBigIntegerField(primary_key=True)
+    attendance_rate = models.FloatField()
+    study_hours = models.FloatField()
+    previous_grade = models.FloatField()
+    payment_delays = models.FloatField()
+    grade = models.FloatField()
+    folded_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Enrollment {self.enrollment_id}: {self.grade:.1f}"
+
+
+class PredictorStats(models.Model):
+    """
+    Sufficient statistics of the grade predictor's least-squares fit over
+    every GradeOutcome (see learning.py): XᵀX and Xᵀy with an intercept
+    column, and the version of the last model published from them.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    samples = models.PositiveIntegerField(default=0)
+    xtx = models.JSONField(default=list)
+    xty = models.JSONField(default=list)
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every publish")
+    published_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'predictor stats'
+
+    def __str__(self):
+        return f"{self.name} v{self.version} ({self.samples} samples)"
+
+
+class CohortCell(models.Model):
+    """
+    One cell of the cohort cube (see cohorts.py): a user's students of one
+    country, city and age band, in one course and month, with additive
+    measures, so any slice is a SUM over a few cells. Payments and new
+    students belong to no course (course is NULL).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # '' when the student has no country/city
+    country = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    age_band = models.CharField(max_length=20)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True)
+    month = models.DateField(help_text="First day of the month")
+
+    students = models.PositiveIntegerField(default=0, help_text="Students added this month")
+    enrollments = models.PositiveIntegerField(default=0, help_text="Enrollments starting this month")
+    grades = models.PositiveIntegerField(default=0)
+    grade_total = models.FloatField(default=0.0, help_text="Sum of grade percentages")
+    attendance_total = models.PositiveIntegerField(default=0)
+    attendance_present = models.PositiveIntegerField(default=0)
+    payments = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'country', 'city', 'age_band'], name='cohort_cell_cohort_idx'),
+            models.Index(fields=['user', 'month'], name='cohort_cell_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.country or '-'}/{self.city or '-'}/{self.age_band} {self.course_id} {self.month:%Y-%m}"
+
+
+class CohortMember(models.Model):
+    """
+    The cohort a student was counted in at the last cube refresh, so a
+    student who moves city or changes age band (or is deleted) can be taken
+    out of their old cohort. Keyed by student id without a foreign key, so
+    the row outlives a hard-deleted student until the next refresh.
+    """
+    student_id = models.PositiveBigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    country = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    age_band = models.CharField(max_length=20)
+
+    def __str__(self):
+        return f"Student {self.student_id}: {self.country or '-'}/{self.city or '-'}/{self.age_band}"
+
+
+class CohortState(models.Model):
+    """When a user's cohort cube was last refreshed."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.refreshed_at}"
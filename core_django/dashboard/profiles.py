@@ -0,0 +1,74 @@
+"""
+Everything the student profile page shows, in four queries.
+
+One student query carries the balance, course count, overall average,
+stored feature vector (attendance rate included) and stored score as
+annotations/joins; three prefetches
+bring payments, enrollments (with their course) and grade records (with
+their course). load_profile() returns a plain dict for the template, so
+nothing on the page can trigger another query however long the student's
+history is.
+"""
+from django.db.models import Avg, Prefetch
+from django.http import Http404
+
+from .models import Enrollment, GradeRecord, Payment, Student, StudentFeatures
+from .queries import per_student, with_balances
+
+PASS_MARK = 60
+
+
+def profile_queryset(user):
+    return with_balances(Student.objects.filter(user=user)).select_related('score', 'features').annotate(
+        overall_average=per_student(Enrollment.objects, Avg('current_average')),
+    ).prefetch_related(
+        Prefetch('payment_set', queryset=Payment.objects.order_by('-date_of_payment'), to_attr='payments'),
+        Prefetch('enrollment_set', queryset=Enrollment.objects.select_related('course').order_by('-start_date', 'id'),
+                 to_attr='enrollments'),
+        Prefetch('graderecord_set', queryset=GradeRecord.objects.select_related('course').order_by('-date', '-id'),
+                 to_attr='grades'),
+    )
+
+
+def load_profile(user, pk):
+    """The profile view model for one of `user`'s students; Http404 if there is none."""
+    student = profile_queryset(user).filter(pk=pk).first()
+    if student is None:
+        raise Http404("No student matches the given query.")
+
+    try:
+        score = student.score
+    except Student.score.RelatedObjectDoesNotExist:
+        score = None
+    try:
+        features = student.features
+    except Student.features.RelatedObjectDoesNotExist:
+        # Student created without save(); store the row now rather than compute it ad hoc
+        StudentFeatures.rebuild(students=[student.pk])
+        features = StudentFeatures.objects.get(pk=student.pk)
+
+    grades = [
+        {
+            'date': record.date,
+            'course': record.course.name,
+            'description': record.description,
+            'score_obtained': record.score_obtained,
+            'max_score': record.max_score,
+            'percentage': record.get_percentage(),
+            'passed': record.get_percentage() >= PASS_MARK,
+        }
+        for record in student.grades
+    ]
+
+    return {
+        'student': student,
+        'balance': student.balance,
+        'courses': [enrollment.course for enrollment in student.enrollments],
+        'enrollments': student.enrollments,
+        'payments': student.payments,
+        'grades': grades,
+        'features': features,
+        'attendance_rate': features.attendance_rate,
+        'overall_average': student.overall_average or 0.0,
+        'score': score,
+    }
@@ -0,0 +1,96 @@
+"""
+Removes soft-deleted students and courses (see SoftDeleteModel).
+
+Model.delete() would run Django's cascade collector, which loads every
+enrollment, attendance, grade and payment of the row into Python and deletes
+them all in one transaction: seconds of SQLite write lock for a course with
+years of attendance. Instead each child table is emptied in raw DELETE
+batches of `chunk_size` ids, one short transaction per batch, sleeping
+`pause` seconds in between so request threads can take the write lock.
+
+Raw deletes skip signals, but there is nothing left for them to do: the
+derived tables (MonthlyRevenue, StudentFeatures and ClassSession roll-call
+counts) already lost the rows when the parent was soft-deleted (see
+SoftDeleteModel.remove_from_rollups). AttendanceBitmap, ClassSession,
+StudentScore and StudentFeatures rows are child tables like any other. The
+parent row goes last; its FTS entry goes with it via the delete trigger.
+
+Run with: python manage.py purge_deleted
+"""
+import time
+
+from django.db import connection, transaction
+
+from .caching import bump_version
+from .changes import touch
+from .models import Course, Enrollment, Student
+
+CHUNK_SIZE = 2000
+PAUSE = 0.05  # seconds between batches
+
+
+def child_relations(model):
+    """(child model, fk column) for every table with a foreign key to `model`."""
+    return [
+        (rel.related_model, rel.field.column)
+        for rel in model._meta.related_objects
+        if not rel.many_to_many
+    ]
+
+
+def purge_children(model, column, parent_id, chunk_size=CHUNK_SIZE, pause=PAUSE):
+    """Deletes `model` rows whose `column` is parent_id, chunk_size at a time. Returns the count."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_sql = connection.ops.quote_name(column)
+    pk_sql = connection.ops.quote_name(model._meta.pk.column)
+    rows = model._base_manager.filter(**{column: parent_id}).order_by('pk').values_list('pk', flat=True)
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(rows[:chunk_size])
+            if ids:
+                # The batch is the lowest ids, so a range keeps the statement at two parameters
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM {table} WHERE {column_sql} = %s AND {pk_sql} <= %s", [parent_id, ids[-1]])
+        deleted += len(ids)
+        if len(ids) < chunk_size:
+            return deleted
+        time.sleep(pause)
+
+
+def purge(instance, chunk_size=CHUNK_SIZE, pause=PAUSE):
+    """Removes one soft-deleted student or course and everything under it. Returns {table: rows}."""
+    model = type(instance)
+    # A student's courses lose a gradebook row; a course's students lose an enrollment
+    enrolled = Enrollment.all_objects.filter(**{model._meta.model_name: instance})
+    if model is Student:
+        course_ids, student_ids = list(enrolled.values_list('course_id', flat=True)), []
+    else:
+        course_ids, student_ids = [instance.pk], list(enrolled.values_list('student_id', flat=True))
+
+    counts = {}
+    for child, column in child_relations(model):
+        counts[child._meta.db_table] = purge_children(child, column, instance.pk, chunk_size, pause)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE id = %s", [instance.pk])
+        touch(users=[instance.user_id], students=student_ids, courses=course_ids if model is Student else ())
+    counts[model._meta.db_table] = 1
+
+    for course_id in course_ids:
+        bump_version('grades', course_id)
+    return counts
+
+
+def purge_deleted(users=None, chunk_size=CHUNK_SIZE, pause=PAUSE):
+    """Purges every soft-deleted course and student (of `users`, if given). Returns {table: rows}."""
+    totals = {}
+    for model in (Course, Student):
+        pending = model.all_objects.filter(deleted_at__isnull=False)
+        if users is not None:
+            pending = pending.filter(user__in=users)
+        for instance in list(pending.order_by('deleted_at')):
+            for table, count in purge(instance, chunk_size, pause).items():
+                totals[table] = totals.get(table, 0) + count
+    return totals
@@ -0,0 +1,155 @@
+"""
+Schedule conflicts between a tenant's courses and their students' enrollments.
+
+Course.save() normalizes the free-text schedule into schedule_mask (one bit
+per weekday) and start_minute/end_minute (see models.py). Two courses clash
+when they share a weekday, their times overlap and their date ranges
+overlap (a course without an end_date runs indefinitely).
+
+ScheduleIndex keeps each weekday's time slots sorted by start minute. A
+slot lasts at most `longest` minutes on that day, so everything that can
+overlap [start, end) starts in (start - longest, end): two bisections find
+the candidates, instead of comparing every course with every other.
+
+Adding students to a course builds the index once (one query), looks up the
+courses that clash with it, and reads the batch's enrollments in those
+courses with one more query, however many students are added.
+"""
+from bisect import bisect_left, bisect_right
+
+from .models import WEEKDAYS, Course, Enrollment
+
+
+def course_slots(user):
+    """The user's scheduled courses as slot dicts (courses without days or times are left out)."""
+    rows = Course.objects.filter(
+        user=user, schedule_mask__gt=0, start_minute__isnull=False, end_minute__isnull=False,
+    ).values('id', 'name', 'schedule_mask', 'start_minute', 'end_minute', 'start_date', 'end_date')
+    return [
+        {'id': row['id'], 'name': row['name'], 'mask': row['schedule_mask'],
+         'start': row['start_minute'], 'end': row['end_minute'],
+         'start_date': row['start_date'], 'end_date': row['end_date']}
+        for row in rows
+        if row['end_minute'] > row['start_minute']
+    ]
+
+
+def dates_overlap(a, b):
+    return ((b['end_date'] is None or a['start_date'] <= b['end_date'])
+            and (a['end_date'] is None or b['start_date'] <= a['end_date']))
+
+
+def days_label(mask):
+    """'Mon/Wed' for a weekday bitmask."""
+    return '/'.join(day for i, day in enumerate(WEEKDAYS) if mask & (1 << i))
+
+
+def time_label(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class ScheduleIndex:
+    """Per-weekday interval index over course slots."""
+
+    def __init__(self, slots):
+        self.slots = {slot['id']: slot for slot in slots}
+        self.days = []
+        for day in range(len(WEEKDAYS)):
+            entries = sorted((slot['start'], slot['end'], slot['id']) for slot in slots if slot['mask'] & (1 << day))
+            self.days.append({
+                'entries': entries,
+                'starts': [entry[0] for entry in entries],
+                'longest': max((end - start for start, end, _ in entries), default=0),
+            })
+
+    def overlapping(self, slot):
+        """{course id: weekday mask they share} for every other slot that clashes with `slot`."""
+        clashes = {}
+        for day, index in enumerate(self.days):
+            if not slot['mask'] & (1 << day) or not index['entries']:
+                continue
+            low = bisect_right(index['starts'], slot['start'] - index['longest'])
+            high = bisect_left(index['starts'], slot['end'])
+            for start, end, other_id in index['entries'][low:high]:
+                if other_id != slot['id'] and end > slot['start'] and dates_overlap(slot, self.slots[other_id]):
+                    clashes[other_id] = clashes.get(other_id, 0) | (1 << day)
+        return clashes
+
+    def conflicting_pairs(self):
+        """{(course id, course id): shared weekday mask} for every clashing pair, smaller id first."""
+        pairs = {}
+        for slot_id, slot in self.slots.items():
+            for other_id, mask in self.overlapping(slot).items():
+                if slot_id < other_id:
+                    pairs[(slot_id, other_id)] = mask
+        return pairs
+
+
+def describe(slot, mask):
+    return {
+        'id': slot['id'],
+        'name': slot['name'],
+        'days': days_label(mask),
+        'time': f"{time_label(slot['start'])}-{time_label(slot['end'])}",
+    }
+
+
+def enrollment_conflicts(course, student_ids):
+    """
+    {student id: [clashing course dicts]} for the students among `student_ids`
+    already enrolled in a course that clashes with `course`.
+    """
+    index = ScheduleIndex(course_slots(course.user_id))
+    slot = index.slots.get(course.pk)
+    if slot is None:
+        return {}
+    clashes = index.overlapping(slot)
+    if not clashes:
+        return {}
+
+    conflicts = {}
+    rows = Enrollment.objects.filter(student_id__in=student_ids, course_id__in=clashes)\
+        .order_by('student_id', 'course_id').values_list('student_id', 'course_id')
+    for student_id, course_id in rows:
+        conflicts.setdefault(student_id, []).append(describe(index.slots[course_id], clashes[course_id]))
+    return conflicts
+
+
+def tenant_conflicts(user):
+    """
+    The conflicts report: every pair of clashing courses with the students
+    enrolled in both, most students first. Pairs nobody takes together are
+    listed with no students, since enrolling one would create a conflict.
+    """
+    index = ScheduleIndex(course_slots(user))
+    pairs = index.conflicting_pairs()
+    if not pairs:
+        return []
+
+    involved = {course_id for pair in pairs for course_id in pair}
+    courses_by_student = {}
+    rows = Enrollment.objects.filter(course_id__in=involved, student__deleted_at__isnull=True)\
+        .values_list('student_id', 'course_id', 'student__first_name', 'student__last_name')
+    names = {}
+    for student_id, course_id, first_name, last_name in rows:
+        courses_by_student.setdefault(student_id, set()).add(course_id)
+        names[student_id] = f"{first_name} {last_name}"
+
+    students_by_pair = {pair: [] for pair in pairs}
+    for student_id, course_ids in courses_by_student.items():
+        ordered = sorted(course_ids)
+        for i, first in enumerate(ordered):
+            for second in ordered[i + 1:]:
+                if (first, second) in students_by_pair:
+                    students_by_pair[(first, second)].append({'id': student_id, 'name': names[student_id]})
+
+    report = [
+        {
+            'courses': [describe(index.slots[first], mask), describe(index.slots[second], mask)],
+            'days': days_label(mask),
+            'students': sorted(students_by_pair[(first, second)], key=lambda student: student['name']),
+        }
+        for (first, second), mask in pairs.items()
+    ]
+    report.sort(key=lambda entry: (-len(entry['students']), entry['courses'][0]['name'], entry['courses'][1]['name']))
+    return report
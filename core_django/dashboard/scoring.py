@@ -0,0 +1,153 @@
+"""
+Batch early-warning scoring.
+
+Students are split into partitions of at most `chunk_size` students, never
+mixing tenants, so large tenants still spread across workers. Each partition
+builds its feature matrix in one query (students with balances, joined to
+their StudentFeatures row), runs the grade predictor once over the whole
+matrix and upserts the results into StudentScore. Partitions are independent, so the job scales
+with the number of worker processes until the database write lock dominates.
+
+Run with: python manage.py score_students --workers 8
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+from functools import lru_cache
+
+import django
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .changes import touch
+from .features import FEATURES, ensure_features
+from .models import Student, StudentScore
+from .queries import BALANCE_RISK_THRESHOLD, RISK_CRITICAL, RISK_LOW, RISK_MODERATE, with_balances
+
+MODEL_PATH = os.path.join(settings.BASE_DIR, 'ml_engine', 'grade_predictor.pkl')
+CHUNK_SIZE = 2000
+
+# Predicted grade at or below each cut-off adds this much risk (see student_detail's messages)
+GRADE_RISK = [(50, 85), (70, 60)]
+CRITICAL_SCORE = 80
+MODERATE_SCORE = 50
+
+
+def model_version(path=MODEL_PATH):
+    """Short content hash of the pickled model, stored with every score."""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+@lru_cache(maxsize=4)
+def unpickle_model(path, stamp):
+    return joblib.load(path)
+
+
+def load_model(path=MODEL_PATH):
+    """The model at `path`, re-read whenever the file is replaced (see learning.publish)."""
+    stat = os.stat(path)
+    return unpickle_model(path, (stat.st_mtime_ns, stat.st_ino, stat.st_size))
+
+
+def partitions(users=None, chunk_size=CHUNK_SIZE):
+    """[(user_id, first_student_pk, last_student_pk)], each covering <= chunk_size students."""
+    students = Student.objects.all()
+    if users is not None:
+        students = students.filter(user__in=users)
+    rows = students.order_by('user_id', 'id').values_list('user_id', 'id')
+
+    chunks = []
+    current_user, ids = None, []
+    for user_id, pk in rows.iterator(chunk_size=10000):
+        if user_id != current_user or len(ids) == chunk_size:
+            if ids:
+                chunks.append((current_user, ids[0], ids[-1]))
+            current_user, ids = user_id, []
+        ids.append(pk)
+    if ids:
+        chunks.append((current_user, ids[0], ids[-1]))
+    return chunks
+
+
+def load_features(user_id, first_pk, last_pk):
+    """Returns (student_pks, feature_matrix, balances, course_counts) for one partition."""
+    students = Student.objects.filter(user_id=user_id, pk__gte=first_pk, pk__lte=last_pk)
+    ensure_features(students)
+    rows = list(with_balances(students).order_by('id').values_list(
+        'id', 'balance', 'course_count', *(f'features__{name}' for name in FEATURES),
+    ))
+
+    pks = np.array([row[0] for row in rows], dtype=int)
+    X = np.array([row[3:] for row in rows], dtype=float).reshape(-1, len(FEATURES))
+    balances = np.array([float(row[1] or 0) for row in rows])
+    course_counts = np.array([row[2] for row in rows], dtype=int)
+    return pks, X, balances, course_counts
+
+
+def risk_scores(predicted, balances, course_counts):
+    """Vectorized risk: the balance/enrollment rule from queries.with_risk, raised by a poor predicted grade."""
+    score = np.where(balances > BALANCE_RISK_THRESHOLD, 90, np.where(course_counts == 0, 50, 10))
+    for cutoff, grade_score in GRADE_RISK:
+        score = np.maximum(score, np.where(predicted <= cutoff, grade_score, 0))
+    labels = np.where(score >= CRITICAL_SCORE, RISK_CRITICAL, np.where(score >= MODERATE_SCORE, RISK_MODERATE, RISK_LOW))
+    return score, labels
+
+
+def score_partition(user_id, first_pk, last_pk, version, scored_at, model_path=MODEL_PATH):
+    """Scores one partition and upserts its StudentScore rows. Returns the number scored."""
+    pks, X, balances, course_counts = load_features(user_id, first_pk, last_pk)
+    if not len(pks):
+        return 0
+
+    predicted = np.round(load_model(model_path).predict(pd.DataFrame(X, columns=FEATURES)), 1)
+    score, labels = risk_scores(predicted, balances, course_counts)
+
+    scores = [
+        StudentScore(
+            student_id=int(pk), user_id=user_id, predicted_grade=float(predicted[i]),
+            attendance_rate=float(X[i, 0]), balance=Decimal(f"{balances[i]:.2f}"),
+            risk_score=int(score[i]), risk_label=str(labels[i]),
+            model_version=version, scored_at=scored_at,
+        )
+        for i, pk in enumerate(pks)
+    ]
+    StudentScore.objects.bulk_create(
+        scores, batch_size=1000, update_conflicts=True, unique_fields=['student'],
+        update_fields=['user', 'predicted_grade', 'attendance_rate', 'balance', 'risk_score', 'risk_label',
+                       'model_version', 'scored_at'],
+    )
+    # bulk_create sends no signals; pages showing scores check the user's LastChange
+    touch(users=[user_id])
+    return len(scores)
+
+
+def score_students(users=None, workers=None, chunk_size=CHUNK_SIZE, model_path=MODEL_PATH):
+    """
+    Scores every student (or only `users`' students). workers=1 runs in this
+    process; otherwise partitions go to a ProcessPoolExecutor with `workers`
+    processes (default: one per CPU). Returns (students_scored, partitions).
+    """
+    # Fail before forking if the model is missing or unreadable
+    load_model(model_path)
+    version = model_version(model_path)
+    scored_at = timezone.now()
+    chunks = partitions(users, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(chunks) <= 1:
+        return sum(score_partition(*chunk, version, scored_at, model_path) for chunk in chunks), len(chunks)
+
+    # Forked workers must not share the parent's open database connections
+    connections.close_all()
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        futures = [pool.submit(score_partition, *chunk, version, scored_at, model_path) for chunk in chunks]
+        for future in as_completed(futures):
+            total += future.result()
+    return total, len(chunks)
@@ -0,0 +1,143 @@
+"""
+Student search backed by an SQLite FTS5 index.
+
+dashboard_student_fts is an external-content FTS5 table over dashboard_student,
+kept in sync by triggers so ORM saves, bulk_create and raw SQL writes are all
+covered. user_id is stored UNINDEXED and used to scope matches to a tenant.
+The update trigger only fires for the indexed columns, so bumping
+updated_at (see changes.py) doesn't reindex the row.
+
+Ranking with ORDER BY bm25() scores every match, which gets slow for broad
+typeahead prefixes like "a" on a 50k-student tenant. Instead we stream at most
+CANDIDATE_LIMIT matches and rank those in Python: exact for any query with
+fewer matches than that, and still single-digit ms for the broad ones.
+
+Django rebuilds the whole table for some SQLite schema changes, which drops
+these triggers, so any migration that alters dashboard_student should
+recreate them from a copy of CREATE_SQL, as 0012 does (dropping first makes
+it idempotent, and the rebuild reindexes everything).
+On other database backends search falls back to icontains filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Student
+
+FTS_TABLE = 'dashboard_student_fts'
+FTS_COLUMNS = ['first_name', 'last_name', 'student_id', 'email', 'city', 'country', 'user_id']
+# bm25 weights per column: names matter most, then the ID, then contact/location
+BM25_WEIGHTS = '10.0, 10.0, 8.0, 3.0, 1.0, 1.0, 0.0'
+CANDIDATE_LIMIT = 200
+
+_columns = ', '.join(FTS_COLUMNS)
+_new = ', '.join(f"new.{c}" for c in FTS_COLUMNS)
+_old = ', '.join(f"old.{c}" for c in FTS_COLUMNS)
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        first_name, last_name, student_id, email, city, country,
+        user_id UNINDEXED,
+        content='dashboard_student', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON dashboard_student BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old});
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.id, {_new});
+    END
+    """,
+    # Index the students that already exist
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def install_search_index(conn=connection):
+    """(Re)creates the FTS table and its triggers, then reindexes every student."""
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for sql in DROP_SQL + CREATE_SQL:
+            cursor.execute(sql)
+
+
+def remove_search_index(conn=connection):
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql)
+
+
+def build_match_query(text):
+    """
+    Turns free text into an FTS5 query: every word must match as a prefix.
+    Tokens are quoted, so user input can't inject FTS syntax (AND/OR/NEAR, *).
+    """
+    tokens = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_students(user, text, limit=10, exclude_course=None):
+    """
+    Returns up to `limit` of the user's students matching `text`, best first.
+    `exclude_course` drops students already enrolled in that course (roster picker).
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    if connection.vendor != 'sqlite':
+        return list(fallback_search(user, text, exclude_course)[:limit])
+
+    sql = (
+        f"SELECT rowid, bm25({FTS_TABLE}, {BM25_WEIGHTS}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND user_id = %s"
+    )
+    params = [match, user.pk]
+    if exclude_course is not None:
+        sql += " AND rowid NOT IN (SELECT student_id FROM dashboard_enrollment WHERE course_id = %s)"
+        params.append(exclude_course.pk)
+    sql += " LIMIT %s"
+    params.append(max(CANDIDATE_LIMIT, limit))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # bm25() is lower-is-better
+        ids = [pk for pk, score in sorted(cursor.fetchall(), key=lambda row: row[1])[:limit]]
+
+    students = Student.objects.in_bulk(ids)
+    return [students[pk] for pk in ids if pk in students]
+
+
+def fallback_search(user, text, exclude_course=None):
+    students = Student.objects.filter(user=user)
+    for token in re.findall(r'\w+', text):
+        students = students.filter(
+            Q(first_name__istartswith=token) | Q(last_name__istartswith=token) |
+            Q(student_id__istartswith=token) | Q(email__icontains=token) |
+            Q(city__istartswith=token) | Q(country__istartswith=token)
+        )
+    if exclude_course is not None:
+        students = students.exclude(enrollment__course=exclude_course)
+    return students.order_by('last_name', 'first_name')
@@ -0,0 +1,118 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import forget_user
+from .caching import bump_version
+from .changes import touch
+from .models import Course, Student, StudentFeatures, Payment, MonthlyRevenue, Enrollment, GradeRecord, Attendance, AttendanceBitmap, ClassSession
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_rollup(sender, instance, **kwargs):
+    # Runs inside the deletion collector's transaction, so cascades from
+    # Student/User deletes keep the rollup consistent too. Payments of
+    # soft-deleted students already left it (see Student.remove_from_rollups).
+    if Student.objects.filter(pk=instance.student_id).exists():
+        MonthlyRevenue.apply(instance.user_id, instance.date_of_payment, -instance.amount, -1)
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_attendance_from_bitmap(sender, instance, **kwargs):
+    AttendanceBitmap.mark(instance.course_id, instance.student_id, instance.user_id, instance.date, None)
+    # Like Attendance.save: features leave out soft-deleted courses, sessions soft-deleted students
+    if Course.objects.filter(pk=instance.course_id).exists():
+        StudentFeatures.apply_attendance(instance.student_id, -1, -int(instance.status == Attendance.AttendanceStatus.PRESENT))
+    if Student.objects.filter(pk=instance.student_id).exists():
+        ClassSession.apply_attendance(instance.course_id, instance.date, -1)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_fragments(sender, instance, **kwargs):
+    bump_version('course', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_student_fragments(sender, instance, **kwargs):
+    bump_version('student', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=GradeRecord)
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_gradebook(sender, instance, **kwargs):
+    # Enrollments add/remove matrix rows, grade records fill its cells
+    bump_version('grades', instance.course_id)
+
+
+@receiver(post_save, sender=Student)
+def invalidate_gradebooks_of_deleted_student(sender, instance, update_fields=None, **kwargs):
+    # A soft-deleted student drops out of every gradebook they had a row in
+    if update_fields and 'deleted_at' in update_fields:
+        for course_id in Enrollment.all_objects.filter(student=instance).values_list('course_id', flat=True):
+            bump_version('grades', course_id)
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Course)
+def touch_owner(sender, instance, **kwargs):
+    touch(users=[instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def touch_enrollment(sender, instance, **kwargs):
+    # Enrollment has no user column; the student row knows it
+    if Enrollment.student.is_cached(instance):
+        user_id = instance.student.user_id
+    else:
+        user_id = Student.objects.filter(pk=instance.student_id).values_list('user_id', flat=True).first()
+    touch(users=[user_id], students=[instance.student_id], courses=[instance.course_id])
+
+
+@receiver([post_save, post_delete], sender=GradeRecord)
+@receiver([post_save, post_delete], sender=Attendance)
+@receiver([post_save, post_delete], sender=Payment)
+def touch_student_records(sender, instance, **kwargs):
+    touch(users=[instance.user_id], students=[instance.student_id], courses=[getattr(instance, 'course_id', None)])
+
+
+def forget_users(user_ids):
+    # Now, and again after commit so a request racing the change can't
+    # re-cache the old row under the new version
+    user_ids = list(user_ids)
+    for pk in user_ids:
+        forget_user(pk)
+    transaction.on_commit(lambda: [forget_user(pk) for pk in user_ids])
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Password, is_active, is_staff and is_superuser all live on the row
+    forget_users([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def forget_users_with_changed_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        forget_users([instance.pk])
+    elif pk_set is not None:
+        forget_users(pk_set)
+    else:
+        # group.user_set.clear() / permission.user_set.clear()
+        forget_users(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def forget_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        groups = [instance.pk]
+    elif pk_set is not None:
+        groups = pk_set
+    else:
+        groups = instance.group_set.values_list('pk', flat=True)
+    forget_users(User.objects.filter(groups__in=groups).values_list('pk', flat=True).distinct())
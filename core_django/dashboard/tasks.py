@@ -0,0 +1,59 @@
+"""
+Background tasks run by the job queue (see jobs.py). Each receives its Job
+and returns a JSON-serializable result stored on the job.
+"""
+from django.contrib.auth.models import User
+
+from . import cohorts, learning, purge, scoring
+from .changes import touch
+from .jobs import task
+from .models import Enrollment
+
+
+def update_averages(enrollment_ids, user=None):
+    """Recomputes the enrollments' averages (only of `user`'s students, if given). Returns the rows updated."""
+    enrollments = Enrollment.objects.filter(pk__in=enrollment_ids)
+    if user is not None:
+        enrollments = enrollments.filter(student__user=user)
+    rows = list(enrollments.values_list('student__user_id', 'student_id', 'course_id'))
+    updated = Enrollment.recompute_averages(enrollments)
+    # update() skips the signals that keep conditional GETs fresh
+    if rows:
+        users, students, courses = zip(*rows)
+        touch(users=users, students=students, courses=courses)
+    # New averages in ended courses are outcomes the grade predictor learns from
+    if learning.finalized_enrollments().filter(pk__in=enrollments.values('pk')).exists():
+        learning.schedule_update(user)
+    return updated
+
+
+@task('recompute_averages')
+def recompute_averages(job):
+    """payload: {'enrollment_ids': [...]}"""
+    return {'updated': update_averages(job.payload['enrollment_ids'], job.user)}
+
+
+@task('score_students')
+def score_students(job):
+    """Re-scores the job owner's students in-process (the nightly run covers everyone)."""
+    scored, partitions = scoring.score_students(users=User.objects.filter(pk=job.user_id), workers=1)
+    return {'scored': scored, 'partitions': partitions}
+
+
+@task('update_grade_predictor')
+def update_grade_predictor(job):
+    """Folds new course outcomes into the grade predictor and publishes it (see learning.py)."""
+    return learning.update_predictor()
+
+
+@task('refresh_cohorts')
+def refresh_cohorts(job):
+    """Recomputes the cohort cube cells the owner's recent changes affect (see cohorts.py)."""
+    return cohorts.refresh(User.objects.get(pk=job.user_id))
+
+
+@task('purge_deleted')
+def purge_deleted(job):
+    """Removes the job owner's soft-deleted students and courses."""
+    return purge.purge_deleted(users=User.objects.filter(pk=job.user_id))
+
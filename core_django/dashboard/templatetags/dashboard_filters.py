@@ -7,4 +7,11 @@ def get_item(dictionary, key):
     """Retrieves an item from a dictionary using a dynamic key."""
     if isinstance(dictionary, dict):
         return dictionary.get(key)
-    return None
\ No newline at end of file
+    return None
+
+@register.filter
+def minutes_as_time(minutes):
+    """Formats minutes since midnight (as stored on ClassSession) as HH:MM."""
+    if minutes is None:
+        return ''
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
@@ -0,0 +1,1687 @@
+import os
+import re
+import shutil
+import tempfile
+import warnings
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.test import TestCase
+from sklearn.linear_model import LinearRegression
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import admin as dashboard_admin, attendance, auth, cohorts, course_stats, export, features, forecasting, gradebook, jobs, learning, purge, schedule, scoring, views
+from .queries import with_risk, RISK_CRITICAL, RISK_MODERATE, RISK_LOW
+from .search import search_students
+from .models import parse_schedule_days, Student, Course, Payment, Enrollment, Attendance, AttendanceBitmap, ClassSession, CohortCell, CohortState, GradeRecord, GradeOutcome, Job, LastChange, MonthlyRevenue, PredictorStats, StudentFeatures, StudentScore
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on the hot per-tenant queries in views.py and fails
+    if SQLite falls back to scanning a whole dashboard table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        cls.course = Course.objects.create(user=cls.user, name='Algebra', cost=300)
+        cls.student = Student.objects.create(user=cls.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines() if re.search(r'\bSCAN dashboard_', line)]
+        self.assertEqual(scans, [], f"Query falls back to a full scan:\n{queryset.query}\n\n{plan}")
+
+    def test_tenant_user_is_copied_from_student(self):
+        attendance = Attendance.objects.create(course=self.course, student=self.student)
+        grade = GradeRecord.objects.create(course=self.course, student=self.student, description='Quiz 1')
+        self.assertEqual(attendance.user_id, self.user.id)
+        self.assertEqual(grade.user_id, self.user.id)
+
+    def test_attendance_by_tenant_and_status(self):
+        self.assertNoFullScan(Attendance.objects.filter(user=self.user))
+        self.assertNoFullScan(Attendance.objects.filter(user=self.user, status='P'))
+
+    def test_attendance_by_student_and_status(self):
+        self.assertNoFullScan(Attendance.objects.filter(student=self.student, status='P'))
+
+    def test_attendance_roll_call_for_course_day(self):
+        self.assertNoFullScan(Attendance.objects.filter(course=self.course, date=date.today()))
+
+    def test_grade_records_by_student_and_course(self):
+        self.assertNoFullScan(GradeRecord.objects.filter(student=self.student, course=self.course))
+
+    def test_payments_by_tenant_ordered_by_date(self):
+        self.assertNoFullScan(Payment.objects.filter(user=self.user).order_by('date_of_payment'))
+
+    def test_monthly_revenue_rollup(self):
+        monthly = Payment.objects.filter(user=self.user)\
+            .annotate(month=TruncMonth('date_of_payment'))\
+            .values('month').annotate(total=Sum('amount')).order_by('month')
+        self.assertNoFullScan(monthly)
+
+    def test_student_payment_history(self):
+        self.assertNoFullScan(Payment.objects.filter(student=self.student).order_by('-date_of_payment'))
+
+    def test_enrollment_average_ranges_by_tenant(self):
+        self.assertNoFullScan(Enrollment.objects.filter(student__user=self.user, current_average__gte=90))
+        self.assertNoFullScan(
+            Enrollment.objects.filter(student__user=self.user, current_average__gte=60, current_average__lt=70)
+        )
+
+
+class MonthlyRevenueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.student = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+
+    def pay(self, amount, day):
+        return Payment.objects.create(student=self.student, user=self.user, amount=Decimal(amount), date_of_payment=day)
+
+    def rollup(self):
+        return list(MonthlyRevenue.objects.filter(user=self.user).values_list('month', 'total', 'payment_count'))
+
+    def test_create_edit_and_delete_keep_rollup_in_step(self):
+        first = self.pay('100.00', date(2025, 1, 5))
+        self.pay('50.00', date(2025, 1, 20))
+        self.pay('25.00', date(2025, 2, 1))
+        self.assertEqual(self.rollup(), [
+            (date(2025, 1, 1), Decimal('150.00'), 2),
+            (date(2025, 2, 1), Decimal('25.00'), 1),
+        ])
+
+        # Moving a payment to another month shifts both buckets
+        first.amount = Decimal('80.00')
+        first.date_of_payment = date(2025, 2, 10)
+        first.save()
+        self.assertEqual(self.rollup(), [
+            (date(2025, 1, 1), Decimal('50.00'), 1),
+            (date(2025, 2, 1), Decimal('105.00'), 2),
+        ])
+
+        first.delete()
+        self.assertEqual(self.rollup(), [
+            (date(2025, 1, 1), Decimal('50.00'), 1),
+            (date(2025, 2, 1), Decimal('25.00'), 1),
+        ])
+
+    def test_string_values_are_accepted(self):
+        payment = Payment.objects.create(student=self.student, user=self.user, amount='30.00', date_of_payment='2025-03-05')
+        self.assertEqual(self.rollup(), [(date(2025, 3, 1), Decimal('30.00'), 1)])
+        payment.delete()
+        self.assertEqual(self.rollup(), [])
+
+    def test_cascading_student_delete_empties_rollup(self):
+        self.pay('100.00', date(2025, 1, 5))
+        self.student.delete()
+        self.assertEqual(self.rollup(), [])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.pay('100.00', date(2025, 1, 5))
+        self.pay('40.00', date(2025, 3, 9))
+        incremental = self.rollup()
+
+        MonthlyRevenue.objects.all().delete()
+        MonthlyRevenue.rebuild()
+        self.assertEqual(self.rollup(), incremental)
+
+
+class ForecastingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.student = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+
+    def test_linear_trend_extends_the_line(self):
+        result = forecasting.forecast_matrix(np.array([[10.0, 20.0, 30.0, 40.0]]), horizon=2, method='linear')
+        np.testing.assert_allclose(result['forecast'], [[50.0, 60.0]])
+
+    def test_auto_picks_seasonal_for_term_start_spikes(self):
+        # Big payment every September-style term start, flat otherwise
+        series = np.tile([500.0] + [100.0] * 11, 3)[None, :]
+        result = forecasting.forecast_matrix(series, horizon=13)
+        self.assertEqual(result['method'][0], 'seasonal')
+        self.assertEqual(result['forecast'][0][0], 500.0)
+        self.assertEqual(result['forecast'][0][12], 500.0)
+
+    def test_intervals_bracket_the_forecast(self):
+        rng = np.random.default_rng(0)
+        series = (200 + 10 * np.arange(24) + rng.normal(0, 15, 24))[None, :]
+        for method in forecasting.METHODS:
+            result = forecasting.forecast_matrix(series, horizon=4, method=method)
+            self.assertTrue((result['lower'] <= result['forecast']).all())
+            self.assertTrue((result['forecast'] <= result['upper']).all())
+
+    def test_user_forecast_fills_gaps_and_batch_matches(self):
+        for day in (date(2025, 1, 10), date(2025, 2, 10), date(2025, 4, 10)):
+            Payment.objects.create(student=self.student, user=self.user, amount=Decimal('100.00'), date_of_payment=day)
+
+        result = forecasting.forecast_user_revenue(self.user, horizon=2)
+        self.assertEqual(result['history'], [100.0, 100.0, 0.0, 100.0])
+        self.assertEqual(result['months'], [date(2025, 5, 1), date(2025, 6, 1)])
+
+        batch = forecasting.forecast_all_users(horizon=2)
+        np.testing.assert_allclose(batch[self.user.id]['forecast'], result['forecast'])
+
+    def test_analytics_page_renders_forecast(self):
+        Payment.objects.create(student=self.student, user=self.user, amount=Decimal('100.00'), date_of_payment=date(2025, 1, 10))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard_analytics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Feb 2025', response.context['revenue_labels'])
+
+
+class StudentSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        cls.other = User.objects.create_user('other', password='pass')
+        cls.course = Course.objects.create(user=cls.user, name='Algebra')
+        cls.ada = Student.objects.create(user=cls.user, first_name='Ada', last_name='Lovelace', student_id='S-100',
+                                         email='ada@example.com', city='London', country='UK')
+        cls.alan = Student.objects.create(user=cls.user, first_name='Alan', last_name='Turing', student_id='S-200',
+                                          city='Manchester', country='UK')
+        Student.objects.create(user=cls.other, first_name='Ada', last_name='Yonath', student_id='X-1')
+
+    def names(self, results):
+        return [student.last_name for student in results]
+
+    def test_prefix_search_is_scoped_to_tenant(self):
+        self.assertEqual(self.names(search_students(self.user, 'ad')), ['Lovelace'])
+        self.assertEqual(self.names(search_students(self.user, 'uk man')), ['Turing'])
+        self.assertEqual(self.names(search_students(self.user, 's-200')), ['Turing'])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.alan.city = 'Wilmslow'
+        self.alan.save()
+        self.assertEqual(self.names(search_students(self.user, 'wilm')), ['Turing'])
+        self.assertEqual(search_students(self.user, 'manchester'), [])
+
+        self.alan.delete()
+        self.assertEqual(search_students(self.user, 'turing'), [])
+
+    def test_fts_syntax_in_input_is_harmless(self):
+        self.assertEqual(search_students(self.user, '"ada" OR NEAR(*'), [])
+        self.assertEqual(search_students(self.user, '  '), [])
+
+    def test_typeahead_excludes_enrolled_students(self):
+        Enrollment.objects.create(student=self.ada, course=self.course)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('student_search'), {'q': 'uk', 'course': self.course.pk})
+        self.assertEqual([r['id'] for r in response.json()['results']], [self.alan.pk])
+
+    def test_typeahead_rejects_bad_parameters(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('student_search'), {'q': 'uk', 'course': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('student_search'), {'q': 'uk', 'limit': '-1'})
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('teacher', password='pass')
+        Course.objects.create(user=self.user, name='Algebra')
+        Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        self.client.force_login(self.user)
+
+    def get_counting_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_repeat_dashboard_load_skips_fragment_queries(self):
+        _, cold = self.get_counting_queries(reverse('dashboard_home'))
+        _, warm = self.get_counting_queries(reverse('dashboard_home'))
+        # Recent students, course list and course count all come from the cache,
+        # and so does the logged-in user after the first request (dashboard/auth.py)
+        self.assertEqual(cold - warm, 4)
+
+    def test_course_write_invalidates_fragments(self):
+        self.client.get(reverse('course_list'))
+        Course.objects.create(user=self.user, name='Geometry')
+
+        response, _ = self.get_counting_queries(reverse('course_list'))
+        self.assertContains(response, 'Geometry')
+        response, _ = self.get_counting_queries(reverse('dashboard_home'))
+        self.assertContains(response, 'Geometry')
+
+    def test_student_write_invalidates_recent_students(self):
+        self.client.get(reverse('dashboard_home'))
+        Student.objects.create(user=self.user, first_name='Alan', last_name='Turing', student_id='S2')
+        response, _ = self.get_counting_queries(reverse('dashboard_home'))
+        self.assertContains(response, 'Alan Turing')
+
+    def test_fragments_are_per_user(self):
+        self.client.get(reverse('course_list'))
+        other = User.objects.create_user('other', password='pass')
+        self.client.force_login(other)
+        response, _ = self.get_counting_queries(reverse('course_list'))
+        self.assertNotContains(response, 'Algebra')
+
+
+class RiskScoringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        course = Course.objects.create(user=cls.user, name='Algebra', cost=800)
+        cheap = Course.objects.create(user=cls.user, name='Art', cost=100)
+
+        # Owes 800 - 200 = 600
+        cls.owing = Student.objects.create(user=cls.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        Enrollment.objects.create(student=cls.owing, course=course)
+        Payment.objects.create(student=cls.owing, user=cls.user, amount=Decimal('200.00'), date_of_payment=date(2025, 1, 5))
+        # Not enrolled anywhere
+        cls.idle = Student.objects.create(user=cls.user, first_name='Alan', last_name='Turing', student_id='S2')
+        # Enrolled twice, paid up
+        cls.paid = Student.objects.create(user=cls.user, first_name='Grace', last_name='Hopper', student_id='S3')
+        for c in (course, cheap):
+            Enrollment.objects.create(student=cls.paid, course=c)
+        Payment.objects.create(student=cls.paid, user=cls.user, amount=Decimal('900.00'), date_of_payment=date(2025, 1, 5))
+
+    def test_annotations_match_model_properties(self):
+        for student in with_risk(Student.objects.filter(user=self.user)):
+            self.assertEqual(student.balance, student.current_balance)
+            self.assertEqual(student.course_count, student.courses.count())
+
+        labels = dict(with_risk(Student.objects.filter(user=self.user)).values_list('last_name', 'risk_label'))
+        self.assertEqual(labels, {'Lovelace': RISK_CRITICAL, 'Turing': RISK_MODERATE, 'Hopper': RISK_LOW})
+
+    def test_risk_page_is_a_single_query(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('student_risk'))  # Warm session/auth lookups
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student_risk'))
+        self.assertEqual(response.status_code, 200)
+        student_queries = [q for q in queries if 'dashboard_student' in q['sql']]
+        self.assertEqual(len(student_queries), 1)
+
+    def test_sort_and_level_filter(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('student_risk'), {'sort': 'courses'})
+        self.assertEqual([s.last_name for s in response.context['students']], ['Turing', 'Lovelace', 'Hopper'])
+
+        response = self.client.get(reverse('student_risk'), {'level': RISK_MODERATE})
+        self.assertEqual([s.last_name for s in response.context['students']], ['Turing'])
+        self.assertEqual(response.context['level_counts'][RISK_CRITICAL], 1)
+
+
+class GradebookMatrixTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.course = Course.objects.create(user=self.user, name='Algebra')
+        self.ada = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        self.alan = Student.objects.create(user=self.user, first_name='Alan', last_name='Turing', student_id='S2')
+        for student in (self.ada, self.alan):
+            Enrollment.objects.create(student=student, course=self.course)
+
+    def grade(self, student, description, day, score, max_score=100.0):
+        GradeRecord.objects.create(student=student, course=self.course, description=description,
+                                   date=day, score_obtained=score, max_score=max_score)
+
+    def test_pivot_and_stats(self):
+        self.grade(self.ada, 'Quiz 1', date(2025, 1, 5), 8, 10)
+        self.grade(self.alan, 'Quiz 1', date(2025, 1, 5), 6, 10)
+        self.grade(self.ada, 'Midterm', date(2025, 2, 1), 90)
+        self.grade(self.ada, 'Midterm', date(2025, 2, 1), 70)  # Re-entry: averaged in the cell
+
+        result = gradebook.build_matrix(self.course)
+        self.assertEqual([a['description'] for a in result['assessments']], ['Quiz 1', 'Midterm'])
+        np.testing.assert_allclose(result['matrix'], [[80.0, 80.0], [60.0, np.nan]])
+        np.testing.assert_allclose(result['by_assessment']['mean'], [70.0, 80.0])
+        np.testing.assert_allclose(result['by_student']['mean'], [80.0, 60.0])
+        self.assertEqual(result['rows'][1]['missing'], 1)
+
+    def test_grade_write_invalidates_cached_matrix(self):
+        self.grade(self.ada, 'Quiz 1', date(2025, 1, 5), 50)
+        gradebook.course_matrix(self.course)
+        with self.assertNumQueries(0):
+            gradebook.course_matrix(self.course)
+        self.grade(self.alan, 'Quiz 1', date(2025, 1, 5), 100)
+        np.testing.assert_allclose(gradebook.course_matrix(self.course)['matrix'], [[50.0], [100.0]])
+
+    def test_gradebook_page_records_new_entries(self):
+        self.client.force_login(self.user)
+        enrollment = Enrollment.objects.get(student=self.ada, course=self.course)
+        response = self.client.post(reverse('course_gradebook', args=[self.course.pk]),
+                                    {f'grade_{enrollment.id}': '75', 'grade_0': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(GradeRecord.objects.filter(course=self.course).count(), 1)
+
+        response = self.client.get(reverse('course_gradebook', args=[self.course.pk]))
+        self.assertContains(response, 'Gradebook Entry')
+        self.assertEqual(response.context['gradebook']['rows'][0]['mean'], 75.0)
+
+
+class CourseStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        cls.algebra = Course.objects.create(user=cls.user, name='Algebra')
+        cls.art = Course.objects.create(user=cls.user, name='Art')
+        for i, average in enumerate([95.0, 85.0, 72.0, 65.0, 40.0]):
+            student = Student.objects.create(user=cls.user, first_name=f'S{i}', last_name='Test', student_id=f'S{i}')
+            enrollment = Enrollment.objects.create(student=student, course=cls.algebra)
+            Enrollment.objects.filter(pk=enrollment.pk).update(current_average=average)
+            GradeRecord.objects.create(student=student, course=cls.algebra, description='Quiz', date=date(2025, 1, 5),
+                                       score_obtained=average / 10, max_score=10)
+            GradeRecord.objects.create(student=student, course=cls.algebra, description='Final', date=date(2025, 3, 1),
+                                       score_obtained=40 + i * 10, max_score=100)
+
+    def test_summary_and_bands(self):
+        summary = course_stats.summarize([10.0, 20.0, 30.0, 40.0], bins=4)
+        self.assertEqual(summary['mean'], 25.0)
+        self.assertEqual(summary['median'], 25.0)
+        self.assertEqual(summary['histogram']['counts'], [2, 2, 0, 0])
+        self.assertEqual(course_stats.summarize([], bins=4)['mean'], None)
+
+        bands = course_stats.grade_bands([95, 90, 89.9, 60, 59.9])
+        self.assertEqual(list(bands.values()), [2, 1, 0, 1, 1])
+
+    def test_course_statistics_per_course_and_difficulty(self):
+        stats = course_stats.course_statistics(self.user, bins=5)
+        algebra, art = stats['courses']
+        self.assertEqual(algebra['averages']['count'], 5)
+        self.assertEqual(algebra['averages']['mean'], 71.4)
+        self.assertEqual(algebra['grades']['count'], 10)
+        self.assertEqual(art['averages']['count'], 0)
+
+        # Quiz mean 71.4, Final mean 60: the final is harder
+        self.assertEqual([a['description'] for a in algebra['assessments']], ['Final', 'Quiz'])
+        self.assertEqual(algebra['assessments'][0]['pass_rate'], 60.0)
+        self.assertEqual(algebra['assessments'][0]['difficulty'], 0.4)
+
+    def test_analytics_distribution_and_json_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard_analytics'))
+        self.assertEqual(response.context['grade_counts'], '[1, 1, 1, 1, 1]')
+
+        response = self.client.get(reverse('course_stats_api'), {'course': self.algebra.pk, 'bins': 20})
+        data = response.json()
+        self.assertEqual(len(data['courses']), 1)
+        self.assertEqual(len(data['courses'][0]['averages']['histogram']['counts']), 20)
+        self.assertEqual(self.client.get(reverse('course_stats_api'), {'course': 'abc'}).status_code, 400)
+
+        response = self.client.get(reverse('course_stats'))
+        self.assertContains(response, 'Algebra')
+
+
+class AttendanceBitmapTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.course = Course.objects.create(user=self.user, name='Algebra')
+        self.ada = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        self.alan = Student.objects.create(user=self.user, first_name='Alan', last_name='Turing', student_id='S2')
+        for student in (self.ada, self.alan):
+            Enrollment.objects.create(student=student, course=self.course)
+
+    def mark(self, student, day, status):
+        Attendance.objects.update_or_create(course=self.course, student=student, date=day, defaults={'status': status})
+
+    def bitmaps(self):
+        """Decoded {(student_id, date, field)}, independent of where bit 0 happens to start."""
+        marked = set()
+        for bitmap in AttendanceBitmap.objects.all():
+            for field in ('present', 'absent', 'late', 'excused'):
+                bits = bytes(getattr(bitmap, field))
+                for offset in np.flatnonzero(attendance.unpack(bits, 8 * len(bits))):
+                    marked.add((bitmap.student_id, bitmap.first_day + timedelta(days=int(offset)), field))
+        return marked
+
+    def test_incremental_updates_match_rebuild(self):
+        self.mark(self.ada, date(2025, 1, 10), 'P')
+        self.mark(self.ada, date(2025, 1, 1), 'A')  # Earlier than the first mark: re-based
+        self.mark(self.ada, date(2025, 1, 10), 'L')  # Status change clears the old bit
+        self.mark(self.alan, date(2025, 1, 12), 'P')
+        Attendance.objects.create(course=self.course, student=self.alan, date=date(2025, 1, 20), status='A').delete()
+        incremental = self.bitmaps()
+        self.assertEqual(incremental, {
+            (self.ada.pk, date(2025, 1, 1), 'absent'),
+            (self.ada.pk, date(2025, 1, 10), 'late'),
+            (self.alan.pk, date(2025, 1, 12), 'present'),
+        })
+
+        AttendanceBitmap.objects.all().delete()
+        AttendanceBitmap.rebuild()
+        self.assertEqual(self.bitmaps(), incremental)
+
+    def test_string_dates_are_accepted(self):
+        record = Attendance.objects.create(course=self.course, student=self.ada, date='2025-03-05', status='P')
+        self.assertEqual(self.bitmaps(), {(self.ada.pk, date(2025, 3, 5), 'present')})
+        record.delete()
+        self.assertEqual(self.bitmaps(), set())
+
+    def test_rates_streaks_and_absence_alerts(self):
+        sessions = [date(2025, 1, day) for day in (6, 8, 10, 13, 15, 17)]
+        for day, status in zip(sessions, 'PPAAPA'):
+            self.mark(self.ada, day, status)
+        for day, status in zip(sessions, 'APPLPP'):
+            self.mark(self.alan, day, status)
+
+        stats = attendance.course_attendance(self.course)
+        self.assertEqual(stats[self.ada.pk]['sessions'], 6)
+        self.assertEqual(stats[self.ada.pk]['rate'], 50.0)
+        self.assertEqual(stats[self.ada.pk]['longest_absence'], 2)
+        self.assertEqual(stats[self.ada.pk]['absent_streak'], 1)
+        self.assertTrue(stats[self.ada.pk]['alert'])  # A, A, P, A in the last 5
+        self.assertEqual(stats[self.alan.pk]['present_streak'], 2)
+        self.assertEqual(stats[self.alan.pk]['attended_rate'], 83.3)
+        self.assertFalse(stats[self.alan.pk]['alert'])
+
+    def test_take_attendance_lists_active_students_with_alerts(self):
+        for day in (date(2025, 1, 6), date(2025, 1, 8), date(2025, 1, 10)):
+            self.mark(self.ada, day, 'A')
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('take_attendance', args=[self.course.pk]), {'date': '2025-01-13'})
+        self.assertContains(response, 'Alan Turing')
+        self.assertContains(response, 'Absent 3 of last 5')
+
+
+class StudentScoringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        cls.other = User.objects.create_user('other', password='pass')
+        course = Course.objects.create(user=cls.user, name='Algebra', cost=100)
+        cls.strong = Student.objects.create(user=cls.user, first_name='Ada', last_name='Lovelace', student_id='S1',
+                                            study_hours=20, previous_grade=95)
+        cls.weak = Student.objects.create(user=cls.user, first_name='Alan', last_name='Turing', student_id='S2',
+                                          study_hours=1, previous_grade=40)
+        cls.unenrolled = Student.objects.create(user=cls.other, first_name='Grace', last_name='Hopper', student_id='S3',
+                                                study_hours=10, previous_grade=80)
+        for student in (cls.strong, cls.weak):
+            Enrollment.objects.create(student=student, course=course)
+        Attendance.objects.create(course=course, student=cls.weak, date=date(2025, 1, 6), status='A')
+        Attendance.objects.create(course=course, student=cls.weak, date=date(2025, 1, 8), status='P')
+
+    def setUp(self):
+        # grade = 10 + 30 * attendance + 1.5 * study + 0.4 * previous - 2 * delays, like train_grade_predictor.py
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.uniform(0, 20, (50, 4)), columns=scoring.FEATURES)
+        y = 10 + 30 * X['attendance_rate'] + 1.5 * X['study_hours'] + 0.4 * X['previous_grade'] - 2 * X['payment_delays']
+        handle, self.model_path = tempfile.mkstemp(suffix='.pkl')
+        os.close(handle)
+        joblib.dump(LinearRegression().fit(X, y), self.model_path)
+        scoring.unpickle_model.cache_clear()
+
+    def tearDown(self):
+        os.remove(self.model_path)
+        scoring.unpickle_model.cache_clear()
+
+    def test_partitions_never_mix_tenants(self):
+        chunks = scoring.partitions(chunk_size=1)
+        self.assertEqual(len(chunks), 3)
+        chunks = scoring.partitions(chunk_size=10)
+        self.assertEqual([user_id for user_id, _, _ in chunks], [self.user.id, self.other.id])
+
+    def test_scores_are_written_and_upserted(self):
+        scored, _ = scoring.score_students(workers=1, model_path=self.model_path)
+        self.assertEqual(scored, 3)
+
+        scores = {score.student_id: score for score in StudentScore.objects.all()}
+        self.assertAlmostEqual(scores[self.weak.pk].attendance_rate, 0.5)
+        self.assertAlmostEqual(scores[self.weak.pk].predicted_grade, 10 + 15 + 1.5 + 16, places=0)
+        self.assertEqual(scores[self.weak.pk].risk_label, 'Critical')
+        self.assertEqual(scores[self.strong.pk].risk_label, 'Low Risk')
+        self.assertEqual(scores[self.unenrolled.pk].risk_label, 'Moderate Risk')  # No courses
+        self.assertEqual(scores[self.strong.pk].model_version, scoring.model_version(self.model_path))
+
+        first_run = scores[self.weak.pk].scored_at
+        call_command('score_students', workers=1, model=self.model_path, stdout=open(os.devnull, 'w'))
+        self.assertEqual(StudentScore.objects.count(), 3)
+        self.assertGreater(StudentScore.objects.get(student=self.weak).scored_at, first_run)
+
+    def test_dashboard_lists_stored_at_risk_students(self):
+        scoring.score_students(workers=1, model_path=self.model_path)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard_home'))
+        self.assertEqual([s.student_id for s in response.context['at_risk_students']], [self.weak.pk])
+
+    def test_unreadable_model_is_a_command_error(self):
+        open(self.model_path, 'wb').close()
+        with self.assertRaises(CommandError):
+            call_command('score_students', workers=1, model=self.model_path)
+
+    def test_unknown_user_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, 'No such user: nobody'):
+            call_command('score_students', '--user', self.user.username, '--user', 'nobody',
+                         workers=1, model=self.model_path)
+        self.assertFalse(StudentScore.objects.exists())
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.other = User.objects.create_user('other', password='pass')
+        self.course = Course.objects.create(user=self.user, name='Algebra', cost=100)
+        self.students = [
+            Student.objects.create(user=self.user, first_name=name, last_name='X', student_id=f"S{i}")
+            for i, name in enumerate(['Ada', 'Alan'])
+        ]
+        self.enrollments = [Enrollment.objects.create(student=s, course=self.course) for s in self.students]
+        self.calls = []
+        jobs.TASKS['test_record'] = lambda job: self.calls.append(job.payload['n']) or job.payload['n']
+        jobs.TASKS['test_fail'] = lambda job: 1 / 0
+
+    def tearDown(self):
+        jobs.TASKS.pop('test_record')
+        jobs.TASKS.pop('test_fail')
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('no_such_job')
+
+    def test_jobs_run_by_priority_then_age(self):
+        jobs.enqueue('test_record', {'n': 1}, priority=jobs.PRIORITY_LOW)
+        jobs.enqueue('test_record', {'n': 2})
+        jobs.enqueue('test_record', {'n': 3}, priority=jobs.PRIORITY_HIGH)
+        jobs.enqueue('test_record', {'n': 4})
+        jobs.enqueue('test_record', {'n': 5}, delay=3600)
+
+        self.assertEqual(jobs.run_pending(), 4)
+        self.assertEqual(self.calls, [3, 2, 4, 1])
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 4)
+        self.assertEqual(Job.objects.get(payload__n=3).result, 3)
+
+    def test_failing_job_backs_off_then_fails(self):
+        job = jobs.enqueue('test_fail', max_attempts=2)
+        jobs.run(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn('ZeroDivisionError', job.error)
+        self.assertIsNone(jobs.claim())  # Waiting out the retry delay
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        jobs.run(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_results_the_json_column_cant_store_fail_the_job(self):
+        jobs.TASKS['test_record'] = lambda job: {'when': object()}
+        job = jobs.enqueue('test_record', max_attempts=1)
+        with self.assertLogs('dashboard.jobs', 'ERROR') as logs:
+            jobs.run(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.Status.FAILED, ''))
+        self.assertIn('TypeError', job.error)
+        self.assertIn(f"test_record #{job.pk} (running) failed", logs.output[0])
+
+    def test_a_reclaimed_job_keeps_its_new_owner(self):
+        job = jobs.enqueue('test_record', {'n': 1})
+        claimed = jobs.claim('worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.STALE_AFTER * 2)
+        jobs.claim('worker-b')
+        with self.assertLogs('dashboard.jobs', 'WARNING'):
+            jobs.run(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.result), (Job.Status.RUNNING, 'worker-b', None))
+
+    def test_abandoned_jobs_are_reclaimed_until_out_of_attempts(self):
+        job = jobs.enqueue('test_record', {'n': 1}, max_attempts=2)
+        claimed = jobs.claim('worker-a')
+        self.assertIsNone(jobs.claim('worker-b'))  # Still fresh
+
+        # worker-a dies; its heartbeat stops
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.STALE_AFTER * 2)
+        reclaimed = jobs.claim('worker-b')
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+        self.assertFalse(jobs.beat(claimed))  # A late beat from worker-a doesn't take it back
+
+        # worker-b dies too: no attempts left, so the job fails rather than running again
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.STALE_AFTER * 2)
+        self.assertIsNone(jobs.claim('worker-c'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIn('worker-b stopped responding', job.error)
+        self.assertEqual(self.calls, [])
+
+    def test_heartbeat_keeps_a_long_job_claimed(self):
+        job = jobs.enqueue('test_record', {'n': 1})
+        claimed = jobs.claim('worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.STALE_AFTER * 2)
+        self.assertTrue(jobs.beat(claimed))
+        self.assertIsNone(jobs.claim('worker-b'))
+        jobs.run(claimed)
+        self.assertEqual(self.calls, [1])
+
+    def test_recompute_averages_matches_update_average(self):
+        ada, alan = self.students
+        GradeRecord.objects.create(student=ada, course=self.course, description='Quiz', score_obtained=8, max_score=10)
+        GradeRecord.objects.create(student=ada, course=self.course, description='Test', score_obtained=30, max_score=50)
+        GradeRecord.objects.create(student=ada, course=self.course, description='Bonus', score_obtained=5, max_score=0)
+
+        self.assertEqual(Enrollment.recompute_averages(Enrollment.objects.all()), 2)
+        averages = dict(Enrollment.objects.values_list('student_id', 'current_average'))
+        self.assertAlmostEqual(averages[ada.pk], (80 + 60 + 0) / 3)
+        self.assertEqual(averages[alan.pk], 0.0)
+
+        enrollment = Enrollment.objects.get(student=ada)
+        enrollment.update_average()
+        self.assertAlmostEqual(enrollment.current_average, averages[ada.pk])
+
+    def test_small_grade_saves_update_averages_inline(self):
+        self.client.force_login(self.user)
+        first, second = self.enrollments
+        ada, alan = self.students
+        response = self.client.post(reverse('course_gradebook', args=[self.course.pk]), {f"grade_{first.pk}": '75'})
+        self.assertRedirects(response, reverse('course_gradebook', args=[self.course.pk]))
+        self.client.post(reverse('add_grade', args=[self.course.pk]), {
+            'description': 'Quiz', 'date': '2025-01-06', 'max_score': '20', f"score_{alan.pk}": '15',
+        })
+        self.client.post(reverse('update_grade', args=[first.pk]), {'grade': '25'})
+        self.assertFalse(Job.objects.filter(name='recompute_averages').exists())
+        averages = dict(Enrollment.objects.values_list('pk', 'current_average'))
+        self.assertEqual(averages, {first.pk: 50.0, second.pk: 75.0})
+
+    @mock.patch.object(views, 'INLINE_AVERAGES', 0)
+    def test_big_grade_saves_hand_averages_to_the_queue(self):
+        self.client.force_login(self.user)
+        first, second = self.enrollments
+        response = self.client.post(reverse('course_gradebook', args=[self.course.pk]), {f"grade_{first.pk}": '75'})
+
+        job = Job.objects.get(name='recompute_averages')
+        self.assertEqual((job.payload, job.user), ({'enrollment_ids': [first.pk]}, self.user))
+        self.assertRedirects(response, f"{reverse('course_gradebook', args=[self.course.pk])}?job={job.pk}")
+        self.assertContains(self.client.get(response.url), reverse('job_status', args=[job.pk]))
+        first.refresh_from_db()
+        self.assertEqual(first.current_average, 0.0)
+
+        call_command('run_jobs', once=True, stdout=open(os.devnull, 'w'))
+        first.refresh_from_db()
+        self.assertEqual(first.current_average, 75.0)
+
+    @mock.patch.object(views, 'INLINE_AVERAGES', 0)
+    def test_add_grade_enqueues_for_active_students(self):
+        self.client.force_login(self.user)
+        ada, alan = self.students
+        self.client.post(reverse('add_grade', args=[self.course.pk]), {
+            'description': 'Quiz', 'date': '2025-01-06', 'max_score': '20', f"score_{ada.pk}": '15',
+        })
+        self.assertEqual(GradeRecord.objects.count(), 1)
+        jobs.run_pending()
+        self.assertEqual(Enrollment.objects.get(student=ada).current_average, 75.0)
+
+    def test_job_status_is_scoped_to_the_owner(self):
+        job = jobs.enqueue('test_record', {'n': 1}, user=self.user)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.pk])).status_code, 404)
+
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('job_status', args=[job.pk])).json()
+        self.assertEqual((data['id'], data['status']), (job.pk, 'queued'))
+
+    def test_rescore_reuses_a_pending_job(self):
+        self.client.force_login(self.user)
+        first = self.client.post(reverse('rescore_students'))
+        second = self.client.post(reverse('rescore_students'))
+        job = Job.objects.get(name='score_students')
+        self.assertEqual(first.url, second.url)
+        self.assertTrue(first.url.endswith(f"?job={job.pk}"))
+        self.assertEqual(self.client.get(first.url).context['job'], job)
+
+
+class ReadOnlyAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        cls.other = User.objects.create_user('other', password='pass')
+        cls.course = Course.objects.create(user=cls.user, name='Algebra', cost=300)
+        cls.students = [
+            Student.objects.create(user=cls.user, first_name=f"Student{i}", last_name='X', student_id=f"S{i}")
+            for i in range(5)
+        ]
+        Student.objects.create(user=cls.other, first_name='Hidden', last_name='Y', student_id='H1')
+        for student in cls.students[:3]:
+            Enrollment.objects.create(student=student, course=cls.course)
+        Payment.objects.create(student=cls.students[0], user=cls.user, amount=Decimal('100.00'))
+        GradeRecord.objects.create(student=cls.students[0], course=cls.course, description='Quiz', score_obtained=8, max_score=10)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, url, **params):
+        return self.client.get(url, params)
+
+    def test_requires_login_with_json_401(self):
+        self.client.logout()
+        response = self.get(reverse('api_list', args=['students']))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', response.json())
+
+    def test_cursor_pagination_walks_every_owned_row_once(self):
+        url, seen = reverse('api_list', args=['students']), []
+        params = {'limit': 2}
+        while True:
+            page = self.get(url, **params).json()
+            seen.extend(row['id'] for row in page['data'])
+            if not page['next_cursor']:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(seen, [s.pk for s in self.students])
+        self.assertEqual(self.get(url, cursor='!!').status_code, 400)
+
+    def test_sparse_fields_and_expensive_fields_on_request(self):
+        url = reverse('api_list', args=['students'])
+        row = self.get(url, fields='id,first_name').json()['data'][0]
+        self.assertEqual(row, {'id': self.students[0].pk, 'first_name': 'Student0'})
+
+        row = self.get(url, fields='id,balance,course_count,courses').json()['data'][0]
+        self.assertEqual((Decimal(row['balance']), row['course_count'], row['courses']), (Decimal('200'), 1, [self.course.pk]))
+        self.assertEqual(self.get(url, fields='id,password').status_code, 400)
+
+    def test_page_query_count_does_not_grow_with_rows(self):
+        url = reverse('api_list', args=['students'])
+        self.get(url)  # Caches the session user (dashboard/auth.py)
+        with self.assertNumQueries(3):  # LastChange, page, enrollments for 'courses'
+            self.get(url, fields='id,balance,courses', limit=1000)
+
+    def test_filters_related_names_and_detail(self):
+        grades = self.get(reverse('api_list', args=['grades']), course=self.course.pk, fields='student,percentage').json()
+        self.assertEqual(grades['data'], [{'student': self.students[0].pk, 'percentage': 80.0}])
+
+        enrollments = self.get(reverse('api_list', args=['enrollments']), fields='student_first_name,course_name').json()
+        self.assertEqual(enrollments['data'][0], {'student_first_name': 'Student0', 'course_name': 'Algebra'})
+
+        detail = self.get(reverse('api_detail', args=['courses', self.course.pk]), fields='name,students,student_count').json()
+        self.assertEqual(detail['data'], {'name': 'Algebra', 'students': [s.pk for s in self.students[:3]], 'student_count': 3})
+
+    def test_other_tenants_and_unknown_resources_are_404(self):
+        hidden = Student.objects.get(student_id='H1')
+        self.assertEqual(self.get(reverse('api_detail', args=['students', hidden.pk])).status_code, 404)
+        self.assertEqual(self.get(reverse('api_list', args=['teachers'])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('api_list', args=['students'])).status_code, 405)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = Course.objects.create(user=self.user, name='Algebra', cost=300)
+            self.student = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+            self.enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+
+    def revalidate(self, url):
+        """Status of a later GET that sends back this response's validators."""
+        self.client.get(url)  # Sets the CSRF cookie, which is part of the ETag
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        return lambda: self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code
+
+    def test_unchanged_pages_are_304(self):
+        for url in [reverse('dashboard_home'), reverse('student_detail', args=[self.student.pk]),
+                    reverse('course_gradebook', args=[self.course.pk]), reverse('api_list', args=['students'])]:
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url)(), 304)
+
+    def test_304_skips_the_view(self):
+        url = reverse('course_gradebook', args=[self.course.pk])
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):  # course stamp; session and user come from the cache
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_child_writes_and_deletes_change_the_stamp(self):
+        student_page = self.revalidate(reverse('student_detail', args=[self.student.pk]))
+        gradebook = self.revalidate(reverse('course_gradebook', args=[self.course.pk]))
+        with self.captureOnCommitCallbacks(execute=True):
+            GradeRecord.objects.create(student=self.student, course=self.course, description='Quiz', score_obtained=5)
+        self.assertEqual((student_page(), gradebook()), (200, 200))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.create(student=self.student, user=self.user, amount=50)
+        student_page = self.revalidate(reverse('student_detail', args=[self.student.pk]))
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        self.assertEqual(student_page(), 200)
+
+    def test_bulk_average_recompute_changes_the_stamp(self):
+        dashboard = self.revalidate(reverse('dashboard_home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.enqueue('recompute_averages', {'enrollment_ids': [self.enrollment.pk]}, user=self.user)
+            jobs.run(jobs.claim())
+        self.assertEqual(dashboard(), 200)
+
+    def test_touches_are_batched_per_transaction(self):
+        students = [Student(user=self.user, first_name=f"S{i}", last_name='X') for i in range(20)]
+        Student.objects.bulk_create(students)
+        before = LastChange.objects.get(user=self.user).changed_at
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            for student in Student.objects.filter(first_name__startswith='S'):
+                GradeRecord.objects.create(student=student, course=self.course, description='Quiz', score_obtained=5)
+        touches = [q for q in queries if 'UPDATE "dashboard_student"' in q['sql'] or 'dashboard_lastchange' in q['sql']]
+        self.assertEqual(len(touches), 2)
+        self.assertGreater(LastChange.objects.get(user=self.user).changed_at, before)
+
+    def test_flash_messages_bypass_304(self):
+        url = reverse('course_list')
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('update_grade', args=[self.enrollment.pk]), {'grade': 'abc'})  # Error message, no data change
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class AdminChangelistTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='pass')
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.course = Course.objects.create(user=self.user, name='Algebra', cost=300)
+        self.client.force_login(self.admin)
+        self.client.get(reverse('admin:index'))  # Caches the session user and permissions
+        self.add_students(5)
+
+    def add_students(self, count):
+        start = Student.objects.count()
+        for i in range(start, start + count):
+            student = Student.objects.create(user=self.user, first_name=f"Ada{i}", last_name='Lovelace', student_id=f"S{i}")
+            Enrollment.objects.create(student=student, course=self.course)
+            Payment.objects.create(student=student, user=self.user, amount=100)
+            Attendance.objects.create(course=self.course, student=student, date=date(2025, 1, 6), status='P')
+            GradeRecord.objects.create(student=student, course=self.course, description='Quiz', score_obtained=7, max_score=10)
+
+    def query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelists_use_a_constant_number_of_queries(self):
+        urls = [reverse(f"admin:dashboard_{name}_changelist")
+                for name in ['student', 'course', 'enrollment', 'payment', 'attendance', 'graderecord']]
+        before = {url: self.query_count(url) for url in urls}
+        self.add_students(15)
+        self.assertEqual({url: self.query_count(url) for url in urls}, before)
+
+    def test_student_columns_are_annotated(self):
+        response = self.client.get(reverse('admin:dashboard_student_changelist'))
+        student = response.context['cl'].result_list[0]
+        self.assertEqual((student.course_count, student.balance, student.average), (1, Decimal('200'), 0.0))
+
+    def test_student_search_and_autocomplete_use_the_fts_index(self):
+        response = self.client.get(reverse('admin:dashboard_student_changelist'), {'q': 'ada3'})
+        self.assertEqual([s.first_name for s in response.context['cl'].result_list], ['Ada3'])
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'dashboard', 'model_name': 'enrollment', 'field_name': 'student', 'term': 'ada',
+        })
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_course_autocomplete_is_ordered(self):
+        zoology = Course.objects.create(user=self.user, name='Zoology', cost=100)
+        botany = Course.objects.create(user=self.user, name='Botany', cost=100)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            response = self.client.get(reverse('admin:autocomplete'), {
+                'app_label': 'dashboard', 'model_name': 'enrollment', 'field_name': 'course', 'term': '',
+            })
+        self.assertEqual([row['id'] for row in response.json()['results']],
+                         [str(course.pk) for course in (self.course, botany, zoology)])
+
+    def test_big_unfiltered_changelists_estimate_the_count(self):
+        url = reverse('admin:dashboard_payment_changelist')
+        Payment.objects.filter(pk=Payment.objects.order_by('pk').first().pk).delete()
+        with mock.patch.object(dashboard_admin, 'ESTIMATE_ABOVE', 1):
+            # Estimate is MAX(id), which still counts the deleted row; filtering counts exactly
+            self.assertEqual(self.client.get(url).context['cl'].result_count, 5)
+            filtered = self.client.get(url, {'q': 'none'}).context['cl'].result_count
+        self.assertEqual(filtered, 0)
+        self.assertEqual(self.client.get(url).context['cl'].result_count, 4)
+
+    def test_predictor_stats_changelist_with_a_stats_row(self):
+        learning.get_stats()
+        with mock.patch.object(dashboard_admin, 'ESTIMATE_ABOVE', 0):
+            response = self.client.get(reverse('admin:dashboard_predictorstats_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class SoftDeleteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.client.force_login(self.user)
+        self.course = Course.objects.create(user=self.user, name='Algebra', cost=300)
+        self.other_course = Course.objects.create(user=self.user, name='Poetry', cost=100)
+        self.student = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        self.keeper = Student.objects.create(user=self.user, first_name='Alan', last_name='Turing', student_id='S2')
+        for student in (self.student, self.keeper):
+            Enrollment.objects.create(student=student, course=self.course)
+            Payment.objects.create(student=student, user=self.user, amount=Decimal('50.00'), date_of_payment=date(2025, 1, 10))
+            for day in range(5):
+                Attendance.objects.create(course=self.course, student=student, date=date(2025, 1, 6 + day), status='P')
+                GradeRecord.objects.create(student=student, course=self.course, description=f"Quiz {day}", score_obtained=day)
+        Enrollment.objects.create(student=self.student, course=self.other_course)
+
+    def test_delete_view_hides_at_once_and_queues_the_purge(self):
+        self.client.post(reverse('delete_student', args=[self.student.pk]))
+        self.assertFalse(Student.objects.filter(pk=self.student.pk).exists())
+        self.assertEqual(Student.all_objects.get(pk=self.student.pk).student_id, None)
+        self.assertEqual(self.client.get(reverse('student_detail', args=[self.student.pk])).status_code, 404)
+        self.assertEqual(GradeRecord.all_objects.filter(student=self.student).count(), 5)  # Not purged yet
+        self.assertTrue(Job.objects.filter(name='purge_deleted', user=self.user).exists())
+
+        # The student ID is free for a new student straight away
+        Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+
+        jobs.run_pending()
+        self.assertFalse(Student.all_objects.filter(pk=self.student.pk).exists())
+        for model in (Enrollment, Payment, Attendance, GradeRecord, AttendanceBitmap):
+            self.assertFalse(model._base_manager.filter(student_id=self.student.pk).exists(), model)
+        self.assertEqual(GradeRecord.objects.filter(student=self.keeper).count(), 5)
+
+    def test_totals_drop_deleted_rows_before_the_purge(self):
+        self.student.soft_delete()
+        charges = Enrollment.objects.filter(student__user=self.user).aggregate(total=Sum('course__cost'))['total']
+        self.assertEqual(charges, Decimal('300.00'))
+        rollup = MonthlyRevenue.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.payment_count), (Decimal('50.00'), 1))
+        self.assertEqual(list(attendance.course_attendance(self.course)), [self.keeper.pk])
+        self.assertEqual(len(gradebook.build_matrix(self.course)['students']), 1)
+        response = self.client.get(reverse('dashboard_home'))
+        self.assertEqual(response.context['total_owed'], Decimal('250.00'))
+        for resource in ('enrollments', 'attendance', 'grades', 'payments'):
+            rows = self.client.get(reverse('api_list', args=[resource]), {'fields': 'student'}).json()['data']
+            self.assertEqual({row['student'] for row in rows}, {self.keeper.pk}, resource)
+
+        self.course.soft_delete()
+        self.assertEqual(StudentFeatures.objects.get(student=self.keeper).attendance_total, 0)
+        self.assertFalse(Enrollment.objects.filter(student__user=self.user).exists())
+
+        # The purge leaves every total where soft delete put it
+        purge.purge_deleted(chunk_size=2, pause=0)
+        rollup = MonthlyRevenue.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.payment_count), (Decimal('50.00'), 1))
+        self.assertEqual(StudentFeatures.objects.get(student=self.keeper).attendance_total, 0)
+        self.assertEqual(MonthlyRevenue.rebuild(), 1)
+        self.assertEqual(MonthlyRevenue.objects.get(user=self.user).total, Decimal('50.00'))
+
+    def test_rows_of_deleted_parents_stay_out_of_the_rollups(self):
+        session = ClassSession.objects.create(course=self.course, user=self.user, date=date(2025, 1, 6))
+        ClassSession.recount()
+        self.student.soft_delete()
+        Payment.all_objects.get(student=self.student).save()
+        Attendance.all_objects.get(student=self.student, date=date(2025, 1, 6)).save()
+        Attendance.all_objects.get(student=self.student, date=date(2025, 1, 7)).delete()
+        rollup = MonthlyRevenue.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.payment_count), (Decimal('50.00'), 1))
+        Payment.all_objects.get(student=self.student).delete()
+        self.assertEqual(MonthlyRevenue.objects.get(user=self.user).total, Decimal('50.00'))
+        session.refresh_from_db()
+        self.assertEqual(session.recorded, 1)
+
+        self.course.soft_delete()
+        Attendance.all_objects.get(student=self.keeper, date=date(2025, 1, 6)).save()
+        Attendance.all_objects.get(student=self.keeper, date=date(2025, 1, 7)).delete()
+        self.assertEqual(StudentFeatures.objects.get(student=self.keeper).attendance_total, 0)
+
+    def test_purge_keeps_the_revenue_rollup_consistent(self):
+        self.student.soft_delete()
+        call_command('purge_deleted', chunk_size=2, pause=0, stdout=open(os.devnull, 'w'))
+        rollup = MonthlyRevenue.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.payment_count), (Decimal('50.00'), 1))
+
+    def test_course_purge_runs_in_batches(self):
+        self.course.soft_delete()
+        self.assertEqual(list(self.student.courses.all()), [self.other_course])
+        with CaptureQueriesContext(connection) as queries:
+            totals = purge.purge_deleted(chunk_size=3, pause=0)
+        self.assertEqual(totals['dashboard_attendance'], 10)
+        self.assertEqual(totals['dashboard_graderecord'], 10)
+        deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "dashboard_attendance"')]
+        self.assertEqual(len(deletes), 4)  # 3 + 3 + 3 + 1
+        self.assertFalse(Course.all_objects.filter(pk=self.course.pk).exists())
+        self.assertEqual(Enrollment.objects.filter(student=self.student).count(), 1)
+        self.assertEqual(search_students(self.user, 'ada'), [self.student])
+
+
+class StudentProfileTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.client.force_login(self.user)
+        self.student = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+
+    def add_history(self, days):
+        course = Course.objects.create(user=self.user, name=f"Course {Course.objects.count()}", cost=200)
+        enrollment = Enrollment.objects.create(student=self.student, course=course)
+        for day in range(days):
+            Attendance.objects.create(course=course, student=self.student, date=date(2025, 1, 1) + timedelta(days=day),
+                                      status='P' if day % 4 else 'A')
+            GradeRecord.objects.create(student=self.student, course=course, description=f"Quiz {day}",
+                                       score_obtained=day % 10, max_score=10)
+            Payment.objects.create(student=self.student, user=self.user, amount=10)
+        enrollment.update_average()
+
+    def page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student_detail', args=[self.student.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        self.add_history(2)
+        self.page_queries()  # Caches the session user
+        _, few = self.page_queries()
+        self.add_history(30)
+        self.add_history(30)
+        _, many = self.page_queries()
+        self.assertEqual(few, many)
+
+    def test_profile_matches_the_model_properties(self):
+        self.add_history(8)
+        self.add_history(4)
+        response, _ = self.page_queries()
+        student = Student.objects.get(pk=self.student.pk)
+        self.assertEqual(response.context['balance'], student.current_balance)
+        self.assertAlmostEqual(response.context['overall_average'], student.current_average_grade)
+        self.assertAlmostEqual(response.context['attendance_rate'], 9 / 12)
+        self.assertEqual(len(response.context['grades']), 12)
+        self.assertEqual([c.name for c in response.context['courses']], ['Course 0', 'Course 1'])
+
+    def test_other_tenants_students_are_404(self):
+        other = Student.objects.create(user=User.objects.create_user('other'), first_name='Hidden', last_name='Y')
+        self.assertEqual(self.client.get(reverse('student_detail', args=[other.pk])).status_code, 404)
+
+
+class StudentFeatureStoreTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.course = Course.objects.create(user=self.user, name='Algebra', cost=300)
+        self.other_course = Course.objects.create(user=self.user, name='Poetry', cost=200)
+        self.student = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace',
+                                              study_hours=6, previous_grade=72, payment_delays=1)
+
+    def attend(self, course, days, absent_every=3):
+        return [
+            Attendance.objects.create(course=course, student=self.student, date=date(2025, 1, 1) + timedelta(days=day),
+                                      status='A' if day % absent_every == 0 else 'P')
+            for day in range(days)
+        ]
+
+    def stored(self):
+        return StudentFeatures.objects.filter(student=self.student)\
+            .values_list('attendance_total', 'attendance_present', 'attendance_rate', *StudentFeatures.STUDENT_FIELDS).get()
+
+    def assertMatchesRebuild(self):
+        incremental = self.stored()
+        StudentFeatures.rebuild(students=[self.student.pk])
+        self.assertEqual(self.stored()[:2], incremental[:2])
+        self.assertAlmostEqual(self.stored()[2], incremental[2])
+        self.assertEqual(self.stored()[3:], incremental[3:])
+        return incremental
+
+    def test_new_student_has_a_feature_row(self):
+        self.assertEqual(self.stored(), (0, 0, 1.0, 6, 72.0, 1))
+
+    def test_attendance_writes_update_the_counts(self):
+        rows = self.attend(self.course, 9)
+        self.assertEqual(self.assertMatchesRebuild()[:2], (9, 6))
+        rows[0].status = 'P'
+        rows[0].save()
+        rows[1].delete()
+        Attendance.objects.update_or_create(course=self.course, student=self.student, date=rows[2].date,
+                                            defaults={'status': 'A'})
+        total, present, rate, *_ = self.assertMatchesRebuild()
+        self.assertEqual((total, present), (8, 5))
+        self.assertAlmostEqual(rate, 5 / 8)
+
+    def test_student_edits_update_the_student_fields(self):
+        self.student.study_hours = 12
+        self.student.save(update_fields=['study_hours'])
+        self.student.first_name = 'Augusta'
+        with CaptureQueriesContext(connection) as queries:
+            self.student.save(update_fields=['first_name'])
+        self.assertFalse([q for q in queries if 'dashboard_studentfeatures' in q['sql']])
+        self.assertEqual(self.assertMatchesRebuild()[3:], (12, 72.0, 1))
+
+    def test_course_purge_removes_its_attendance(self):
+        self.attend(self.course, 7)
+        self.attend(self.other_course, 4, absent_every=2)
+        self.course.soft_delete()
+        purge.purge_deleted(chunk_size=3, pause=0)
+        self.assertEqual(self.assertMatchesRebuild()[:2], (4, 2))
+
+    def test_students_created_without_save_get_a_row_on_first_use(self):
+        Student.objects.bulk_create([Student(user=self.user, first_name='Bulk', last_name='Row', study_hours=3)])
+        bulk = Student.objects.get(first_name='Bulk')
+        self.assertFalse(StudentFeatures.objects.filter(student=bulk).exists())
+        Attendance.objects.create(course=self.course, student=bulk, date=date(2025, 1, 1), status='P')
+        self.assertEqual(StudentFeatures.objects.get(student=bulk).attendance_total, 1)
+
+    def test_training_and_scoring_read_the_store(self):
+        self.attend(self.course, 4)
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        GradeRecord.objects.create(student=self.student, course=self.course, description='Quiz', score_obtained=8, max_score=10)
+        enrollment.update_average()
+        StudentFeatures.objects.filter(student=self.student).update(attendance_rate=0.25)
+
+        X, y = features.training_data()
+        self.assertEqual(X.tolist(), [[0.25, 6.0, 72.0, 1.0]])
+        self.assertEqual(y.tolist(), [80.0])
+        _, X, _, _ = scoring.load_features(self.user.pk, self.student.pk, self.student.pk)
+        self.assertEqual(X.tolist(), [[0.25, 6.0, 72.0, 1.0]])
+
+
+class IncrementalPredictorTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        handle, self.model_path = tempfile.mkstemp(suffix='.pkl')
+        os.close(handle)
+        joblib.dump('placeholder', self.model_path)
+        self.first = self.ended_course('Algebra', students=8)
+
+    def tearDown(self):
+        os.remove(self.model_path)
+
+    def ended_course(self, name, students):
+        course = Course.objects.create(user=self.user, name=name, cost=100, end_date=date.today() - timedelta(days=1))
+        for i in range(students):
+            n = Student.objects.count()
+            student = Student.objects.create(user=self.user, first_name=f"S{n}", last_name='X',
+                                             study_hours=n % 7 + 1, previous_grade=50 + 3 * n, payment_delays=n % 3)
+            for day, status in enumerate(['P', 'A' if n % 2 else 'P', 'A' if n % 3 else 'P']):
+                Attendance.objects.create(course=course, student=student, date=date(2025, 1, 1) + timedelta(days=day),
+                                          status=status)
+            rate = StudentFeatures.objects.get(student=student).attendance_rate
+            grade = 10 + 30 * rate + 1.5 * student.study_hours + 0.4 * student.previous_grade - 2 * student.payment_delays
+            enrollment = Enrollment.objects.create(student=student, course=course)
+            GradeRecord.objects.create(student=student, course=course, description='Final', score_obtained=grade, max_score=100)
+            enrollment.update_average()
+        return course
+
+    def update(self, **kwargs):
+        # The model file is swapped in on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return learning.update_predictor(self.model_path, **kwargs)
+
+    def batch_fit(self):
+        rows = GradeOutcome.objects.values_list('grade', *features.FEATURES)
+        X = pd.DataFrame([row[1:] for row in rows], columns=features.FEATURES)
+        return LinearRegression().fit(X, [row[0] for row in rows])
+
+    def assertSameModel(self, model, expected):
+        np.testing.assert_allclose(model.coef_, expected.coef_, atol=1e-6)
+        self.assertAlmostEqual(model.intercept_, expected.intercept_, places=5)
+
+    def test_folding_matches_a_full_fit(self):
+        result = self.update(min_samples=5)
+        self.assertEqual(result, {'folded': 8, 'samples': 8, 'version': 1})
+        self.assertSameModel(scoring.load_model(self.model_path), self.batch_fit())
+        np.testing.assert_allclose(scoring.load_model(self.model_path).coef_, [30, 1.5, 0.4, -2], atol=1e-6)
+
+        self.ended_course('Poetry', students=5)
+        result = self.update(min_samples=5)
+        self.assertEqual(result, {'folded': 5, 'samples': 13, 'version': 2})
+        self.assertSameModel(scoring.load_model(self.model_path), self.batch_fit())
+        # Nothing new: nothing folded or published
+        self.assertEqual(self.update(min_samples=5)['version'], None)
+
+    def test_changed_outcomes_replace_their_old_rows(self):
+        self.update(min_samples=5)
+        enrollment = Enrollment.objects.filter(course=self.first).first()
+        GradeRecord.objects.create(student=enrollment.student, course=self.first, description='Late', score_obtained=0, max_score=100)
+        Enrollment.recompute_averages(Enrollment.objects.filter(pk=enrollment.pk))
+
+        self.assertEqual(self.update(min_samples=5)['folded'], 1)
+        incremental = PredictorStats.objects.get()
+        self.assertEqual(incremental.samples, 8)
+        self.assertEqual(GradeOutcome.objects.get(pk=enrollment.pk).grade, Enrollment.objects.get(pk=enrollment.pk).current_average)
+
+        learning.reset()
+        self.update(min_samples=5)
+        np.testing.assert_allclose(incremental.xtx, PredictorStats.objects.get().xtx)
+        np.testing.assert_allclose(incremental.xty, PredictorStats.objects.get().xty)
+
+    def test_running_courses_and_too_few_samples_publish_nothing(self):
+        Course.objects.filter(pk=self.first.pk).update(end_date=date.today() + timedelta(days=30))
+        self.assertEqual(self.update(min_samples=5)['folded'], 0)
+        Course.objects.filter(pk=self.first.pk).update(end_date=date.today() - timedelta(days=1))
+        self.assertEqual(self.update(min_samples=50),
+                         {'folded': 8, 'samples': 8, 'version': None})
+        self.assertEqual(joblib.load(self.model_path), 'placeholder')
+
+    def test_serving_picks_up_a_published_model(self):
+        learning.save_model(learning.build_model([0, 0, 0, 0], 42.0), self.model_path)
+        X = pd.DataFrame([[1.0, 10, 80, 0]], columns=features.FEATURES)
+        self.assertEqual(scoring.load_model(self.model_path).predict(X)[0], 42.0)
+        self.update(min_samples=5)
+        self.assertAlmostEqual(scoring.load_model(self.model_path).predict(X)[0], 10 + 30 + 15 + 32)
+        self.assertEqual([name for name in os.listdir(os.path.dirname(self.model_path)) if name.endswith('.pkl.tmp')], [])
+
+    def test_a_rolled_back_publish_keeps_the_old_model(self):
+        self.update(min_samples=5)
+        published = open(self.model_path, 'rb').read()
+        self.ended_course('Poetry', students=5)
+        self.update(min_samples=50)
+        with mock.patch.object(PredictorStats, 'save', side_effect=DatabaseError('disk I/O error')), \
+                self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(execute=True):
+            learning.publish(self.model_path, min_samples=5)
+        self.assertEqual(PredictorStats.objects.get().version, 1)
+        self.assertEqual([name for name in os.listdir(os.path.dirname(self.model_path)) if name.endswith('.pkl.tmp')], [])
+        self.assertEqual(open(self.model_path, 'rb').read(), published)
+
+    def test_grade_changes_in_ended_courses_queue_an_update(self):
+        enrollment_ids = list(Enrollment.objects.filter(course=self.first).values_list('pk', flat=True))
+        job = jobs.enqueue('recompute_averages', {'enrollment_ids': enrollment_ids}, user=self.user)
+        jobs.run(job)
+        jobs.run(jobs.enqueue('recompute_averages', {'enrollment_ids': enrollment_ids}, user=self.user))
+        self.assertEqual(Job.objects.filter(name='update_grade_predictor', status=Job.Status.QUEUED).count(), 1)
+
+
+class ColumnarExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.other = User.objects.create_user('other', password='pass')
+        self.directory = tempfile.mkdtemp()
+        for user in (self.user, self.other):
+            course = Course.objects.create(user=user, name='Algebra', cost=300)
+            for i in range(3):
+                student = Student.objects.create(user=user, first_name=f"S{i}", last_name='X')
+                Enrollment.objects.create(student=student, course=course)
+                Payment.objects.create(student=student, user=user, amount=Decimal('99.95'),
+                                       reference_id=None if i else 'REF-1')
+                for day in range(4):
+                    Attendance.objects.create(course=course, student=student, date=date(2025, 1, 6) + timedelta(days=day),
+                                              status='A' if day == 2 else 'P')
+                GradeRecord.objects.create(student=student, course=course, description=f"Quiz {i % 2}",
+                                           score_obtained=7, max_score=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip_in_pages(self):
+        for fmt in ['npy', 'npz']:
+            directory = os.path.join(self.directory, fmt)
+            counts = export.export(directory, fmt=fmt, chunk_size=5)
+            self.assertEqual(counts, {'attendance': 24, 'grades': 6, 'enrollments': 6, 'payments': 6})
+
+            attendance = export.load_table(directory, 'attendance')
+            expected = list(Attendance.objects.order_by('id').values_list('id', 'student_id', 'date', 'status'))
+            self.assertEqual(
+                [(row.id, row.student, row.date.date(), row.status) for row in attendance.itertuples()], expected,
+            )
+            payments = export.load_table(directory, 'payments')
+            self.assertEqual(payments['amount'].tolist(), [99.95] * 6)
+            self.assertEqual(payments['reference_id'].isna().sum(), 4)
+            self.assertEqual(sorted(payments['reference_id'].cat.categories), ['REF-1'])
+            grades = export.load_table(directory, 'grades')
+            self.assertEqual(sorted(grades['description'].cat.categories), ['Quiz 0', 'Quiz 1'])
+
+    def test_npy_columns_are_memory_mapped(self):
+        export.export(self.directory, tables=['attendance'])
+        columns = export.load_columns(self.directory, 'attendance')
+        self.assertIsInstance(columns['date'], np.memmap)
+        self.assertEqual(columns['status'].dtype, np.int32)
+        self.assertEqual(columns['status_dict'].tolist(), ['P', 'A'])
+
+    def test_user_scope(self):
+        counts = export.export(self.directory, fmt='npz', users=User.objects.filter(pk=self.user.pk))
+        self.assertEqual(counts['enrollments'], 3)
+        self.assertEqual(set(export.load_table(self.directory, 'enrollments')['user']), {self.user.pk})
+        self.assertEqual(set(export.load_table(self.directory, 'attendance')['user']), {self.user.pk})
+
+
+class CachedAuthTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.assertTrue(self.client.login(username='teacher', password='pass'))
+        self.job = Job.objects.create(name='score_students', user=self.user)
+        self.url = reverse('job_status', args=[self.job.pk])
+
+    def test_steady_state_requests_do_not_query_sessions_or_users(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual([q['sql'] for q in queries if 'django_session' in q['sql'] or 'auth_user' in q['sql']], [])
+        self.assertEqual(len(queries), 1)  # the job itself
+
+    def test_sessions_survive_a_cache_flush(self):
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new')
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_deactivated_users_are_logged_out(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_permissions_are_cached_until_they_change(self):
+        backend = auth.CachedModelBackend()
+        self.assertFalse(backend.get_user(self.user.pk).has_perm('dashboard.view_student'))
+        with self.assertNumQueries(0):
+            self.assertFalse(backend.has_perm(backend.get_user(self.user.pk), 'dashboard.view_student'))
+
+        permission = Permission.objects.get(codename='view_student')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(permission)
+        self.assertTrue(backend.has_perm(backend.get_user(self.user.pk), 'dashboard.view_student'))
+
+        group = Group.objects.create(name='Registrars')
+        with self.captureOnCommitCallbacks(execute=True):
+            group.user_set.add(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            group.permissions.add(Permission.objects.get(codename='change_student'))
+        self.assertTrue(backend.has_perm(backend.get_user(self.user.pk), 'dashboard.change_student'))
+        with self.captureOnCommitCallbacks(execute=True):
+            group.permissions.clear()
+        self.assertFalse(backend.has_perm(backend.get_user(self.user.pk), 'dashboard.change_student'))
+
+
+class ScheduleConflictTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', password='pass')
+        start = date(2025, 1, 6)
+        cls.algebra = Course.objects.create(user=cls.user, name='Algebra', schedule_days='Mon/Wed',
+                                            start_time='09:00', end_time='10:30', start_date=start)
+        cls.biology = Course.objects.create(user=cls.user, name='Biology', schedule_days='Wednesday, Friday',
+                                            start_time='10:00', end_time='11:00', start_date=start)
+        cls.chemistry = Course.objects.create(user=cls.user, name='Chemistry', schedule_days='MWF',
+                                              start_time='10:30', end_time='12:00', start_date=start)
+        cls.history = Course.objects.create(user=cls.user, name='History', schedule_days='Mon-Fri',
+                                            start_time='09:30', end_time='10:00', start_date=date(2024, 1, 1),
+                                            end_date=date(2024, 12, 31))
+        cls.alice = Student.objects.create(user=cls.user, first_name='Alice', last_name='A', student_id='A1')
+        cls.bob = Student.objects.create(user=cls.user, first_name='Bob', last_name='B', student_id='B1')
+        Enrollment.objects.create(student=cls.alice, course=cls.algebra)
+
+    def test_schedule_normalized_on_save(self):
+        self.assertEqual(parse_schedule_days('Mon/Wed'), 0b101)
+        self.assertEqual(parse_schedule_days('Tuesday & Thursday'), 0b1010)
+        self.assertEqual(parse_schedule_days('TR'), 0b1010)
+        self.assertEqual(parse_schedule_days('Mon-Fri'), 0b11111)
+        self.assertEqual(parse_schedule_days('Sat-Mon'), 0b1100001)
+        self.assertEqual(parse_schedule_days('Online'), 0)
+        self.assertEqual(parse_schedule_days('Weekends'), 0b1100000)
+        self.assertEqual(parse_schedule_days('Weekly, Mon'), 0b1)
+        self.assertEqual(parse_schedule_days('Mon through Fri'), 0b11111)
+        self.assertEqual(parse_schedule_days('Tues to Thurs'), 0b1110)
+        self.assertEqual(parse_schedule_days('Sunday mornings'), 0b1000000)
+        self.assertEqual(parse_schedule_days('Sat (more TBA)'), 0b100000)
+        self.assertEqual(parse_schedule_days('Mondays and Wednesdays'), 0b101)
+        self.assertEqual(parse_schedule_days('MWF'), 0b10101)
+        self.assertEqual(parse_schedule_days('M W F'), 0b10101)
+        self.assertEqual(parse_schedule_days('TTh'), 0b1010)
+        self.assertEqual(parse_schedule_days('TBA'), 0)
+        self.assertEqual((self.algebra.schedule_mask, self.algebra.start_minute, self.algebra.end_minute), (0b101, 540, 630))
+
+        self.algebra.schedule_days = 'Fri'
+        self.algebra.save(update_fields=['schedule_days'])
+        self.assertEqual(Course.objects.get(pk=self.algebra.pk).schedule_mask, 0b10000)
+
+    def test_index_matches_pairwise_comparison(self):
+        slots = [
+            {'id': i, 'name': str(i), 'mask': (i * 37) % 127 + 1, 'start': (i * 53) % 600 + 480,
+             'end': (i * 53) % 600 + 480 + 30 + (i * 17) % 120, 'start_date': date(2025, 1, 1),
+             'end_date': None if i % 3 else date(2025, 1 + i % 12, 1)}
+            for i in range(1, 120)
+        ]
+        expected = {
+            (a['id'], b['id']): a['mask'] & b['mask']
+            for a in slots for b in slots
+            if a['id'] < b['id'] and a['mask'] & b['mask'] and a['start'] < b['end'] and b['start'] < a['end']
+            and schedule.dates_overlap(a, b)
+        }
+        self.assertEqual(schedule.ScheduleIndex(slots).conflicting_pairs(), expected)
+
+    def test_roster_skips_conflicting_students(self):
+        self.client.force_login(self.user)
+        url = reverse('manage_roster', args=[self.biology.pk])
+        response = self.client.post(url, {'students_to_add': [self.alice.pk, self.bob.pk]}, follow=True)
+        self.assertFalse(Enrollment.objects.filter(student=self.alice, course=self.biology).exists())
+        self.assertTrue(Enrollment.objects.filter(student=self.bob, course=self.biology).exists())
+        self.assertContains(response, 'Skipped 1 students with a schedule conflict')
+        # History ended last year, Chemistry starts as Algebra ends: neither clashes
+        self.assertContains(response, 'Alice A (Algebra)')
+
+        # The index and the batch's enrollments: two queries for any number of students
+        students = [Student.objects.create(user=self.user, first_name=f'S{i}', last_name='Test', student_id=f'S{i}')
+                    for i in range(50)]
+        with self.assertNumQueries(2):
+            conflicts = schedule.enrollment_conflicts(self.biology, [self.alice.pk] + [s.pk for s in students])
+        self.assertEqual(list(conflicts), [self.alice.pk])
+
+        self.client.post(url, {'students_to_add': [self.alice.pk], 'allow_conflicts': '1'})
+        self.assertTrue(Enrollment.objects.filter(student=self.alice, course=self.biology).exists())
+
+        other = User.objects.create_user('other', password='pass')
+        stranger = Student.objects.create(user=other, first_name='Eve', last_name='E', student_id='E1')
+        self.assertEqual(self.client.post(url, {'students_to_add': [stranger.pk]}).status_code, 404)
+
+    def test_tenant_report(self):
+        Enrollment.objects.create(student=self.alice, course=self.biology)
+        report = schedule.tenant_conflicts(self.user)
+        pairs = [[course['name'] for course in entry['courses']] for entry in report]
+        self.assertEqual(pairs, [['Algebra', 'Biology'], ['Biology', 'Chemistry']])
+        self.assertEqual(report[0]['days'], 'Wed')
+        self.assertEqual([student['name'] for student in report[0]['students']], ['Alice A'])
+        self.assertEqual(report[1]['students'], [])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('schedule_conflicts'))
+        self.assertContains(response, '2 clashing course pairs, 1 student enrolled in both')
+
+
+class ClassSessionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='pass')
+        self.course = Course.objects.create(user=self.user, name='Algebra', schedule_days='Mon/Wed', start_time='09:00',
+                                            end_time='10:00', start_date=date(2025, 1, 6), end_date=date(2025, 1, 31))
+        self.ada = Student.objects.create(user=self.user, first_name='Ada', last_name='Lovelace', student_id='S1')
+        self.alan = Student.objects.create(user=self.user, first_name='Alan', last_name='Turing', student_id='S2')
+        for student in (self.ada, self.alan):
+            Enrollment.objects.create(student=student, course=self.course, start_date=date(2025, 1, 1))
+
+    def sessions(self):
+        return dict(ClassSession.objects.filter(course=self.course).values_list('date', 'recorded'))
+
+    def test_calendar_follows_schedule_changes(self):
+        mondays = [date(2025, 1, day) for day in (6, 13, 20, 27)]
+        wednesdays = [date(2025, 1, day) for day in (8, 15, 22, 29)]
+        self.assertEqual(sorted(self.sessions()), sorted(mondays + wednesdays))
+
+        Attendance.objects.create(course=self.course, student=self.ada, date=date(2025, 1, 8), status='P')
+        Attendance.objects.create(course=self.course, student=self.ada, date=date(2025, 1, 10), status='P')
+        self.course.schedule_days = 'Mon, Fri'
+        self.course.start_time = '13:30'
+        self.course.save(update_fields=['schedule_days', 'start_time'])
+
+        # Wednesdays go, except the one with a roll-call; Friday the 10th arrives with its roll-call counted
+        fridays = [date(2025, 1, day) for day in (10, 17, 24, 31)]
+        sessions = self.sessions()
+        self.assertEqual(sorted(sessions), sorted(mondays + fridays + [date(2025, 1, 8)]))
+        self.assertEqual((sessions[date(2025, 1, 8)], sessions[date(2025, 1, 10)], sessions[date(2025, 1, 17)]), (1, 1, 0))
+        self.assertFalse(ClassSession.objects.filter(course=self.course).exclude(start_minute=810).exists())
+
+        # Open-ended courses run up to the rolling horizon
+        daily = Course.objects.create(user=self.user, name='Art', schedule_days='daily', start_date=date(2025, 1, 1))
+        self.assertEqual(ClassSession.objects.filter(course=daily).latest('date').date, date.today() + timedelta(days=180))
+        self.assertEqual(ClassSession.generate(daily), (0, 0))
+
+    def test_roll_call_counts_follow_attendance_writes(self):
+        record = Attendance.objects.create(course=self.course, student=self.ada, date=date(2025, 1, 6), status='P')
+        Attendance.objects.create(course=self.course, student=self.alan, date=date(2025, 1, 6), status='A')
+        record.status = 'L'
+        record.save()
+        self.assertEqual(self.sessions()[date(2025, 1, 6)], 2)
+
+        record.date = date(2025, 1, 8)
+        record.save()
+        Attendance.objects.filter(student=self.alan).delete()
+        counts = self.sessions()
+        self.assertEqual((counts[date(2025, 1, 6)], counts[date(2025, 1, 8)]), (0, 1))
+
+        ClassSession.objects.update(recorded=5)
+        ClassSession.recount()
+        self.assertEqual(self.sessions(), counts)
+
+    def test_rates_against_scheduled_sessions(self):
+        for day in (date(2025, 1, 6), date(2025, 1, 8)):
+            Attendance.objects.create(course=self.course, student=self.ada, date=day, status='P')
+        Attendance.objects.create(course=self.course, student=self.ada, date=date(2025, 1, 11), status='P')
+
+        stats = attendance.course_attendance(self.course, today=date(2025, 1, 15))
+        # Recorded sessions say 100%; 2 of the 4 classes held so far say otherwise (the 11th wasn't scheduled)
+        self.assertEqual(stats[self.ada.pk]['rate'], 100.0)
+        self.assertEqual((stats[self.ada.pk]['scheduled'], stats[self.ada.pk]['scheduled_rate']), (4, 50.0))
+        # Never marked at all
+        self.assertEqual((stats[self.alan.pk]['sessions'], stats[self.alan.pk]['scheduled_rate']), (0, 0.0))
+
+        Enrollment.objects.filter(student=self.alan).update(start_date=date(2025, 1, 14))
+        stats = attendance.course_attendance(self.course, today=date(2025, 1, 15))
+        self.assertEqual(stats[self.alan.pk]['scheduled'], 1)
+
+    def test_class_calendar_and_schedule_warning(self):
+        Attendance.objects.create(course=self.course, student=self.ada, date=date(2025, 1, 6), status='P')
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('class_calendar'), {'date': '2025-01-08'})
+        self.assertEqual([session.course for session in response.context['sessions']], [self.course])
+        self.assertContains(response, '09:00 - 10:00')
+        # Every January class but the 6th is waiting for a roll-call
+        self.assertEqual(response.context['missing_count'], 7)
+        self.assertEqual(response.context['missing'][0].date, date(2025, 1, 29))
+        response = self.client.get(reverse('class_calendar'), {'date': 'bad'})
+        self.assertEqual(response.context['current_date'], timezone.localdate())
+
+        url = reverse('take_attendance', args=[self.course.pk])
+        self.assertIsNone(self.client.get(url, {'date': '2025-01-13'}).context['schedule_warning'])
+        self.assertIn('no scheduled class', self.client.get(url, {'date': '2025-01-14'}).context['schedule_warning'])
+        self.assertIn('no scheduled class', self.client.get(url, {'date': '2025-02-03'}).context['schedule_warning'])
+
+
+class CohortCubeTests(TestCase):
+
+    def setUp(self):
+        # Run the touches now, so the ones a test makes start a batch of their own
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user('teacher', password='pass')
+            self.algebra = Course.objects.create(user=self.user, name='Algebra')
+            self.art = Course.objects.create(user=self.user, name='Art')
+            self.lima = Student.objects.create(user=self.user, first_name='Ana', last_name='A', student_id='S1',
+                                               country='Peru', city='Lima', age=20)
+            self.cusco = Student.objects.create(user=self.user, first_name='Ben', last_name='B', student_id='S2',
+                                                country='Peru', city='Cusco', age=40)
+            self.santiago = Student.objects.create(user=self.user, first_name='Cam', last_name='C', student_id='S3',
+                                                   country='Chile', city=' Santiago ', age=17)
+            self.unknown = Student.objects.create(user=self.user, first_name='Dee', last_name='D', student_id='S4')
+            for student, course, start in [(self.lima, self.algebra, date(2025, 1, 10)), (self.cusco, self.algebra, date(2025, 2, 3)),
+                                           (self.cusco, self.art, date(2025, 2, 3)), (self.santiago, self.art, date(2025, 1, 20))]:
+                Enrollment.objects.create(student=student, course=course, start_date=start)
+            for student, score in [(self.lima, 80), (self.cusco, 60)]:
+                GradeRecord.objects.create(student=student, course=self.algebra, description='Quiz', date=date(2025, 2, 1),
+                                           score_obtained=score, max_score=100)
+            for student, day, status in [(self.lima, date(2025, 1, 13), 'P'), (self.lima, date(2025, 1, 15), 'A'),
+                                         (self.cusco, date(2025, 2, 5), 'P'), (self.santiago, date(2025, 1, 22), 'P')]:
+                Attendance.objects.create(course=self.algebra if student != self.santiago else self.art, student=student,
+                                          date=day, status=status)
+            for student, amount, day in [(self.lima, '100.00', date(2025, 1, 5)), (self.cusco, '50.00', date(2025, 2, 5)),
+                                         (self.unknown, '25.00', date(2025, 2, 7))]:
+                Payment.objects.create(student=student, user=self.user, amount=Decimal(amount), date_of_payment=day)
+
+    def rows(self, by, **filters):
+        return {row['label']: row for row in cohorts.cube_slice(self.user, filters, by)['rows']}
+
+    def test_slices_match_raw_tables(self):
+        self.assertEqual(cohorts.refresh(self.user)['cohorts'], None)
+
+        by_country = self.rows('country')
+        self.assertEqual(list(by_country), ['Unknown', 'Chile', 'Peru'])
+        peru = by_country['Peru']
+        self.assertEqual((peru['students'], peru['enrollments'], peru['revenue']), (2, 3, 150.0))
+        self.assertEqual((peru['average_grade'], peru['attendance_rate']), (70.0, 66.7))
+
+        self.assertEqual(list(self.rows('city', country='Chile')), ['Santiago'])
+        self.assertEqual(list(self.rows('age_band')), ['18-24', '35-49', 'Under 18', 'Unknown'])
+        by_month = self.rows('month', country='Peru', course=self.algebra.pk)
+        self.assertEqual({label: row['enrollments'] for label, row in by_month.items()}, {'Jan 2025': 1, 'Feb 2025': 1})
+        self.assertEqual(by_month['Feb 2025']['average_grade'], 70.0)
+        # Payments belong to no course
+        self.assertEqual(self.rows('country', course=None)['Unknown']['revenue'], 25.0)
+        self.assertEqual(cohorts.cube_slice(self.user, {'course': self.art.pk}, 'country')['totals']['revenue'], 0.0)
+
+    @mock.patch.object(cohorts, 'OVERLAP', timedelta(0))
+    def test_refresh_recomputes_only_changed_cohorts(self):
+        cohorts.refresh(self.user)
+        chile_cells = set(CohortCell.objects.filter(country='Chile').values_list('pk', flat=True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lima.city = 'Arequipa'
+            self.lima.save()
+            Attendance.objects.create(course=self.algebra, student=self.cusco, date=date(2025, 2, 7), status='A')
+        # Lima's old cohort, Arequipa and Cusco
+        self.assertEqual(cohorts.refresh(self.user), {'cohorts': 3, 'cells': 8})
+        self.assertEqual(set(self.rows('city', country='Peru')), {'Arequipa', 'Cusco'})
+        self.assertEqual(self.rows('country')['Peru']['attendance_rate'], 50.0)
+        self.assertEqual(set(CohortCell.objects.filter(country='Chile').values_list('pk', flat=True)), chile_cells)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cusco.soft_delete()
+            Student.all_objects.filter(pk=self.santiago.pk).delete()
+        cohorts.refresh(self.user)
+        self.assertEqual(list(self.rows('country')), ['Unknown', 'Peru'])
+        self.assertEqual(self.rows('country')['Peru']['revenue'], 100.0)
+
+    def test_cohort_pages_drill_down_and_queue_refreshes(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('cohort_analytics'))
+        self.assertContains(response, 'being built for the first time')
+        self.assertTrue(Job.objects.filter(name='refresh_cohorts', user=self.user, status=Job.Status.QUEUED).exists())
+
+        cohorts.refresh(self.user)
+        response = self.client.get(reverse('cohort_analytics'), {'by': 'country'})
+        peru = next(row for row in response.context['data']['rows'] if row['label'] == 'Peru')
+        self.assertEqual(peru['drill_url'], reverse('cohort_analytics') + '?country=Peru&by=city')
+
+        response = self.client.get(reverse('cohort_analytics_api'), {'country': 'Peru', 'by': 'month'})
+        data = response.json()
+        # Students count in the month they were added
+        self.assertEqual([row['value'] for row in data['rows']], ['2025-01', '2025-02', date.today().strftime('%Y-%m')])
+        self.assertEqual(data['totals']['enrollments'], 3)
+        self.assertFalse(data['stale'])
@@ -13,15 +13,21 @@ urlpatterns = [
     path('student/edit/<int:pk>/', views.edit_student, name='edit_student'),
     path('student/delete/<int:pk>/', views.delete_student, name='delete_student'),
     path('students/', views.student_list, name='student_list'),
+    path('students/search/', views.student_search, name='student_search'),
 
     # Course Paths
     path('courses/', views.course_list, name='course_list'),
     path('courses/<int:pk>/', views.course_detail, name='course_detail'),
     path('course/<int:course_pk>/attendance/', views.take_attendance, name='take_attendance'),
+    path('classes/', views.class_calendar, name='class_calendar'),
     path('course/add/', views.add_course, name='add_course'),
     path('course/edit/<int:pk>/', views.edit_course, name='edit_course'),
     path('course/delete/<int:pk>/', views.delete_course, name='delete_course'),
     path('course/manage/<int:pk>/', views.manage_roster, name='manage_roster'),
+    path('courses/stats/', views.course_stats, name='course_stats'),
+    path('course/<int:pk>/stats/', views.course_stats, name='course_stats_detail'),
+    path('courses/stats.json', views.course_stats_api, name='course_stats_api'),
+    path('courses/conflicts/', views.schedule_conflicts, name='schedule_conflicts'),
 
     # Payment Paths
     path('student/<int:student_pk>/add-payment/', views.add_payment, name='add_payment'),
@@ -32,6 +38,17 @@ urlpatterns = [
     # Dashboard Analytics Path
     path('', views.dashboard_home, name='dashboard_home'), 
     path('analytics/', views.dashboard_analytics, name='dashboard_analytics'),
+    path('analytics/cohorts/', views.cohort_analytics, name='cohort_analytics'),
+    path('analytics/cohorts.json', views.cohort_analytics_api, name='cohort_analytics_api'),
+    path('risk/', views.fetch_flask_data, name='student_risk'),
+    path('risk/rescore/', views.rescore_students, name='rescore_students'),
+
+    # Background Jobs
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+
+    # Read-only JSON API
+    path('api/v1/<str:resource>/', views.api_list, name='api_list'),
+    path('api/v1/<str:resource>/<int:pk>/', views.api_detail, name='api_detail'),
 
     # Grading Path
     path('enrollment/grade/<int:enrollment_id>/', views.update_grade, name='update_grade'),
@@ -1,71 +1,137 @@
 import requests  
 import jwt
 import os
-import joblib
 import pandas as pd
 import json
 from django.utils import timezone
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Avg, Count, F, Q
+from django.db.models import Sum, Avg, Count, Exists, F, OuterRef, Q
 from django.db import transaction # ADDED: Import transaction for atomic updates
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from datetime import timedelta
 from decimal import Decimal
-from django.db.models.functions import TruncMonth
+from functools import wraps
 from django.conf import settings
 
 # Imports from local modules
 from .forms import StudentForm, CourseForm, ManageRosterForm, PaymentForm
-from .models import Student, Course, Payment, Enrollment, Attendance, GradeRecord
+from .models import Student, Course, Payment, Enrollment, Attendance, ClassSession, GradeRecord, MonthlyRevenue, StudentScore, Job
+from .forecasting import forecast_user_revenue
+from .search import search_students
+from .caching import get_versions, FRAGMENT_TIMEOUT
+from .changes import conditional, cohort_stamp, course_stamp, student_stamp, user_stamp
+from .queries import with_risk, RISK_LEVELS
+from .gradebook import course_matrix, matrix_version
+from .profiles import load_profile
+from .attendance import course_attendance, RECENT_WINDOW
+from .scoring import CRITICAL_SCORE, MODEL_PATH, load_model
+from .learning import schedule_update
+from .features import FEATURES, feature_vector
+from . import api
+from .jobs import enqueue, as_dict, PRIORITY_HIGH, PRIORITY_LOW
+from .tasks import update_averages
+from .course_stats import course_statistics, grade_bands, DEFAULT_BINS, MAX_BINS
+from .schedule import enrollment_conflicts, tenant_conflicts
+from . import cohorts
 
 FLASK_API_URL = "http://127.0.0.1:5001/api/v1/get-data"
-FLASK_VALIDATE_URL = "http://127.0.0.1:5001/api/v1/validate-student"
 FLASK_PREDICT_URL = "http://127.0.0.1:5001/api/v1/predict-risk"
 
+# Months of revenue forecast shown on the analytics page
+FORECAST_HORIZON = 3
+
+# Student search / roster page sizes
+SEARCH_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+STUDENTS_PER_PAGE = 50
+AT_RISK_LIMIT = 10
+# Students named in the roster's "skipped for a conflict" message
+CONFLICTS_LISTED = 10
+# Sessions listed under "missing roll-calls" on the class calendar
+MISSING_ROLL_CALLS = 20
+# Grade saves touching at most this many enrollments recompute averages in the request
+INLINE_AVERAGES = 50
+
+# ?sort= options for the risk view
+RISK_SORTS = {
+    'risk': ['-risk_score', '-balance', 'last_name'],
+    'balance': ['-balance', 'last_name'],
+    'courses': ['course_count', 'last_name'],
+    'name': ['last_name', 'first_name'],
+}
+
 @login_required
+@conditional(user_stamp)
 def fetch_flask_data(request):
     """
-    1. Fetches the list of students and courses owned by the current user.
-    2. Generates a JWT token for the logged-in user.
-    3. Sends a request with that token to the Flask service.
-    4. Renders the response from Flask.
+    Risk overview for every student owned by the current user.
+    Balances, course counts and risk labels are computed by one annotated
+    query (see queries.with_risk), sorted with ?sort= and filtered with ?level=.
     """
-    students = Student.objects.filter(user=request.user).order_by('last_name')
-    courses = Course.objects.filter(user=request.user).order_by('name')
+    sort = request.GET.get('sort', 'risk')
+    if sort not in RISK_SORTS:
+        sort = 'risk'
+    level = request.GET.get('level', '')
+
+    # Last nightly score (score_students) comes along via a LEFT JOIN, still one query
+    students = with_risk(Student.objects.filter(user=request.user)).annotate(
+        predicted_grade=F('score__predicted_grade'),
+        warning_label=F('score__risk_label'),
+    ).order_by(*RISK_SORTS[sort])
+
+    # Single query: count every level from the result, then filter in memory
+    # so the summary badges stay correct while a filter is applied
+    rows = list(students)
+    level_counts = {label: 0 for label in RISK_LEVELS}
+    for student in rows:
+        level_counts[student.risk_label] += 1
+        student.risk = {'label': student.risk_label, 'risk_score': student.risk_score}
+    if level in level_counts:
+        rows = [student for student in rows if student.risk_label == level]
 
-    # Calculate Risk (In-Memory)
-    # This adds the 'risk' attribute to each student object for the template
-    for student in students:
-        try:
-            # Logic: If balance > $500 or courses < 1, high risk
-            risk_label = "Low Risk"
-            risk_score = 10
-            
-            if student.current_balance > 500:
-                risk_label = "Critical"
-                risk_score = 90
-            elif student.courses.count() == 0:
-                risk_label = "Moderate Risk"
-                risk_score = 50
-                
-            student.risk = {'label': risk_label, 'risk_score': risk_score}
-        except Exception:
-            student.risk = {'label': 'Error', 'risk_score': 0}
-
-    # Prepare Context
     context = {
-        "flask_response": None,
-        "error": None,
-        "students": students,
-        "courses": courses
+        'students': rows,
+        'sort': sort,
+        'level': level,
+        'level_counts': level_counts,
+        'total_students': sum(level_counts.values()),
     }
 
-    return render(request, 'dashboard/index.html', context)
+    # Rescore job started from this page, polled by the template
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        context['job'] = Job.objects.filter(pk=job_id, user=request.user).first()
+
+    return render(request, 'dashboard/student_risk.html', context)
+
+@login_required
+def rescore_students(request):
+    """Queues a re-score of the user's students and goes back to the risk page to watch it."""
+    if request.method != 'POST':
+        return redirect('student_risk')
+    job = Job.objects.filter(
+        user=request.user, name='score_students', status__in=[Job.Status.QUEUED, Job.Status.RUNNING],
+    ).first()
+    if job is None:
+        job = enqueue('score_students', user=request.user, priority=PRIORITY_LOW)
+    return redirect(f"{reverse('student_risk')}?job={job.pk}")
 
 @login_required
+def job_status(request, pk):
+    """JSON status of one of the user's background jobs, polled by the UI."""
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    return JsonResponse(as_dict(job))
+
+@login_required
+@conditional(user_stamp)
 def dashboard_home(request):
     """
     The Main Landing Page.
@@ -78,18 +144,24 @@ def dashboard_home(request):
     total_students = Student.objects.filter(user=user).count()
     active_students = Student.objects.filter(
         user=user, 
-        enrollment__isnull=False
+        enrollment__isnull=False,
+        enrollment__course__deleted_at__isnull=True,
     ).distinct().count()
 
-    revenue_agg = Payment.objects.filter(student__user=user).aggregate(total=Sum('amount'))
+    revenue_agg = MonthlyRevenue.objects.filter(user=user).aggregate(total=Sum('total'))
     total_revenue = revenue_agg.get('total') or Decimal('0.00')
     
     charges_agg = Enrollment.objects.filter(student__user=user).aggregate(total=Sum('course__cost'))
     total_charges = charges_agg.get('total') or Decimal('0.00')
     total_owed = total_charges - total_revenue
 
+    # Lazy querysets: only evaluated when the cached fragments need rebuilding
     courses = Course.objects.filter(user=user).order_by('-created_at')
 
+    # Highest-risk students from the last nightly scoring run (score_students)
+    at_risk_students = StudentScore.objects.filter(user=user, risk_score__gte=CRITICAL_SCORE, student__deleted_at__isnull=True)\
+        .select_related('student').order_by('-risk_score', 'predicted_grade')[:AT_RISK_LIMIT]
+
     context = {
         'total_students': total_students,
         'active_students': active_students, # Now reflects the Roster count
@@ -97,6 +169,9 @@ def dashboard_home(request):
         'total_revenue': total_revenue,
         'total_owed': total_owed,
         'courses': courses,
+        'at_risk_students': at_risk_students,
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        **get_versions(user.pk),
     }
 
     return render(request, 'dashboard/index.html', context)
@@ -164,16 +239,97 @@ def edit_student(request, pk):
 def delete_student(request, pk):
     student = get_object_or_404(Student, pk=pk, user=request.user)
     if request.method == 'POST':
-        student.delete()
+        # Hidden now; rows are removed in batches by the purge job
+        student.soft_delete()
+        enqueue('purge_deleted', user=request.user, priority=PRIORITY_LOW)
         return redirect('/') 
     return render(request, 'dashboard/delete_student.html', {'student': student})
 
 @login_required
+@conditional(user_stamp)
 def student_list(request):
-    students = Student.objects.filter(user=request.user)
-    return render(request, 'dashboard/student_list.html', {'students': students})
+    query = request.GET.get('q', '').strip()
+    if query:
+        students = search_students(request.user, query, limit=STUDENTS_PER_PAGE)
+        page = None
+    else:
+        # Page through the roster instead of rendering every student at once
+        paginator = Paginator(Student.objects.filter(user=request.user).order_by('last_name', 'first_name'), STUDENTS_PER_PAGE)
+        page = paginator.get_page(request.GET.get('page'))
+        students = page.object_list
+
+    return render(request, 'dashboard/student_list.html', {'students': students, 'page': page, 'query': query})
+
+@login_required
+@conditional(user_stamp)
+def student_search(request):
+    """
+    JSON typeahead: top matches for ?q= among the user's students.
+    Pass ?course=<pk> to leave out students already enrolled in that course.
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', SEARCH_LIMIT)), SEARCH_MAX_LIMIT))
+    except ValueError:
+        limit = SEARCH_LIMIT
+
+    exclude_course = None
+    if request.GET.get('course'):
+        try:
+            course_id = int(request.GET['course'])
+        except ValueError:
+            return JsonResponse({'error': 'course must be an integer.'}, status=400)
+        exclude_course = get_object_or_404(Course, pk=course_id, user=request.user)
+
+    students = search_students(request.user, query, limit=limit, exclude_course=exclude_course)
+    results = [
+        {
+            'id': student.pk,
+            'name': f"{student.first_name} {student.last_name}",
+            'student_id': student.student_id,
+            'email': student.email,
+            'city': student.city,
+        }
+        for student in students
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+def api_view(func):
+    """
+    GET-only JSON endpoint for scripts: a 401/405 JSON body instead of the
+    login redirect, and APIError turned into its status code.
+    """
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        if request.method != 'GET':
+            return JsonResponse({'error': 'Read-only API.'}, status=405)
+        try:
+            return JsonResponse({'version': api.API_VERSION, **func(request, *args, **kwargs)})
+        except api.APIError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return wrapper
+
+@conditional(user_stamp)
+@api_view
+def api_list(request, resource):
+    page = api.list_page(resource, request.user, request.GET)
+    if page['next_cursor']:
+        params = request.GET.copy()
+        params['cursor'] = page['next_cursor']
+        page['next'] = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    else:
+        page['next'] = None
+    return page
+
+@conditional(user_stamp)
+@api_view
+def api_detail(request, resource, pk):
+    return api.detail(resource, request.user, pk, request.GET)
 
 @login_required
+@conditional(course_stamp)
 def course_detail(request, pk):
     """
     Displays the detailed information for a single course.
@@ -190,9 +346,14 @@ def course_detail(request, pk):
     return render(request, 'dashboard/course_detail.html', context)
 
 @login_required
+@conditional(user_stamp)
 def course_list(request):
     courses = Course.objects.filter(user=request.user).order_by('name')
-    return render(request, 'dashboard/course_list.html', {'courses': courses})
+    return render(request, 'dashboard/course_list.html', {
+        'courses': courses,
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        **get_versions(request.user.pk, kinds=['course']),
+    })
 
 @login_required
 def add_course(request):
@@ -223,6 +384,9 @@ def edit_course(request, pk):
             # Assign the foreign key to the current user
             course.user = request.user 
             form.save()
+            # Ending the course (end_date in the past) finalizes its grades
+            if course.end_date and course.end_date < timezone.localdate():
+                schedule_update(request.user)
             return redirect('course_list')
     else:
         form = CourseForm(instance=course)
@@ -232,7 +396,9 @@ def edit_course(request, pk):
 def delete_course(request, pk):
     course = get_object_or_404(Course, pk=pk, user=request.user)
     if request.method == 'POST':
-        course.delete()
+        # Hidden now; rows are removed in batches by the purge job
+        course.soft_delete()
+        enqueue('purge_deleted', user=request.user, priority=PRIORITY_LOW)
         return redirect('course_list')
     return render(request, 'dashboard/course_confirm_delete.html', {'course': course})
 
@@ -245,17 +411,39 @@ def manage_roster(request, pk):
         student_ids_to_add = request.POST.getlist('students_to_add')
         
         if student_ids_to_add:
-            for student_id in student_ids_to_add:
-                student = get_object_or_404(Student, pk=student_id, user=request.user)
-                
-                # This checks if enrollment exists. If yes, it does nothing. If no, it creates it.
-                obj, created = Enrollment.objects.get_or_create(
-                    course=course,
-                    student=student,
-                    defaults={'start_date': timezone.now()}
-                )
+            students = list(Student.objects.filter(pk__in=student_ids_to_add, user=request.user))
+            if len(students) != len(set(student_ids_to_add)):
+                raise Http404("No student matches the given query.")
+
+            # The whole batch is checked against the schedule in one pass
+            conflicts = enrollment_conflicts(course, [student.pk for student in students])
+            skipped = []
+            if conflicts and not request.POST.get('allow_conflicts'):
+                skipped = [student for student in students if student.pk in conflicts]
+                students = [student for student in students if student.pk not in conflicts]
+
+            # One write transaction for the whole batch instead of one per student
+            with transaction.atomic():
+                for student in students:
+                    # This checks if enrollment exists. If yes, it does nothing. If no, it creates it.
+                    obj, created = Enrollment.objects.get_or_create(
+                        course=course,
+                        student=student,
+                        defaults={'start_date': timezone.now()}
+                    )
             
-            messages.success(request, f"Successfully enrolled {len(student_ids_to_add)} students.")
+            if students:
+                messages.success(request, f"Successfully enrolled {len(students)} students.")
+            if skipped:
+                listed = [
+                    f"{student.first_name} {student.last_name} ({', '.join(clash['name'] for clash in conflicts[student.pk])})"
+                    for student in skipped[:CONFLICTS_LISTED]
+                ]
+                more = f" and {len(skipped) - CONFLICTS_LISTED} more" if len(skipped) > CONFLICTS_LISTED else ""
+                messages.warning(request, f"Skipped {len(skipped)} students with a schedule conflict: "
+                                          f"{'; '.join(listed)}{more}. Tick \"Enroll despite conflicts\" to add them anyway.")
+            elif conflicts:
+                messages.warning(request, f"Enrolled {len(conflicts)} students despite a schedule conflict.")
             return redirect('manage_roster', pk=course.pk)
 
         remove_student_id = request.POST.get('remove_student_id')
@@ -271,13 +459,12 @@ def manage_roster(request, pk):
         return redirect('manage_roster', pk=course.pk)
     
     enrolled_students = Student.objects.filter(enrollment__course=course).order_by('last_name')
-        
-    available_students = Student.objects.filter(user=request.user).exclude(id__in=enrolled_students.values_list('id', flat=True)).order_by('first_name')
 
+    # Available students are found through the student_search typeahead
+    # rather than rendering the tenant's whole roster here
     return render(request, 'dashboard/manage_roster.html', {
         'course': course,
         'enrolled_students': enrolled_students,
-        'available_students': available_students
     })
 
 @login_required
@@ -299,24 +486,8 @@ def add_payment(request, student_pk):
 
     return render(request, 'dashboard/add_payment.html', {'form': form, 'student': student})
 
-def predict_next_revenue(payment_data):
-    y = payment_data
-    x = list(range(1, len(y) + 1))
-    n = len(y)
-    if n < 2: return sum(y) / n if n > 0 else 0.0
-    sum_x = sum(x)
-    sum_y = sum(y)
-    sum_xy = sum(xi * yi for xi, yi in zip(x, y))
-    sum_xx = sum(xi ** 2 for xi in x)
-    try:
-        m = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x ** 2)
-        b = (sum_y - m * sum_x) / n
-    except ZeroDivisionError:
-        return 0.0
-    return max(0.0, m * (n + 1) + b)
-
-
 @login_required
+@conditional(user_stamp)
 def dashboard_analytics(request):
     total_students = Student.objects.filter(user=request.user).count()
     gender_data = Student.objects.filter(user=request.user).values('gender').annotate(count=Count('id'))
@@ -329,7 +500,8 @@ def dashboard_analytics(request):
     dropped_count = Student.objects.filter(user=request.user, status='Dropped').count()
     churn_rate = (dropped_count / total_students * 100) if total_students > 0 else 0.0
 
-    total_revenue_result = Payment.objects.filter(student__user=request.user).aggregate(total=Sum('amount'))
+    # Revenue comes from the MonthlyRevenue rollup: O(months) rows, not O(payments)
+    total_revenue_result = MonthlyRevenue.objects.filter(user=request.user).aggregate(total=Sum('total'))
     total_revenue = total_revenue_result.get('total') or Decimal('0.00')
 
     total_charges_result = Enrollment.objects.filter(student__user=request.user).aggregate(total=Sum('course__cost'))
@@ -339,29 +511,29 @@ def dashboard_analytics(request):
     # Using aggregate to sum up the delays recorded for all students
     total_late_payments = Student.objects.filter(user=request.user).aggregate(total=Sum('payment_delays'))['total'] or 0
 
-    # Revenue Prediction
-    monthly_revenue_query = Payment.objects.filter(student__user=request.user)\
-        .annotate(month=TruncMonth('date_of_payment'))\
-        .values('month').annotate(total=Sum('amount')).order_by('month')
-    
-    revenue_series = [float(item['total']) for item in monthly_revenue_query]
-    predicted_revenue = predict_next_revenue(revenue_series)
-    
-    revenue_labels = [item['month'].strftime('%b %Y') for item in monthly_revenue_query]
-    if revenue_labels: revenue_labels.append("Forecast")
-    chart_revenue_data = revenue_series + [predicted_revenue]
+    # Revenue Prediction (cached per user until a payment changes the series)
+    revenue_forecast = forecast_user_revenue(request.user, horizon=FORECAST_HORIZON)
+    revenue_series = revenue_forecast['history']
+    predicted_revenue = revenue_forecast['forecast'][0] if revenue_series else 0.0
+
+    # Forecast lines start at the last actual month so the chart joins up
+    revenue_labels = [month.strftime('%b %Y') for month in revenue_forecast['history_months'] + revenue_forecast['months']]
+    padding = [None] * (len(revenue_series) - 1)
+    chart_revenue_data = revenue_series + [None] * len(revenue_forecast['months'])
+    if revenue_series:
+        chart_forecast_data = padding + revenue_series[-1:] + revenue_forecast['forecast']
+        chart_lower_data = padding + revenue_series[-1:] + revenue_forecast['lower']
+        chart_upper_data = padding + revenue_series[-1:] + revenue_forecast['upper']
+    else:
+        chart_forecast_data = chart_lower_data = chart_upper_data = []
 
-    total_attendance_records = Attendance.objects.filter(student__user=request.user).count()
-    present_records = Attendance.objects.filter(student__user=request.user, status='P').count()
+    total_attendance_records = Attendance.objects.filter(user=request.user).count()
+    present_records = Attendance.objects.filter(user=request.user, status='P').count()
     avg_attendance_rate = (present_records / total_attendance_records * 100) if total_attendance_records > 0 else 0.0
 
-    grade_distribution = {
-        'A (90-100)': Enrollment.objects.filter(student__user=request.user, current_average__gte=90).count(),
-        'B (80-89)': Enrollment.objects.filter(student__user=request.user, current_average__gte=80, current_average__lt=90).count(),
-        'C (70-79)': Enrollment.objects.filter(student__user=request.user, current_average__gte=70, current_average__lt=80).count(),
-        'D (60-69)': Enrollment.objects.filter(student__user=request.user, current_average__gte=60, current_average__lt=70).count(),
-        'F (<60)': Enrollment.objects.filter(student__user=request.user, current_average__lt=60).count(),
-    }
+    # One query for every enrollment average, bucketed with NumPy
+    averages = Enrollment.objects.filter(student__user=request.user).values_list('current_average', flat=True)
+    grade_distribution = grade_bands(list(averages))
     grade_labels = list(grade_distribution.keys())
     grade_counts = list(grade_distribution.values())
 
@@ -378,6 +550,10 @@ def dashboard_analytics(request):
         'predicted_revenue': predicted_revenue,
         'revenue_labels': json.dumps(revenue_labels),
         'revenue_data': json.dumps(chart_revenue_data),
+        'forecast_data': json.dumps(chart_forecast_data),
+        'forecast_lower': json.dumps(chart_lower_data),
+        'forecast_upper': json.dumps(chart_upper_data),
+        'forecast_method': revenue_forecast['method'],
         'avg_attendance_rate': avg_attendance_rate,
         'grade_labels': json.dumps(grade_labels),
         'grade_counts': json.dumps(grade_counts),
@@ -385,63 +561,182 @@ def dashboard_analytics(request):
 
     return render(request, 'dashboard/analytics.html', context)
 
+def cohort_query(request):
+    """(filters, by) for the cohort cube from ?country=&city=&age_band=&course=&month=&by=."""
+    filters = cohorts.parse_filters(request.GET)
+    remaining = [name for name in cohorts.DIMENSIONS if name not in filters] or ['month']
+    by = request.GET.get('by')
+    return filters, by if by in remaining else remaining[0]
+
+
+def cohort_url(filters, by=None, view='cohort_analytics'):
+    params = {name: cohorts.param(name, value) for name, value in filters.items()}
+    if by:
+        params['by'] = by
+    return f"{reverse(view)}?{urlencode(params)}"
+
+
+@login_required
+@conditional(cohort_stamp)
+def cohort_analytics(request):
+    """Drill-down over the cohort cube: pick a dimension, click a row to filter by it and go one level down."""
+    filters, by = cohort_query(request)
+    data = cohorts.cube_slice(request.user, filters, by)
+    status = cohorts.cube_status(request.user)
+    if status['stale']:
+        cohorts.schedule_refresh(request.user)
+
+    remaining = [name for name in cohorts.DIMENSIONS if name not in filters]
+    drill_by = next((name for name in remaining if name != by), None)
+    for row in data['rows']:
+        row['drill_url'] = cohort_url({**filters, by: row['value']}, drill_by) if by in remaining else None
+
+    labels = {}
+    if 'course' in filters and filters['course']:
+        labels = dict(Course.objects.filter(pk=filters['course']).values_list('pk', 'name'))
+    breadcrumbs = [
+        {'dimension': name.replace('_', ' ').title(), 'label': cohorts.label(name, value, labels),
+         'remove_url': cohort_url({key: v for key, v in filters.items() if key != name}, by)}
+        for name, value in filters.items()
+    ]
+
+    return render(request, 'dashboard/cohort_analytics.html', {
+        'data': data,
+        'by': by,
+        'by_label': by.replace('_', ' ').title(),
+        'group_options': [{'name': name, 'label': name.replace('_', ' ').title(), 'url': cohort_url(filters, name)}
+                          for name in remaining],
+        'breadcrumbs': breadcrumbs,
+        'json_url': cohort_url(filters, by, view='cohort_analytics_api'),
+        'chart_labels': json.dumps([row['label'] for row in data['rows']]),
+        'chart_enrollments': json.dumps([row['enrollments'] for row in data['rows']]),
+        'chart_revenue': json.dumps([row['revenue'] for row in data['rows']]),
+        'status': status,
+    })
+
+@login_required
+@conditional(cohort_stamp)
+def cohort_analytics_api(request):
+    """JSON version of cohort_analytics: the slice's rows and totals, same parameters."""
+    filters, by = cohort_query(request)
+    data = cohorts.cube_slice(request.user, filters, by)
+    for row in data['rows']:
+        row['value'] = cohorts.param(by, row['value']) if row['value'] is not None else None
+    status = cohorts.cube_status(request.user)
+    if status['stale']:
+        cohorts.schedule_refresh(request.user)
+    return JsonResponse({
+        'by': by,
+        'filters': {name: cohorts.param(name, value) for name, value in filters.items()},
+        'rows': data['rows'],
+        'totals': data['totals'],
+        **status,
+    })
+
+def stats_bins(request):
+    """?bins= for the histograms, clamped to 1..MAX_BINS."""
+    try:
+        return max(1, min(int(request.GET.get('bins', DEFAULT_BINS)), MAX_BINS))
+    except ValueError:
+        return DEFAULT_BINS
+
+@login_required
+@conditional(user_stamp)
+def course_stats(request, pk=None):
+    """Grade statistics for one course, or every course with an overall summary."""
+    course = get_object_or_404(Course, pk=pk, user=request.user) if pk is not None else None
+    stats = course_statistics(request.user, course, bins=stats_bins(request))
+
+    # Chart.js wants labels and values as separate JSON arrays
+    for entry in stats['courses']:
+        edges = entry['averages']['histogram']['edges']
+        entry['histogram_labels'] = json.dumps([f"{low:g}-{high:g}" for low, high in zip(edges, edges[1:])])
+        entry['averages_histogram'] = json.dumps(entry['averages']['histogram']['counts'])
+        entry['grades_histogram'] = json.dumps(entry['grades']['histogram']['counts'])
+
+    return render(request, 'dashboard/course_stats.html', {
+        'course': course,
+        'stats': stats,
+    })
+
+@login_required
+@conditional(user_stamp)
+def schedule_conflicts(request):
+    """Course pairs whose schedules clash, with the students enrolled in both."""
+    report = tenant_conflicts(request.user)
+    return render(request, 'dashboard/schedule_conflicts.html', {
+        'conflicts': report,
+        'students_affected': len({student['id'] for entry in report for student in entry['students']}),
+    })
+
+@login_required
+@conditional(user_stamp)
+def course_stats_api(request):
+    """JSON version of course_stats; ?course=<pk> narrows it to one course."""
+    course = None
+    if request.GET.get('course'):
+        try:
+            course_id = int(request.GET['course'])
+        except ValueError:
+            return JsonResponse({'error': 'course must be an integer.'}, status=400)
+        course = get_object_or_404(Course, pk=course_id, user=request.user)
+    return JsonResponse(course_statistics(request.user, course, bins=stats_bins(request)))
+
 @login_required
+@conditional(student_stamp)
 def student_detail(request, pk):
-    student = get_object_or_404(Student, pk=pk, user=request.user)
-    
-    payments = Payment.objects.filter(student=student).order_by('-date_of_payment')
-    enrollment_history = Enrollment.objects.filter(student=student).order_by('-start_date')
-    
-    total_days = student.attendance_set.count()
-    present_days = student.attendance_set.filter(status='P').count()
-    attendance_rate = (present_days / total_days) if total_days > 0 else 1.0
+    # Student, balance, attendance, score, payments, enrollments and grades in four queries
+    profile = load_profile(request.user, pk)
+    student = profile['student']
+    attendance_rate = profile['attendance_rate']
 
     predicted_grade = None
     ml_message = "Not enough data to predict."
-    
+    scored_at = None
+
     try:
-        model_path = os.path.join(settings.BASE_DIR, 'ml_engine', 'grade_predictor.pkl')
-        
-        if os.path.exists(model_path):
-            model = joblib.load(model_path)
-            
-            # Prepare the features exactly as trained
-            # Features: ['attendance_rate', 'study_hours', 'previous_grade', 'payment_delays']
-            features = pd.DataFrame({
-                'attendance_rate': [attendance_rate],
-                'study_hours': [student.study_hours],
-                'previous_grade': [student.previous_grade],
-                'payment_delays': [student.payment_delays] # Assuming this field exists or defaults to 0
-            })
-            
-            # Predict
-            prediction = model.predict(features)[0]
-            predicted_grade = round(prediction, 1)
-            
-            # Generate Insight Message
-            if predicted_grade > 85:
-                ml_message = "High Performer! On track for an A."
-            elif predicted_grade > 70:
-                ml_message = "Solid Performance. Keep consistent."
-            elif predicted_grade > 50:
-                ml_message = "Risk Warning. Needs support in attendance or study hours."
-            else:
-                ml_message = "High Dropout Risk. Immediate intervention required."
-                
+        # Nightly batch score if there is one, otherwise run the model now
+        score = profile['score']
+        if score is not None:
+            predicted_grade = score.predicted_grade
+            scored_at = score.scored_at
+        else:
+            if os.path.exists(MODEL_PATH):
+                # Cached per process, reloaded when update_grade_predictor publishes a new version
+                model = load_model(MODEL_PATH)
+
+                # The stored feature vector, in the columns the model was trained on
+                features = pd.DataFrame(feature_vector(profile['features']), columns=FEATURES)
+
+                # Predict
+                prediction = model.predict(features)[0]
+                predicted_grade = round(prediction, 1)
+
+        # Generate Insight Message
+        if predicted_grade is None:
+            pass
+        elif predicted_grade > 85:
+            ml_message = "High Performer! On track for an A."
+        elif predicted_grade > 70:
+            ml_message = "Solid Performance. Keep consistent."
+        elif predicted_grade > 50:
+            ml_message = "Risk Warning. Needs support in attendance or study hours."
+        else:
+            ml_message = "High Dropout Risk. Immediate intervention required."
+
     except Exception as e:
         print(f"ML Error: {e}")
         ml_message = "AI Model unavailable."
 
     context = {
-        'student': student,
-        'payments': payments,
-        'enrollment_history': enrollment_history, 
+        **profile,
         'page_title': f"{student.first_name}'s Profile",
         
         # Pass AI Data to Template
         'attendance_rate_percent': round(attendance_rate * 100, 1),
         'predicted_grade': predicted_grade,
         'ml_message': ml_message,
+        'scored_at': scored_at,
     }
     
     return render(request, 'dashboard/student_detail.html', context)
@@ -458,7 +753,7 @@ def take_attendance(request, course_pk):
     course = get_object_or_404(Course, pk=course_pk, user=request.user)
     students = Student.objects.filter(
         enrollment__course=course, 
-        status='Active'
+        status=Student.StudentStatus.ACTIVE
     ).order_by('last_name')
 
     date_str = request.GET.get('date')
@@ -467,37 +762,30 @@ def take_attendance(request, course_pk):
     else:
         current_date = timezone.now().date()
 
-    # SCHEDULE WARNING LOGIC
+    # SCHEDULE WARNING LOGIC: the date should be one of the course's generated sessions
     schedule_warning = None
-    DAY_ABBREVIATIONS = {
-        0: 'Mon', 1: 'Tue', 2: 'Wed', 3: 'Thu', 4: 'Fri', 5: 'Sat', 6: 'Sun'
-    }
-    
-    current_day_abbr = DAY_ABBREVIATIONS.get(current_date.weekday())
-    course_schedule = course.schedule_days or "" # e.g., "Mon/Wed/Fri"
-    
-    if course_schedule and current_day_abbr:
-        normalized_schedule = course_schedule.replace(',', ' ').replace('/', ' ')
-        
-        if current_day_abbr not in normalized_schedule:
-            schedule_warning = (
-                f"Warning: Attendance is being taken on a {current_date.strftime('%A')}. "
-                f"This course is typically scheduled for: {course_schedule}."
-            )
+    session = ClassSession.objects.filter(course=course, date=current_date).first()
+    if course.schedule_days and session is None:
+        schedule_warning = (
+            f"Warning: Attendance is being taken on a {current_date.strftime('%A')} with no scheduled class. "
+            f"This course is typically scheduled for: {course.schedule_days}."
+        )
 
     # SAVE ATTENDANCE
     if request.method == 'POST':
-        for student in students:
-            status_key = f"status_{student.id}"
-            status_value = request.POST.get(status_key)
-            
-            if status_value:
-                Attendance.objects.update_or_create(
-                    course=course,
-                    student=student,
-                    date=current_date,
-                    defaults={'status': status_value}
-                )
+        # One write transaction for the whole roll-call instead of one per student
+        with transaction.atomic():
+            for student in students:
+                status_key = f"status_{student.id}"
+                status_value = request.POST.get(status_key)
+
+                if status_value:
+                    Attendance.objects.update_or_create(
+                        course=course,
+                        student=student,
+                        date=current_date,
+                        defaults={'status': status_value}
+                    )
         return redirect(f'{request.path}?date={current_date}')
 
     # PREPARE ROSTER DATA
@@ -505,22 +793,56 @@ def take_attendance(request, course_pk):
     
     # Get all attendance for this course/date in one query for performance
     existing_attendance = Attendance.objects.filter(course=course, date=current_date)
-    attendance_map = {rec.student.id: rec.status for rec in existing_attendance}
+    attendance_map = {rec.student_id: rec.status for rec in existing_attendance}
+
+    # Rates, streaks and "absent 3 of the last 5" alerts from the bitmaps
+    attendance_stats = course_attendance(course)
 
     for student in students:
         # Check if we have a status in the map, else None
         status = attendance_map.get(student.id)
-        roster_data.append((student, status))
+        roster_data.append((student, status, attendance_stats.get(student.id)))
 
     context = {
         'course': course,
         'current_date': current_date,
         'roster_data': roster_data,
         'schedule_warning': schedule_warning,
+        'recent_window': RECENT_WINDOW,
     }
     
     return render(request, 'dashboard/take_attendance.html', context)
 
+@login_required
+@conditional(user_stamp)
+def class_calendar(request):
+    """The day's classes (?date=, default today) and past sessions still missing a roll-call."""
+    today = timezone.localdate()
+    try:
+        current_date = timezone.datetime.strptime(request.GET['date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        # No date, or one that isn't YYYY-MM-DD: show today
+        current_date = today
+
+    sessions = ClassSession.objects.filter(user=request.user, course__deleted_at__isnull=True)
+    day_sessions = sessions.filter(date=current_date).select_related('course')\
+        .annotate(enrolled=Count('course__enrollment', filter=Q(course__enrollment__student__deleted_at__isnull=True)))\
+        .order_by('start_minute', 'course__name')
+
+    # A course nobody is enrolled in has no roll-call to take
+    unrecorded = sessions.filter(date__lt=today, recorded=0)\
+        .filter(Exists(Enrollment.objects.filter(course=OuterRef('course_id'))))
+    missing = list(unrecorded.select_related('course').order_by('-date', 'start_minute')[:MISSING_ROLL_CALLS])
+
+    return render(request, 'dashboard/class_calendar.html', {
+        'current_date': current_date,
+        'previous_date': current_date - timedelta(days=1),
+        'next_date': current_date + timedelta(days=1),
+        'sessions': day_sessions,
+        'missing': missing,
+        'missing_count': unrecorded.count() if len(missing) == MISSING_ROLL_CALLS else len(missing),
+    })
+
 @login_required
 def student_attendance_history(request, student_pk):
     """
@@ -559,11 +881,27 @@ def student_attendance_history(request, student_pk):
     
     return render(request, 'dashboard/student_attendance_history.html', context)
 
+def refresh_averages(request, enrollment_ids):
+    """
+    Brings the enrollments' averages up to date: in the request for up to
+    INLINE_AVERAGES of them, through a recompute_averages job for more.
+    Returns the job, or None if the averages are already current.
+    """
+    if len(enrollment_ids) <= INLINE_AVERAGES:
+        update_averages(enrollment_ids, request.user)
+        return None
+    return enqueue('recompute_averages', {'enrollment_ids': enrollment_ids}, user=request.user, priority=PRIORITY_HIGH)
+
+def averages_pending(request, course, job):
+    """Redirect to the gradebook, watching the averages job."""
+    messages.info(request, "Averages are being recomputed in the background.")
+    return redirect(f"{reverse('course_gradebook', args=[course.pk])}?job={job.pk}")
+
 @login_required
 def add_grade(request, course_pk):
     course = get_object_or_404(Course, pk=course_pk, user=request.user)
     # Get all active students in this course
-    students = Student.objects.filter(enrollment__course=course, status='Active')
+    students = Student.objects.filter(enrollment__course=course, status=Student.StudentStatus.ACTIVE)
 
     if request.method == 'POST':
         description = request.POST.get('description') # e.g., "Unit 1 Test"
@@ -571,27 +909,33 @@ def add_grade(request, course_pk):
         max_score = float(request.POST.get('max_score')) # e.g., 50
 
         # Loop through all students to find their scores in the form data
-        for student in students:
-            score_key = f"score_{student.id}" # Look for input named 'score_5'
-            score_val = request.POST.get(score_key)
-            
-            if score_val: # Only save if a score was entered
-                # 1. Create the Grade Record
-                GradeRecord.objects.create(
-                    student=student,
-                    course=course,
-                    description=description,
-                    date=date,
-                    score_obtained=float(score_val),
-                    max_score=max_score
-                )
-                
-                # 2. Update the Enrollment Average immediately
-                enrollment = Enrollment.objects.filter(student=student, course=course).first()
-                if enrollment:
-                    enrollment.update_average()
+        graded = []
+        job = None
+        with transaction.atomic():
+            for student in students:
+                score_key = f"score_{student.id}" # Look for input named 'score_5'
+                score_val = request.POST.get(score_key)
+
+                if score_val: # Only save if a score was entered
+                    # 1. Create the Grade Record
+                    GradeRecord.objects.create(
+                        student=student,
+                        course=course,
+                        description=description,
+                        date=date,
+                        score_obtained=float(score_val),
+                        max_score=max_score
+                    )
+                    graded.append(student.id)
+
+            # 2. Recalculate the enrollment averages
+            if graded:
+                enrollment_ids = list(Enrollment.objects.filter(course=course, student_id__in=graded).values_list('id', flat=True))
+                job = refresh_averages(request, enrollment_ids)
 
         messages.success(request, f"Grades for '{description}' recorded successfully.")
+        if job:
+            return averages_pending(request, course, job)
         return redirect('course_list') # Or back to gradebook
 
     return render(request, 'dashboard/add_grade.html', {
@@ -608,18 +952,19 @@ def update_grade(request, enrollment_id):
         try:
             new_score = float(request.POST.get('grade'))
             
-            # Grades are out of 100 points for simplicity
-            GradeRecord.objects.create(
-                student=enrollment.student,
-                course=enrollment.course,
-                description="Manual Adjustment", # The name in the history log
-                score_obtained=new_score,
-                max_score=100.0,
-                date=timezone.now()
-            )
-            
-            # Trigger the Recalculation
-            enrollment.update_average()
+            with transaction.atomic():
+                # Grades are out of 100 points for simplicity
+                GradeRecord.objects.create(
+                    student=enrollment.student,
+                    course=enrollment.course,
+                    description="Manual Adjustment", # The name in the history log
+                    score_obtained=new_score,
+                    max_score=100.0,
+                    date=timezone.now()
+                )
+
+                # Trigger the Recalculation
+                refresh_averages(request, [enrollment.pk])
             
             messages.success(request, f"Grade updated and recorded in history.")
             
@@ -629,21 +974,26 @@ def update_grade(request, enrollment_id):
     return redirect('student_detail', pk=enrollment.student.pk)
 
 @login_required
+@conditional(course_stamp)
 def course_gradebook(request, pk):
     course = get_object_or_404(Course, pk=pk, user=request.user)
     enrollments = Enrollment.objects.filter(course=course).select_related('student')
 
     if request.method == 'POST':
-        for enrollment in enrollments:
-            field_name = f"grade_{enrollment.id}"
-            if field_name in request.POST:
-                try:
-                    new_score = float(request.POST.get(field_name))
-                    
+        graded = []
+        with transaction.atomic():
+            for enrollment in enrollments:
+                field_name = f"grade_{enrollment.id}"
+                if field_name in request.POST:
+                    try:
+                        new_score = float(request.POST.get(field_name))
+                    except ValueError:
+                        continue
+
                     # Check if score is different to avoid spamming history with duplicates
-                    # (Simple check: is the new score different from current avg? 
+                    # (Simple check: is the new score different from current avg?
                     #  Or just always record it as a new entry. Let's always record.)
-                    
+
                     GradeRecord.objects.create(
                         student=enrollment.student,
                         course=course,
@@ -652,16 +1002,35 @@ def course_gradebook(request, pk):
                         max_score=100.0,
                         date=timezone.now()
                     )
-                    
-                    enrollment.update_average()
-                    
-                except ValueError:
-                    continue 
+                    graded.append(enrollment.id)
+
+            # Averages are recomputed in one UPDATE, by a background job for big saves
+            job = refresh_averages(request, graded) if graded else None
         
         messages.success(request, f"Grades recorded for {course.name}")
+        if job:
+            return averages_pending(request, course, job)
         return redirect('course_gradebook', pk=course.pk)
 
+    # Matrix of every grade record, pivoted and cached in gradebook.py
+    version = matrix_version(course)
+    gradebook = course_matrix(course, version)
+
+    # Hardest assessments first (lowest class mean)
+    difficulty = sorted(
+        (row for row in gradebook['assessment_rows'] if row['mean'] is not None),
+        key=lambda row: row['mean'],
+    )
+
+    # Averages job started by a big grade save, polled by the template
+    job_id = request.GET.get('job', '')
+    job = Job.objects.filter(pk=job_id, user=request.user).first() if job_id.isdigit() else None
+
     return render(request, 'dashboard/course_gradebook.html', {
         'course': course,
-        'enrollments': enrollments
+        'gradebook': gradebook,
+        'matrix_version': version,
+        'hardest': difficulty[:5],
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'job': job,
     })
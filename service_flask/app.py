@@ -150,4 +150,6 @@ def predict_risk(token_payload):
 
 if __name__ == '__main__':
     # Run on port 5001 to avoid conflicting with Django
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    # Set FLASK_DEBUG=0 for load testing: the debugger and reloader skew latency
+    debug = os.environ.get('FLASK_DEBUG', '1') == '1'
+    app.run(debug=debug, port=int(os.environ.get('FLASK_PORT', 5001)), threaded=True)
\ No newline at end of file
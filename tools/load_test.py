@@ -0,0 +1,343 @@
+"""
+End-to-end load generator for the Django dashboard and the Flask service.
+
+Usage (both services running locally):
+    python tools/load_test.py --setup --users 5
+    python tools/load_test.py --users 5 --concurrency 1,8,32 --duration 30
+
+--setup creates throwaway teacher accounts (loadtest_teacher_N) with courses,
+students and enrollments through the Django ORM. Each worker thread then logs
+in as one of those teachers, mints a JWT with the shared secret, and replays
+a weighted mix of dashboard loads, attendance submissions, grade entry and
+predict-risk calls. Throughput and latency percentiles are reported per
+endpoint for every concurrency level.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import jwt  # PyJWT library
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DJANGO_DIR = os.path.join(ROOT_DIR, 'core_django')
+FLASK_ENV_FILE = os.path.join(ROOT_DIR, 'service_flask', '.env')
+
+USERNAME_PREFIX = 'loadtest_teacher_'
+
+# Endpoint name -> relative weight in the traffic mix
+DEFAULT_MIX = {
+    'dashboard_home': 40,
+    'dashboard_analytics': 10,
+    'take_attendance': 20,
+    'add_grade': 10,
+    'predict_risk': 20,
+}
+
+
+def setup_django():
+    """Makes the Django project importable so fixtures can be read/written via the ORM."""
+    if DJANGO_DIR not in sys.path:
+        sys.path.insert(0, DJANGO_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+
+def load_shared_secret():
+    """Reads SHARED_SECRET_KEY from the environment, falling back to the Flask .env file."""
+    secret = os.environ.get('SHARED_SECRET_KEY')
+    if secret:
+        return secret
+    if os.path.exists(FLASK_ENV_FILE):
+        with open(FLASK_ENV_FILE) as fh:
+            for line in fh:
+                key, _, value = line.strip().partition('=')
+                if key == 'SHARED_SECRET_KEY':
+                    return value.strip().strip('"').strip("'")
+    raise SystemExit("No SHARED_SECRET_KEY in the environment or service_flask/.env")
+
+
+def create_fixtures(n_users, password, courses_per_user, students_per_course):
+    """Creates (or tops up) the load test teachers and their rosters."""
+    from django.contrib.auth.models import User
+    from dashboard.models import Course, Student, Enrollment
+
+    for i in range(n_users):
+        username = f"{USERNAME_PREFIX}{i}"
+        user, created = User.objects.get_or_create(username=username)
+        if created:
+            user.set_password(password)
+            user.save()
+
+        for c in range(courses_per_user - Course.objects.filter(user=user).count()):
+            course = Course.objects.create(
+                user=user,
+                name=f"Load Test Course {c}",
+                course_code=f"LT{i}-{c}",
+                cost=random.choice([150, 300, 450]),
+                schedule_days="Mon/Wed/Fri",
+            )
+            students = [
+                Student(
+                    user=user,
+                    first_name=f"Student{s}",
+                    last_name=f"C{course.pk}",
+                    student_id=f"LT-{course.pk}-{s}",
+                    study_hours=random.randint(1, 20),
+                    previous_grade=random.uniform(50, 100),
+                )
+                for s in range(students_per_course)
+            ]
+            Student.objects.bulk_create(students)
+            students = Student.objects.filter(user=user, last_name=f"C{course.pk}")
+            Enrollment.objects.bulk_create(
+                [Enrollment(student=student, course=course) for student in students]
+            )
+        print(f"  {username}: ready")
+
+
+def load_fixtures(n_users):
+    """Returns {username: {'user_id', 'courses': {course_pk: [student_pk, ...]}}}."""
+    from django.contrib.auth.models import User
+    from dashboard.models import Enrollment
+
+    fixtures = {}
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id')[:n_users]
+    for user in users:
+        courses = defaultdict(list)
+        rows = Enrollment.objects.filter(course__user=user).values_list('course_id', 'student_id')
+        for course_id, student_id in rows:
+            courses[course_id].append(student_id)
+        fixtures[user.username] = {'user_id': user.id, 'courses': dict(courses)}
+
+    if not fixtures:
+        raise SystemExit("No load test users found. Run again with --setup first.")
+    return fixtures
+
+
+class Teacher:
+    """One simulated teacher: a logged-in Django session plus a Flask JWT."""
+
+    def __init__(self, args, username, fixture, secret):
+        self.args = args
+        self.username = username
+        self.courses = fixture['courses']
+        self.http = requests.Session()
+
+        # Same claims Django would send; an expiry keeps long runs honest
+        payload = {
+            'user_id': fixture['user_id'],
+            'username': username,
+            'exp': datetime.now(timezone.utc) + timedelta(hours=2),
+        }
+        self.token = jwt.encode(payload, secret, algorithm='HS256')
+
+    def csrf_headers(self, referer):
+        return {
+            'X-CSRFToken': self.http.cookies.get('csrftoken', ''),
+            'Referer': referer,
+        }
+
+    def login(self):
+        login_url = f"{self.args.django_url}/accounts/login/"
+        self.http.get(login_url, timeout=self.args.timeout)
+        response = self.http.post(
+            login_url,
+            data={
+                'username': self.username,
+                'password': self.args.password,
+                'csrfmiddlewaretoken': self.http.cookies.get('csrftoken', ''),
+            },
+            headers={'Referer': login_url},
+            allow_redirects=False,
+            timeout=self.args.timeout,
+        )
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed for {self.username} (HTTP {response.status_code})")
+
+    def pick_course(self):
+        course_pk = random.choice(list(self.courses))
+        return course_pk, self.courses[course_pk]
+
+    # Scenarios: each returns the HTTP response so the caller can time it
+
+    def dashboard_home(self):
+        return self.http.get(f"{self.args.django_url}/", timeout=self.args.timeout)
+
+    def dashboard_analytics(self):
+        return self.http.get(f"{self.args.django_url}/analytics/", timeout=self.args.timeout)
+
+    def take_attendance(self):
+        course_pk, student_pks = self.pick_course()
+        # Spread submissions over the last few weeks so both inserts and updates happen
+        day = date.today() - timedelta(days=random.randint(0, 20))
+        url = f"{self.args.django_url}/course/{course_pk}/attendance/?date={day.isoformat()}"
+        data = {f"status_{pk}": random.choice('PPPPAL') for pk in student_pks}
+        return self.http.post(url, data=data, headers=self.csrf_headers(url),
+                              allow_redirects=False, timeout=self.args.timeout)
+
+    def add_grade(self):
+        course_pk, student_pks = self.pick_course()
+        url = f"{self.args.django_url}/course/{course_pk}/add-grade/"
+        data = {
+            'description': f"Load Quiz {random.randint(1, 60)}",
+            'date': date.today().isoformat(),
+            'max_score': '100',
+        }
+        data.update({f"score_{pk}": str(random.randint(40, 100)) for pk in student_pks})
+        return self.http.post(url, data=data, headers=self.csrf_headers(url),
+                              allow_redirects=False, timeout=self.args.timeout)
+
+    def predict_risk(self):
+        _, student_pks = self.pick_course()
+        return self.http.post(
+            f"{self.args.flask_url}/api/v1/predict-risk",
+            json={
+                'student_id': random.choice(student_pks) if student_pks else None,
+                'current_balance': random.uniform(0, 1500),
+                'course_count': random.randint(0, 4),
+            },
+            headers={'Authorization': f"Bearer {self.token}"},
+            timeout=self.args.timeout,
+        )
+
+
+class Results:
+    """Thread-safe collector of (latency, ok) samples per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, elapsed, ok):
+        with self.lock:
+            self.samples[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def worker(teacher, mix, deadline, results):
+    endpoints = list(mix)
+    weights = [mix[name] for name in endpoints]
+    while time.perf_counter() < deadline:
+        endpoint = random.choices(endpoints, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = getattr(teacher, endpoint)()
+            # Form posts redirect (302) on success; everything else must be 2xx
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        results.record(endpoint, time.perf_counter() - started, ok)
+
+
+def run_stage(args, fixtures, secret, concurrency, mix):
+    # requests.Session is not thread-safe, so every worker gets its own login.
+    # Workers share teacher accounts round-robin when concurrency > --users.
+    usernames = list(fixtures)
+    teachers = []
+    for i in range(concurrency):
+        username = usernames[i % len(usernames)]
+        teacher = Teacher(args, username, fixtures[username], secret)
+        teacher.login()
+        teachers.append(teacher)
+
+    results = Results()
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker, teacher, mix, deadline, results) for teacher in teachers]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - started
+    print_report(concurrency, wall, results)
+
+
+def print_report(concurrency, wall, results):
+    header = f"{'endpoint':<22}{'reqs':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(f"\n=== concurrency={concurrency}  wall={wall:.1f}s ===")
+    print(header)
+    print('-' * len(header))
+
+    all_samples = []
+    for endpoint in sorted(results.samples):
+        samples = sorted(results.samples[endpoint])
+        all_samples.extend(samples)
+        print_row(endpoint, samples, results.errors[endpoint], wall)
+    print('-' * len(header))
+    print_row('TOTAL', sorted(all_samples), sum(results.errors.values()), wall)
+
+
+def print_row(label, samples, errors, wall):
+    ms = [s * 1000 for s in samples]
+    print(
+        f"{label:<22}{len(ms):>8}{errors:>8}{len(ms) / wall:>9.1f}"
+        f"{percentile(ms, 50):>9.1f}{percentile(ms, 90):>9.1f}{percentile(ms, 95):>9.1f}"
+        f"{percentile(ms, 99):>9.1f}{(ms[-1] if ms else 0):>9.1f}"
+    )
+
+
+def parse_mix(spec):
+    """Parses 'dashboard_home=40,predict_risk=20' into a weight dict."""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown endpoint '{name}'. Choose from: {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--django-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--flask-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--users', type=int, default=5, help="Number of simulated teachers")
+    parser.add_argument('--password', default='loadtest-password')
+    parser.add_argument('--concurrency', default='1,4,16',
+                        help="Comma separated list of concurrency levels to run in turn")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per request timeout in seconds")
+    parser.add_argument('--mix', default='', help="Override weights, e.g. dashboard_home=50,predict_risk=50")
+    parser.add_argument('--setup', action='store_true', help="Create fixture users/courses/students and exit")
+    parser.add_argument('--courses-per-user', type=int, default=3)
+    parser.add_argument('--students-per-course', type=int, default=25)
+    args = parser.parse_args()
+
+    setup_django()
+
+    if args.setup:
+        print(f"Creating fixtures for {args.users} teachers...")
+        create_fixtures(args.users, args.password, args.courses_per_user, args.students_per_course)
+        return
+
+    mix = parse_mix(args.mix)
+    secret = load_shared_secret()
+    fixtures = load_fixtures(args.users)
+
+    print(f"Loaded {len(fixtures)} teachers. Mix: {mix}")
+
+    for level in args.concurrency.split(','):
+        run_stage(args, fixtures, secret, int(level), mix)
+
+
+if __name__ == '__main__':
+    main()
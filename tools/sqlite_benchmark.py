@@ -0,0 +1,168 @@
+"""
+Reader/writer concurrency benchmark for the SQLite settings in core/settings.py.
+
+Usage:
+    python tools/sqlite_benchmark.py --readers 8 --writers 4 --duration 10
+
+Runs the same workload twice against a scratch database file:
+  * before - SQLite defaults (rollback journal, synchronous=FULL, deferred
+             transactions, a fresh connection per operation like CONN_MAX_AGE=0)
+  * after  - SQLITE_PRAGMAS from settings, persistent connections and
+             BEGIN IMMEDIATE write transactions
+
+Writers mimic a roll-call: read the existing row, then insert/update attendance
+for a batch of students in one transaction. Readers run the dashboard's
+attendance-rate counts. Reports ops/sec and "database is locked" failures.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'core_django'))
+
+from core.settings import SQLITE_PRAGMAS  # noqa: E402  (plain module, no django.setup() needed)
+
+N_STUDENTS = 2000
+N_COURSES = 40
+BATCH = 25
+
+SCHEMA = """
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (course_id, student_id, date)
+);
+CREATE INDEX attendance_student ON attendance (student_id);
+"""
+
+
+def build_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    rows = [
+        (random.randrange(N_COURSES), random.randrange(N_STUDENTS), f"2025-01-{day:02d}", random.choice('PPPAL'))
+        for day in range(1, 29) for _ in range(2000)
+    ]
+    conn.executemany("INSERT OR IGNORE INTO attendance (course_id, student_id, date, status) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+class Profile:
+    def __init__(self, name, pragmas, persistent, begin):
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.begin = begin
+
+    def connect(self, path):
+        # Python's default 5 s timeout matches what Django passed before the change
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+
+BEFORE = Profile('before', ['PRAGMA journal_mode=DELETE'], persistent=False, begin='BEGIN')
+AFTER = Profile('after', SQLITE_PRAGMAS, persistent=True, begin='BEGIN IMMEDIATE')
+
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ok = 0
+        self.locked = 0
+
+    def add(self, ok):
+        with self.lock:
+            if ok:
+                self.ok += 1
+            else:
+                self.locked += 1
+
+
+def run_ops(profile, path, deadline, counter, op):
+    conn = profile.connect(path) if profile.persistent else None
+    while time.perf_counter() < deadline:
+        c = conn or profile.connect(path)
+        try:
+            op(profile, c)
+            counter.add(True)
+        except sqlite3.OperationalError as exc:
+            if 'locked' not in str(exc) and 'busy' not in str(exc):
+                raise
+            if c.in_transaction:
+                c.execute('ROLLBACK')
+            counter.add(False)
+        finally:
+            if conn is None:
+                c.close()
+    if conn is not None:
+        conn.close()
+
+
+def write_op(profile, conn):
+    course_id = random.randrange(N_COURSES)
+    day = f"2025-02-{random.randint(1, 28):02d}"
+    conn.execute(profile.begin)
+    # Read-then-write, the same shape as update_or_create()
+    conn.execute("SELECT COUNT(*) FROM attendance WHERE course_id = ? AND date = ?", (course_id, day)).fetchone()
+    for student_id in random.sample(range(N_STUDENTS), BATCH):
+        conn.execute(
+            "INSERT INTO attendance (course_id, student_id, date, status) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (course_id, student_id, date) DO UPDATE SET status = excluded.status",
+            (course_id, student_id, day, random.choice('PPPAL')),
+        )
+    conn.execute('COMMIT')
+
+
+def read_op(profile, conn):
+    student_id = random.randrange(N_STUDENTS)
+    conn.execute("SELECT COUNT(*) FROM attendance WHERE student_id = ?", (student_id,)).fetchone()
+    conn.execute("SELECT COUNT(*) FROM attendance WHERE student_id = ? AND status = 'P'", (student_id,)).fetchone()
+
+
+def run_profile(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        build_database(path)
+
+        readers, writers = Counter(), Counter()
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=run_ops, args=(profile, path, deadline, readers, read_op))
+                   for _ in range(args.readers)]
+        threads += [threading.Thread(target=run_ops, args=(profile, path, deadline, writers, write_op))
+                    for _ in range(args.writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    print(f"{profile.name:<8}{readers.ok / args.duration:>14.1f}{writers.ok / args.duration:>14.1f}"
+          f"{readers.locked:>14}{writers.locked:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per profile")
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers / {args.writers} writers, {args.duration:.0f}s per profile\n")
+    print(f"{'profile':<8}{'reads/s':>14}{'writes/s':>14}{'read locks':>14}{'write locks':>14}")
+    for profile in (BEFORE, AFTER):
+        run_profile(profile, args)
+
+
+if __name__ == '__main__':
+    main()